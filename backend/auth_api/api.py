@@ -1,51 +1,164 @@
-import datetime
+import hashlib
+import uuid
 
-import jwt
+from config.throttling import RateThrottle
 from django.conf import settings
 from django.contrib.auth import authenticate, get_user_model
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.http import HttpResponse
+from django.utils import timezone
 from ninja import Router
 from ninja.security import HttpBearer
 from oauth2_provider.models import AccessToken
 
-from .schemas import LoginIn, TokenOut, UserIn, UserOut
+from .cache import access_token_cache, unknown_token_cache, user_cache
+from .principal import TokenUser
+from .revocation import revocation_list
+from .schemas import LoginIn, LogoutIn, RefreshIn, TokenOut, UserIn, UserOut
+from .tokens import ACCESS, REFRESH, decode_token, issue_tokens, revoke_token
 
 # カスタムユーザーモデルを取得
 User = get_user_model()
 
 
+def get_cached_user(user_id):
+    """プロセス内キャッシュを経由してユーザーを取得する（見つからなければ None）"""
+    user = user_cache.get(user_id)
+    if user is None:
+        try:
+            user = User.objects.get(id=user_id)
+        except User.DoesNotExist:
+            return None
+        user_cache.set(user_id, user)
+    return user
+
+
+async def aget_cached_user(user_id):
+    """get_cached_user の非同期版"""
+    user = user_cache.get(user_id)
+    if user is None:
+        try:
+            user = await User.objects.aget(id=user_id)
+        except User.DoesNotExist:
+            return None
+        user_cache.set(user_id, user)
+    return user
+
+
 # JWT認証のためのベアラートークン認証クラス
 class JWTAuth(HttpBearer):
-    def authenticate(self, request, token):
+    """
+    claims_only=True（または settings.JWT_CLAIMS_ONLY）の場合は DB にアクセスせず、
+    トークンのクレームから TokenUser を組み立てて返す。
+    それ以外はキャッシュ済みの User を返す。
+    """
+
+    def __init__(self, claims_only=None):
+        super().__init__()
+        self.claims_only = claims_only
+
+    def is_claims_only(self):
+        if self.claims_only is None:
+            return getattr(settings, "JWT_CLAIMS_ONLY", False)
+        return self.claims_only
+
+    def decode(self, token):
+        """
+        アクセストークンを検証し (payload, user_id) を返す。不正なトークンは None。
+        失効リストの照合は authenticate で行う（非同期版では DB との同期を await するため）
+        """
+        payload = decode_token(token, ACCESS)
+        if payload is None:
+            return None
         try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-            user_id = payload.get("user_id")
-            if user_id:
-                user = User.objects.get(id=user_id)
-                return user
-        except (jwt.PyJWTError, User.DoesNotExist):
-            pass
+            return payload, uuid.UUID(payload.get("user_id"))
+        except (TypeError, ValueError):
+            return None
+
+    def use_claims(self, payload):
+        # username を含まない古いトークンは DB（キャッシュ）経由で解決する
+        return self.is_claims_only() and "username" in payload
+
+    def principal_from_claims(self, payload):
+        principal = TokenUser.from_claims(payload)
+        return principal if principal.is_active else None
+
+    def authenticate(self, request, token):
+        decoded = self.decode(token)
+        if decoded is None:
+            return None
+        payload, user_id = decoded
+        if "jti" in payload and revocation_list.is_revoked(payload["jti"]):
+            return None
+        if self.use_claims(payload):
+            return self.principal_from_claims(payload)
+        return get_cached_user(user_id)
+
+
+# 非同期ビュー用のJWT認証クラス（ユーザーの読み込みに非同期 ORM を使う）
+class AsyncJWTAuth(JWTAuth):
+    async def authenticate(self, request, token):
+        decoded = self.decode(token)
+        if decoded is None:
+            return None
+        payload, user_id = decoded
+        if "jti" in payload and await revocation_list.ais_revoked(payload["jti"]):
+            return None
+        if self.use_claims(payload):
+            return self.principal_from_claims(payload)
+        return await aget_cached_user(user_id)
+
+
+def token_checksum(token):
+    """django-oauth-toolkit が AccessToken.token_checksum に保存するのと同じ SHA-256"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def get_oauth_user(token):
+    """
+    アクセストークンの持ち主を返す（無効なトークンは None）。
+
+    トークンはハッシュ値をキーにキャッシュし、キャッシュに無い場合だけ一意インデックスのある
+    token_checksum で AccessToken をユーザーごと 1 クエリで読み込む。
+    トークンの更新・削除（失効・リフレッシュ）では signals.py がキャッシュを破棄する。
+    """
+    checksum = token_checksum(token)
+    user_id = access_token_cache.get(checksum)
+    if user_id is not None:
+        return get_cached_user(user_id)
+    if unknown_token_cache.get(checksum):
+        return None
+
+    try:
+        access_token = AccessToken.objects.select_related("user").get(token_checksum=checksum)
+    except AccessToken.DoesNotExist:
+        access_token = None
+    if access_token is None or access_token.user is None or access_token.is_expired():
+        unknown_token_cache.set(checksum, True)
         return None
 
+    remaining = (access_token.expires - timezone.now()).total_seconds()
+    access_token_cache.set(checksum, access_token.user_id, ttl=min(access_token_cache.ttl, remaining))
+    user_cache.set(access_token.user_id, access_token.user)
+    return access_token.user
+
 
 # OAuth2認証クラス
 class OAuth2Auth(HttpBearer):
     def authenticate(self, request, token):
-        try:
-            access_token = AccessToken.objects.get(token=token)
-            if not access_token.is_expired():
-                return access_token.user
-        except AccessToken.DoesNotExist:
-            pass
-        return None
+        return get_oauth_user(token)
 
 
+# パスワードのハッシュ計算・検証の前に評価されるレート制限（settings.THROTTLE_RATES）
+LOGIN_THROTTLES = [RateThrottle("login"), RateThrottle("login_email", key="email")]
+REGISTER_THROTTLES = [RateThrottle("register")]
+REFRESH_THROTTLES = [RateThrottle("refresh")]
+
 # 認証関連のルーター
 auth_router = Router()
 
 
-@auth_router.post("/register", response=UserOut)
+@auth_router.post("/register", response=UserOut, throttle=REGISTER_THROTTLES)
 def register(request, data: UserIn):
     """新規ユーザー登録エンドポイント"""
     # ユーザー名とメールアドレスの重複をチェック
@@ -54,38 +167,62 @@ def register(request, data: UserIn):
     if User.objects.filter(email=data.email).exists():
         return HttpResponse("Email already exists", status=400)
 
-    with transaction.atomic():
-        user = User.objects.create_user(
-            username=data.username, email=data.email, password=data.password
-        )
+    try:
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username=data.username, email=data.email, password=data.password
+            )
+    except IntegrityError:
+        # 重複チェックの後に同じユーザー名・メールアドレスで登録された場合
+        return HttpResponse("Username or email already exists", status=400)
     # Userオブジェクトから明示的にUserOutスキーマに合うディクショナリを作成して返す
     return {"id": str(user.id), "username": user.username, "email": user.email}
 
 
-@auth_router.post("/login", response=TokenOut)
+@auth_router.post("/login", response=TokenOut, throttle=LOGIN_THROTTLES)
 def login(request, data: LoginIn):
     """ログインエンドポイント - JWTトークンを発行"""
-    user = authenticate(username=data.email, password=data.password)
+    # email で呼び出すと EmailBackend だけが認証を行う (backends.py)
+    user = authenticate(request, email=data.email, password=data.password)
     if user is None:
         return HttpResponse("Invalid credentials", status=401)
 
-    # JWTトークン生成
-    expiry = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
-    payload = {"user_id": str(user.id), "exp": expiry}  # UUIDをstr型に変換
-    token = jwt.encode(payload, settings.SECRET_KEY, algorithm="HS256")
-
-    return {"access_token": token, "token_type": "bearer", "expires_in": 3600}  # 1時間
+    return issue_tokens(user)
+
+
+@auth_router.post("/refresh", response=TokenOut, throttle=REFRESH_THROTTLES)
+def refresh(request, data: RefreshIn):
+    """
+    リフレッシュトークンで新しいトークンの組を発行する（パスワードの検証を行わない）。
+    使ったリフレッシュトークンは失効させ、同じトークンの 2 回目以降の使用は 401 にする
+    """
+    payload = decode_token(data.refresh_token, REFRESH)
+    if payload is None or revocation_list.is_revoked(payload.get("jti")):
+        return HttpResponse("Invalid refresh token", status=401)
+    try:
+        user = get_cached_user(uuid.UUID(payload.get("user_id")))
+    except (TypeError, ValueError):
+        user = None
+    if user is None or not user.is_active:
+        return HttpResponse("Invalid refresh token", status=401)
+    # 同時に同じトークンが使われた場合、RevokedToken の一意制約で片方だけが成功する
+    if not revoke_token(payload):
+        return HttpResponse("Invalid refresh token", status=401)
+    return issue_tokens(user)
 
 
 @auth_router.post("/logout")
-def logout(request, data: TokenOut):
-    """ログアウトエンドポイント - 必要に応じてトークン無効化など実装"""
-    # JWTの場合はクライアント側でのトークン削除が一般的だが、
-    # 必要に応じてブラックリスト機能を実装することも可能
+def logout(request, data: LogoutIn):
+    """ログアウトエンドポイント - 指定されたアクセストークン・リフレッシュトークンを失効させる"""
+    tokens = ((data.access_token, ACCESS), (data.refresh_token, REFRESH))
+    for token, token_type in tokens:
+        payload = decode_token(token, token_type) if token else None
+        if payload is not None:
+            revoke_token(payload)
     return {"success": True}
 
 
-@auth_router.get("/me", response=UserOut, auth=JWTAuth())
+@auth_router.get("/me", response=UserOut, auth=JWTAuth(claims_only=False))
 def get_user(request):
     """現在のユーザー情報を取得"""
     user = request.auth  # JWTAuthクラスによって認証されたユーザー
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AuthApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'auth_api'
+
+    def ready(self):
+        # シグナルハンドラを登録
+        from . import signals  # noqa: F401
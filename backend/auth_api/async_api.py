@@ -0,0 +1,35 @@
+"""
+認証APIの非同期版（ASGI 用）。
+
+/me だけを非同期化し、パスワードハッシュの計算が中心の register / login と refresh / logout は
+同期版の関数をそのまま登録する（ninja が自動的にスレッドで実行する）。
+"""
+
+from ninja import Router
+
+from .api import (
+    LOGIN_THROTTLES,
+    REFRESH_THROTTLES,
+    REGISTER_THROTTLES,
+    AsyncJWTAuth,
+    login,
+    logout,
+    refresh,
+    register,
+)
+from .schemas import TokenOut, UserOut
+
+# 非同期版の認証関連のルーター
+auth_router = Router()
+
+auth_router.post("/register", response=UserOut, throttle=REGISTER_THROTTLES)(register)
+auth_router.post("/login", response=TokenOut, throttle=LOGIN_THROTTLES)(login)
+auth_router.post("/refresh", response=TokenOut, throttle=REFRESH_THROTTLES)(refresh)
+auth_router.post("/logout")(logout)
+
+
+@auth_router.get("/me", response=UserOut, auth=AsyncJWTAuth(claims_only=False))
+async def get_user(request):
+    """現在のユーザー情報を取得"""
+    user = request.auth  # AsyncJWTAuthクラスによって認証されたユーザー
+    return {"id": str(user.id), "username": user.username, "email": user.email}
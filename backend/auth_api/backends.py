@@ -5,11 +5,26 @@ User = get_user_model()
 
 
 class EmailBackend(ModelBackend):
-    def authenticate(self, request, username=None, password=None, **kwargs):
-        # usernameフィールドにemailが渡されることを想定
+    """
+    メールアドレスとパスワードで認証するバックエンド。
+
+    authenticate(request, email=..., password=...) で呼び出すと、後続の ModelBackend は
+    username が無いため何もせずに戻る。そのため 1 回のログインは一意インデックスでの
+    1 クエリとパスワードハッシュの検証 1 回で済む。
+    """
+
+    def authenticate(self, request, username=None, password=None, email=None, **kwargs):
+        # email が無い場合は従来どおり username にメールアドレスが渡されたものとみなす
+        email = email or username
+        if email is None or password is None:
+            return None
         try:
-            user = User.objects.get(email=username)
-            if user.check_password(password):
-                return user
+            user = User._default_manager.get(email=email)
         except User.DoesNotExist:
+            # ユーザーが存在しない場合もハッシュを計算し、応答時間の差で存在を推測されないようにする
+            User().set_password(password)
             return None
+        # check_password はハッシュの設定が古ければ、現在の設定で再ハッシュして保存する (hashers.py)
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
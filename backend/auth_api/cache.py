@@ -0,0 +1,76 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class UserCache:
+    """
+    UUID をキーにユーザーを保持する、サイズ上限と TTL 付きの LRU キャッシュ。
+
+    JWTAuth が毎リクエスト User.objects.get() を発行しないようにするためのもので、
+    CustomUser の post_save / post_delete シグナルで該当エントリが破棄される（signals.py）。
+    OAuth2 のアクセストークンのキャッシュにも同じクラスを使う。
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """ttl を指定すると、そのエントリだけ既定の TTL より短く（または長く）保持する"""
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# JWT認証で使うプロセス内のユーザーキャッシュ
+user_cache = UserCache(
+    maxsize=getattr(settings, "JWT_USER_CACHE_SIZE", 1024),
+    ttl=getattr(settings, "JWT_USER_CACHE_TTL", 60),
+)
+
+# OAuth2Auth で使う、アクセストークンの SHA-256 → ユーザー ID のキャッシュ
+# （TTL はトークンの残りの有効期間を超えない）
+access_token_cache = UserCache(
+    maxsize=getattr(settings, "OAUTH2_TOKEN_CACHE_SIZE", 4096),
+    ttl=getattr(settings, "OAUTH2_TOKEN_CACHE_TTL", 60),
+)
+
+# 存在しない・期限切れのアクセストークンの否定キャッシュ。総当たりのリクエストで DB に
+# 負荷がかからないようにする（有効なトークンのキャッシュを追い出さないよう別に持つ）
+unknown_token_cache = UserCache(
+    maxsize=getattr(settings, "OAUTH2_TOKEN_CACHE_SIZE", 4096),
+    ttl=getattr(settings, "OAUTH2_UNKNOWN_TOKEN_CACHE_TTL", 10),
+)
@@ -0,0 +1,18 @@
+"""
+パスワードハッシュの設定。
+
+PBKDF2 の反復回数を settings.PASSWORD_HASH_ITERATIONS で調整できるようにする。
+アルゴリズム名は Django 標準の pbkdf2_sha256 と同じなので既存のハッシュはそのまま検証でき、
+保存されているハッシュの反復回数が設定と異なる場合は、ログインに成功したときに
+Django の check_password が現在の設定で再ハッシュして保存する（段階的な移行）。
+"""
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        # 未設定なら Django の既定値
+        return getattr(settings, "PASSWORD_HASH_ITERATIONS", None) or super().iterations
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from auth_api.revocation import prune_revoked_tokens
+
+
+class Command(BaseCommand):
+    help = "有効期限を過ぎた失効済みトークン (RevokedToken) を削除します"
+
+    def handle(self, *args, **options):
+        deleted = prune_revoked_tokens()
+        self.stdout.write(self.style.SUCCESS(f"失効済みトークンを削除しました（{deleted} 件）"))
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:16
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_duplicate_emails(apps, schema_editor):
+    # 重複があると一意インデックスを作れないため、該当するアドレスを示して中断する
+    CustomUser = apps.get_model('auth_api', 'CustomUser')
+    duplicates = list(
+        CustomUser.objects.values('email')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+        .values_list('email', flat=True)[:20]
+    )
+    if duplicates:
+        raise RuntimeError(
+            'メールアドレスが重複しているユーザーがいます。整理してから再実行してください: '
+            + ', '.join(repr(email) for email in duplicates)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='customuser',
+            name='email',
+            field=models.EmailField(max_length=254, unique=True, verbose_name='メールアドレス'),
+        ),
+    ]
@@ -10,6 +10,8 @@ class CustomUser(AbstractUser):
     id = models.UUIDField(
         primary_key=True, default=uuid.uuid4, editable=False, verbose_name="ユーザーID"
     )
+    # ログインはメールアドレスで行うため、一意のインデックスを張る
+    email = models.EmailField(unique=True, verbose_name="メールアドレス")
 
     # 将来的に追加できる追加フィールドの例
     # bio = models.TextField(blank=True, verbose_name="自己紹介")
@@ -21,3 +23,19 @@ class CustomUser(AbstractUser):
 
     def __str__(self):
         return self.username
+
+
+class RevokedToken(models.Model):
+    """
+    失効させた JWT の jti（ログアウト・リフレッシュトークンのローテーション）。
+
+    各プロセスは revocation.py のメモリ上の一覧に定期的に同期して照合する。
+    有効期限 (expires_at) を過ぎた行は不要になるため prune_revoked_tokens コマンドで削除する。
+    """
+
+    jti = models.CharField(max_length=64, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.jti
@@ -0,0 +1,47 @@
+import uuid
+from dataclasses import dataclass
+
+from django.contrib.auth import get_user_model
+
+
+@dataclass(frozen=True)
+class TokenUser:
+    """
+    JWT のクレーム (user_id, username, is_active) だけから組み立てる軽量なプリンシパル。
+
+    claims-only モードの JWTAuth が DB にアクセスせずに返す。
+    所有者チェックは request.auth.id と author_id の比較で行うこと。
+    """
+
+    id: uuid.UUID
+    username: str
+    is_active: bool = True
+
+    is_authenticated = True
+    is_anonymous = False
+
+    @property
+    def pk(self):
+        return self.id
+
+    @classmethod
+    def from_claims(cls, payload):
+        return cls(
+            id=uuid.UUID(payload["user_id"]),
+            username=payload["username"],
+            is_active=payload.get("is_active", True),
+        )
+
+
+def as_user(principal):
+    """
+    request.auth を外部キーに代入できる User インスタンスとして返す。
+
+    TokenUser の場合は DB にアクセスせず、id と username だけを持つインスタンスを組み立てる。
+    """
+    User = get_user_model()
+    if isinstance(principal, User):
+        return principal
+    user = User(id=principal.id, username=principal.username, is_active=principal.is_active)
+    user._state.adding = False
+    return user
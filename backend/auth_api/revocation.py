@@ -0,0 +1,99 @@
+import threading
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import RevokedToken
+
+
+class RevocationList:
+    """
+    失効した jti のメモリ上の一覧。JWTAuth は毎リクエスト is_revoked() で O(1) の照合だけを行う。
+
+    一覧は RevokedToken テーブルから sync_interval 秒ごとに差分を読み込む。同じプロセスで
+    失効させた jti はすぐに反映され、他のプロセスの失効は最大 sync_interval 秒遅れて反映される。
+    有効期限を過ぎた jti はトークンの検証で拒否されるため、同期のたびに一覧から取り除く。
+    """
+
+    # 差分の読み込みで、前回の同期より少し前から読み直す秒数（コミットの遅れを吸収する）
+    overlap = 60
+
+    def __init__(self, sync_interval=5):
+        self.sync_interval = sync_interval
+        self._expires = {}  # jti → 有効期限 (UNIX 時刻)
+        self._synced_at = None  # 前回の同期を開始した日時
+        self._next_sync = 0.0  # 次に同期する time.monotonic() の値
+        self._lock = threading.Lock()
+
+    def is_revoked(self, jti):
+        if time.monotonic() >= self._next_sync:
+            self.sync()
+        return jti in self._expires
+
+    async def ais_revoked(self, jti):
+        """is_revoked の非同期版"""
+        if time.monotonic() >= self._next_sync:
+            await sync_to_async(self.sync)()
+        return jti in self._expires
+
+    def sync(self):
+        # 他のスレッドが同期中なら、その結果を待たずに現在の一覧で照合する
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            started = timezone.now()
+            rows = RevokedToken.objects.filter(expires_at__gt=started)
+            if self._synced_at is not None:
+                rows = rows.filter(revoked_at__gte=self._synced_at - timedelta(seconds=self.overlap))
+            for jti, expires_at in rows.values_list("jti", "expires_at"):
+                self._expires[jti] = expires_at.timestamp()
+            self.prune(started.timestamp())
+            self._synced_at = started
+            self._next_sync = time.monotonic() + self.sync_interval
+        finally:
+            self._lock.release()
+
+    def prune(self, now):
+        expired = [jti for jti, expires in self._expires.items() if expires <= now]
+        for jti in expired:
+            self._expires.pop(jti, None)
+
+    def revoke(self, jti, expires_at):
+        """
+        jti を失効させる。すでに失効済みなら False を返す
+        （リフレッシュトークンの使い回しの検出に使う）
+        """
+        try:
+            with transaction.atomic():
+                RevokedToken.objects.create(jti=jti, expires_at=expires_at)
+        except IntegrityError:
+            return False
+        finally:
+            self._expires[jti] = expires_at.timestamp()
+        return True
+
+    def clear(self):
+        """メモリ上の一覧を破棄し、次回の照合で全件を読み込み直す"""
+        with self._lock:
+            self._expires.clear()
+            self._synced_at = None
+            self._next_sync = 0.0
+
+    def __len__(self):
+        return len(self._expires)
+
+
+def prune_revoked_tokens():
+    """有効期限を過ぎた RevokedToken を削除し、削除した件数を返す"""
+    deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+# JWT認証で使うプロセス内の失効リスト
+revocation_list = RevocationList(
+    sync_interval=getattr(settings, "JWT_REVOCATION_SYNC_INTERVAL", 5),
+)
@@ -25,6 +25,16 @@ class LoginIn(BaseModel):
     password: str
 
 
+class RefreshIn(BaseModel):
+    refresh_token: str
+
+
+class LogoutIn(BaseModel):
+    # 失効させるトークン（ログイン時のレスポンスをそのまま送ってもよい）
+    access_token: Optional[str] = None
+    refresh_token: Optional[str] = None
+
+
 class TokenOut(BaseModel):
     access_token: str
     token_type: str
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from oauth2_provider.models import get_access_token_model
+
+from .cache import access_token_cache, unknown_token_cache, user_cache
+from .models import CustomUser
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """ユーザーが更新・削除されたらキャッシュから破棄する"""
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=get_access_token_model())
+@receiver(post_delete, sender=get_access_token_model())
+def invalidate_access_token_cache(sender, instance, **kwargs):
+    """OAuth2 のアクセストークンが更新・削除（失効・リフレッシュ）されたらキャッシュから破棄する"""
+    access_token_cache.invalidate(instance.token_checksum)
+    unknown_token_cache.invalidate(instance.token_checksum)
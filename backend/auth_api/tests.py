@@ -1,3 +1,368 @@
-from django.test import TestCase
+import datetime
+import time
+from io import StringIO
 
-# Create your tests here.
+import jwt
+from asgiref.sync import sync_to_async
+from config.throttling import CacheStore, LocalBucketStore, RateThrottle, reset_throttles
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from oauth2_provider.models import AccessToken
+
+from .api import AsyncJWTAuth, JWTAuth, OAuth2Auth
+from .cache import UserCache, access_token_cache, unknown_token_cache, user_cache
+from .models import RevokedToken
+from .principal import TokenUser
+from .revocation import revocation_list
+
+User = get_user_model()
+
+TEST_SECRET_KEY = "test-secret-key-for-jwt-signing-0123456789"
+
+
+def make_token(user, **claims):
+    """テスト用のJWTトークンを発行する"""
+    payload = {
+        "user_id": str(user.id),
+        "username": user.username,
+        "is_active": user.is_active,
+        "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=1),
+    }
+    payload.update(claims)
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm="HS256")
+
+
+@override_settings(SECRET_KEY=TEST_SECRET_KEY)
+class AuthTestCase(TestCase):
+    """認証APIテスト共通のセットアップ"""
+
+    password = "pass-1234-word"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="alice", email="alice@example.com", password=cls.password
+        )
+
+    def setUp(self):
+        user_cache.clear()
+        access_token_cache.clear()
+        unknown_token_cache.clear()
+        revocation_list.clear()
+        reset_throttles()
+
+    def auth_header(self, user=None, **claims):
+        return {"HTTP_AUTHORIZATION": f"Bearer {make_token(user or self.user, **claims)}"}
+
+
+class UserCacheTests(TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = UserCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache), 2)
+
+    def test_expires_after_ttl(self):
+        cache = UserCache(maxsize=2, ttl=-1)
+        cache.set("a", 1)
+        self.assertIsNone(cache.get("a"))
+
+
+class JWTAuthTests(AuthTestCase):
+    def test_user_is_cached_between_requests(self):
+        auth = JWTAuth(claims_only=False)
+        token = make_token(self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(auth.authenticate(None, token), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(auth.authenticate(None, token), self.user)
+
+    def test_cache_is_invalidated_on_save_and_delete(self):
+        auth = JWTAuth(claims_only=False)
+        token = make_token(self.user)
+        auth.authenticate(None, token)
+
+        self.user.first_name = "Alice"
+        self.user.save()
+        self.assertIsNone(user_cache.get(self.user.id))
+        self.assertEqual(auth.authenticate(None, token).first_name, "Alice")
+
+        self.user.delete()
+        self.assertIsNone(auth.authenticate(None, token))
+
+    def test_claims_only_mode_skips_database(self):
+        auth = JWTAuth(claims_only=True)
+        with self.assertNumQueries(0):
+            principal = auth.authenticate(None, make_token(self.user))
+        self.assertIsInstance(principal, TokenUser)
+        self.assertEqual(principal.id, self.user.id)
+        self.assertEqual(principal.username, "alice")
+
+    def test_claims_only_mode_rejects_inactive_claims(self):
+        auth = JWTAuth(claims_only=True)
+        self.assertIsNone(auth.authenticate(None, make_token(self.user, is_active=False)))
+
+    def test_invalid_token(self):
+        auth = JWTAuth()
+        self.assertIsNone(auth.authenticate(None, "invalid"))
+        self.assertIsNone(auth.authenticate(None, make_token(self.user, user_id="not-a-uuid")))
+
+    def test_login_token_contains_claims(self):
+        response = self.client.post(
+            "/api/auth/login",
+            {"email": "alice@example.com", "password": self.password},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        payload = jwt.decode(
+            response.json()["access_token"], TEST_SECRET_KEY, algorithms=["HS256"]
+        )
+        self.assertEqual(payload["username"], "alice")
+        self.assertTrue(payload["is_active"])
+
+    def test_me(self):
+        response = self.client.get("/api/auth/me", **self.auth_header())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["email"], "alice@example.com")
+
+
+class LoginTests(AuthTestCase):
+    def login(self, email="alice@example.com", password=None):
+        return self.client.post(
+            "/api/auth/login",
+            {"email": email, "password": password or self.password},
+            content_type="application/json",
+        )
+
+    def test_login_is_a_single_query(self):
+        # EmailBackend の 1 クエリだけで、ModelBackend には進まない
+        with self.assertNumQueries(1):
+            self.assertEqual(self.login().status_code, 200)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.login(password="wrong-password").status_code, 401)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.login(email="nobody@example.com").status_code, 401)
+
+    def test_username_argument_is_still_accepted(self):
+        self.assertEqual(authenticate(username="alice@example.com", password=self.password), self.user)
+
+    def test_inactive_user_cannot_login(self):
+        User.objects.filter(id=self.user.id).update(is_active=False)
+        self.assertEqual(self.login().status_code, 401)
+
+    def test_password_hash_is_upgraded_on_login(self):
+        with self.settings(PASSWORD_HASH_ITERATIONS=1000):
+            self.user.set_password(self.password)
+            self.user.save()
+        with self.settings(PASSWORD_HASH_ITERATIONS=2000):
+            self.assertEqual(self.login().status_code, 200)
+            self.user.refresh_from_db()
+            self.assertTrue(self.user.password.startswith("pbkdf2_sha256$2000$"))
+            # 更新後は再ハッシュしない
+            with self.assertNumQueries(1):
+                self.login()
+
+    def test_register_rejects_duplicate_email(self):
+        response = self.client.post(
+            "/api/auth/register",
+            {"username": "alice2", "email": "alice@example.com", "password": "another-pass-9876"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class TokenRevocationTests(AuthTestCase):
+    def post(self, path, data):
+        return self.client.post(path, data, content_type="application/json")
+
+    def login(self):
+        response = self.post("/api/auth/login", {"email": "alice@example.com", "password": self.password})
+        return response.json()
+
+    def me(self, access_token):
+        return self.client.get("/api/auth/me", HTTP_AUTHORIZATION=f"Bearer {access_token}")
+
+    def test_refresh_rotates_tokens(self):
+        tokens = self.login()
+        response = self.post("/api/auth/refresh", {"refresh_token": tokens["refresh_token"]})
+        self.assertEqual(response.status_code, 200)
+        rotated = response.json()
+        self.assertNotEqual(rotated["refresh_token"], tokens["refresh_token"])
+        self.assertEqual(self.me(rotated["access_token"]).status_code, 200)
+
+        # 使用済みのリフレッシュトークンは再利用できない
+        response = self.post("/api/auth/refresh", {"refresh_token": tokens["refresh_token"]})
+        self.assertEqual(response.status_code, 401)
+        response = self.post("/api/auth/refresh", {"refresh_token": rotated["refresh_token"]})
+        self.assertEqual(response.status_code, 200)
+
+    def test_token_types_are_not_interchangeable(self):
+        tokens = self.login()
+        self.assertEqual(self.me(tokens["refresh_token"]).status_code, 401)
+        response = self.post("/api/auth/refresh", {"refresh_token": tokens["access_token"]})
+        self.assertEqual(response.status_code, 401)
+
+    def test_logout_revokes_tokens(self):
+        tokens = self.login()
+        self.assertEqual(self.post("/api/auth/logout", tokens).status_code, 200)
+        self.assertEqual(self.me(tokens["access_token"]).status_code, 401)
+        response = self.post("/api/auth/refresh", {"refresh_token": tokens["refresh_token"]})
+        self.assertEqual(response.status_code, 401)
+
+    def test_revocation_check_uses_memory_between_syncs(self):
+        tokens = self.login()
+        auth = JWTAuth(claims_only=True)
+        auth.authenticate(None, tokens["access_token"])
+        with self.assertNumQueries(0):
+            self.assertIsNotNone(auth.authenticate(None, tokens["access_token"]))
+
+        # 他のプロセスでの失効は次の同期で反映される
+        payload = jwt.decode(tokens["access_token"], TEST_SECRET_KEY, algorithms=["HS256"])
+        expires_at = datetime.datetime.fromtimestamp(payload["exp"], tz=datetime.timezone.utc)
+        RevokedToken.objects.create(jti=payload["jti"], expires_at=expires_at)
+        self.assertIsNotNone(auth.authenticate(None, tokens["access_token"]))
+        revocation_list._next_sync = 0
+        self.assertIsNone(auth.authenticate(None, tokens["access_token"]))
+
+    async def test_async_auth_checks_revocation(self):
+        tokens = await sync_to_async(self.login)()
+        auth = AsyncJWTAuth(claims_only=True)
+        self.assertIsNotNone(await auth.authenticate(None, tokens["access_token"]))
+        await sync_to_async(self.post)("/api/auth/logout", {"access_token": tokens["access_token"]})
+        self.assertIsNone(await auth.authenticate(None, tokens["access_token"]))
+
+    def test_prune_command(self):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        RevokedToken.objects.create(jti="old", expires_at=now - datetime.timedelta(seconds=1))
+        RevokedToken.objects.create(jti="new", expires_at=now + datetime.timedelta(hours=1))
+        call_command("prune_revoked_tokens", stdout=StringIO())
+        self.assertEqual(list(RevokedToken.objects.values_list("jti", flat=True)), ["new"])
+
+
+class OAuth2AuthTests(AuthTestCase):
+    def create_token(self, token="oauth-token", expires_in=3600):
+        return AccessToken.objects.create(
+            user=self.user,
+            token=token,
+            expires=timezone.now() + datetime.timedelta(seconds=expires_in),
+            scope="read",
+        )
+
+    def test_token_is_cached(self):
+        self.create_token()
+        auth = OAuth2Auth()
+        with self.assertNumQueries(1):
+            self.assertEqual(auth.authenticate(None, "oauth-token"), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(auth.authenticate(None, "oauth-token"), self.user)
+
+    def test_revoked_token_is_invalidated(self):
+        access_token = self.create_token()
+        auth = OAuth2Auth()
+        auth.authenticate(None, "oauth-token")
+        access_token.revoke()
+        self.assertIsNone(auth.authenticate(None, "oauth-token"))
+
+    def test_unknown_and_expired_tokens_are_negatively_cached(self):
+        self.create_token(token="expired", expires_in=-1)
+        auth = OAuth2Auth()
+        for token in ("unknown", "expired"):
+            with self.assertNumQueries(1):
+                self.assertIsNone(auth.authenticate(None, token))
+            with self.assertNumQueries(0):
+                self.assertIsNone(auth.authenticate(None, token))
+
+        # 後から作られた（更新された）トークンは否定キャッシュに関係なく使える
+        self.create_token(token="unknown")
+        self.assertEqual(auth.authenticate(None, "unknown"), self.user)
+
+    def test_cache_ttl_is_capped_at_token_expiry(self):
+        self.create_token(expires_in=5)
+        OAuth2Auth().authenticate(None, "oauth-token")
+        (_, expires_at), = access_token_cache._data.values()
+        self.assertLessEqual(expires_at - time.monotonic(), 5)
+
+
+class ThrottleTests(AuthTestCase):
+    """ログイン・登録のレート制限 (config/throttling.py)"""
+
+    def login(self, email, password="wrong-password", ip="10.0.0.1"):
+        return self.client.post(
+            "/api/auth/login",
+            {"email": email, "password": password},
+            content_type="application/json",
+            REMOTE_ADDR=ip,
+        )
+
+    def test_login_is_limited_per_email_before_hashing(self):
+        limit, _ = RateThrottle("login_email").parse_rate(settings.THROTTLE_RATES["login_email"])
+        for i in range(limit):
+            # IP アドレスを変えても、同じメールアドレスへの試行は数えられる
+            self.assertEqual(self.login("Alice@example.com", ip=f"10.0.1.{i}").status_code, 401)
+        # 認証のクエリもパスワードのハッシュ計算も行われない
+        with self.assertNumQueries(0):
+            response = self.login("alice@example.com", password=self.password)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+        # 別のメールアドレスは制限されない
+        self.assertEqual(self.login("bob@example.com", ip="10.0.2.1").status_code, 401)
+
+    def test_register_is_limited_per_ip_before_validation(self):
+        limit, _ = RateThrottle("register").parse_rate(settings.THROTTLE_RATES["register"])
+        payload = {"username": "u", "email": "u@example.com", "password": "short"}
+        for _ in range(limit):
+            response = self.client.post(
+                "/api/auth/register", payload, content_type="application/json"
+            )
+            self.assertEqual(response.status_code, 422)
+        response = self.client.post("/api/auth/register", payload, content_type="application/json")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+    def test_user_key_and_disabled_scope(self):
+        request = RequestFactory().post("/", REMOTE_ADDR="10.0.0.1")
+        request.auth = self.user
+        throttle = RateThrottle("test", key="user", rate="2/min")
+        self.assertTrue(throttle.allow_request(request))
+        self.assertTrue(throttle.allow_request(request))
+        self.assertFalse(throttle.allow_request(request))
+        self.assertAlmostEqual(throttle.wait(), 30, delta=1)
+        # 未認証のリクエストは IP アドレスで数える
+        self.assertTrue(throttle.allow_request(RequestFactory().post("/", REMOTE_ADDR="10.0.0.1")))
+        # レートが設定されていない scope は制限しない
+        unlimited = RateThrottle("unknown-scope")
+        self.assertTrue(all(unlimited.allow_request(request) for _ in range(100)))
+
+
+class ThrottleStoreTests(TestCase):
+    def test_local_bucket_refills(self):
+        store = LocalBucketStore(stripes=4)
+        self.assertIsNone(store.hit("k", 2, 1))
+        self.assertIsNone(store.hit("k", 2, 1))
+        wait = store.hit("k", 2, 1)
+        self.assertGreater(wait, 0)
+        time.sleep(wait + 0.01)
+        self.assertIsNone(store.hit("k", 2, 1))
+
+    def test_local_bucket_drops_refilled_keys(self):
+        store = LocalBucketStore(stripes=1, max_keys=10)
+        for i in range(10):
+            store.hit(f"k{i}", 1000, 0.001)
+        time.sleep(0.01)
+        store.hit("new", 1000, 0.001)
+        self.assertEqual(sum(len(buckets) for _, buckets in store._stripes), 1)
+
+    def test_cache_store_sliding_window(self):
+        store = CacheStore()
+        store.clear()
+        self.assertIsNone(store.hit("k", 2, 60))
+        self.assertIsNone(store.hit("k", 2, 60))
+        self.assertGreater(store.hit("k", 2, 60), 0)
+        self.assertIsNone(store.hit("other", 2, 60))
@@ -0,0 +1,73 @@
+"""
+JWT のアクセストークンとリフレッシュトークン。
+
+どちらも jti（トークンごとの一意な ID）を持ち、ログアウトやリフレッシュトークンの
+ローテーションでは jti を失効リスト (revocation.py) に登録する。
+リフレッシュトークンは 1 回だけ使え、使うと新しいアクセストークンとリフレッシュトークンの組が発行される。
+"""
+
+import datetime
+import uuid
+
+import jwt
+from django.conf import settings
+
+from .revocation import revocation_list
+
+ACCESS = "access"
+REFRESH = "refresh"
+
+
+def access_token_lifetime():
+    return getattr(settings, "JWT_ACCESS_TOKEN_LIFETIME", 3600)
+
+
+def refresh_token_lifetime():
+    return getattr(settings, "JWT_REFRESH_TOKEN_LIFETIME", 14 * 24 * 3600)
+
+
+def encode_token(user, token_type, lifetime):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    payload = {
+        "user_id": str(user.id),  # UUIDをstr型に変換
+        "username": user.username,
+        "is_active": user.is_active,
+        "type": token_type,
+        "jti": uuid.uuid4().hex,
+        "exp": now + datetime.timedelta(seconds=lifetime),
+    }
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm="HS256")
+
+
+def issue_tokens(user):
+    """ログイン・リフレッシュのレスポンス (TokenOut) を作る"""
+    lifetime = access_token_lifetime()
+    return {
+        "access_token": encode_token(user, ACCESS, lifetime),
+        "token_type": "bearer",
+        "expires_in": lifetime,
+        "refresh_token": encode_token(user, REFRESH, refresh_token_lifetime()),
+    }
+
+
+def decode_token(token, token_type=ACCESS):
+    """
+    署名・有効期限・種類を検証してペイロードを返す。不正なトークンは None。
+    type を持たない古いトークンはアクセストークンとして扱う（失効リストの照合は呼び出し側で行う）
+    """
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+    except jwt.PyJWTError:
+        return None
+    if payload.get("type", ACCESS) != token_type:
+        return None
+    return payload
+
+
+def revoke_token(payload):
+    """トークンの jti を失効させる。jti が無い・すでに失効済みの場合は False"""
+    jti = payload.get("jti")
+    if not jti:
+        return False
+    expires_at = datetime.datetime.fromtimestamp(payload["exp"], tz=datetime.timezone.utc)
+    return revocation_list.revoke(jti, expires_at)
@@ -0,0 +1,389 @@
+"""
+API 全体の負荷テスト（blog/api.py と auth_api/api.py の全ルート）。
+
+一時データベースに実運用に近い件数のデータを bulk insert で投入し、Django のテストクライアントで
+各ルートにリクエストを送って、レイテンシ (p50/p95/p99)・1 リクエストあたりのクエリ数・
+メモリ割り当て量を計測する。結果は JSON で出力し、--baseline に前回の結果を渡すと
+回帰（p95 の悪化・クエリ数の増加）があった場合に終了コード 1 で終わる。
+
+    cd backend
+    python -m benchmarks.api_suite --output bench.json                   # 1万ユーザー/10万記事/100万コメント
+    python -m benchmarks.api_suite --scale small --baseline bench.json   # 小さいデータで比較
+"""
+
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from .common import auth_header, seed_blog, setup_django, summarize
+
+SCALES = {
+    "full": {"users": 10_000, "entries": 100_000, "comments_per_entry": 10},
+    "medium": {"users": 1_000, "entries": 10_000, "comments_per_entry": 10},
+    "small": {"users": 100, "entries": 1_000, "comments_per_entry": 5},
+}
+
+PASSWORD = "bench-pass-1234"
+NO_CACHE = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+JSON = "application/json"
+
+
+# --- シナリオ -------------------------------------------------------------------
+
+
+class Context:
+    """シナリオ間で共有するデータ（ベンチマーク用ユーザー・既存の記事 id など）"""
+
+    def __init__(self, users, entry_ids, seed):
+        self.user = users[0]
+        self.header = auth_header(self.user)
+        self.entry_ids = entry_ids
+        self.random = random.Random(seed)
+
+    def any_entry(self):
+        return self.random.choice(self.entry_ids)
+
+    def own_entries(self, count):
+        """ベンチマーク用ユーザーの記事を作る（更新・削除の対象用）"""
+        from blog.models import BlogEntry
+
+        entries = BlogEntry.objects.bulk_create(
+            [BlogEntry(title=f"own {i}", content="own", author=self.user) for i in range(count)]
+        )
+        return [entry.id for entry in entries]
+
+    def own_comments(self, count):
+        from blog.activity import refresh_activity
+        from blog.models import Comment
+
+        blog_id = self.entry_ids[0]
+        comments = Comment.objects.bulk_create(
+            [Comment(blog_entry_id=blog_id, content="own", author=self.user) for _ in range(count)]
+        )
+        refresh_activity([blog_id])
+        return blog_id, [comment.id for comment in comments]
+
+
+class Scenario:
+    """
+    1 つのルートへのリクエストの組み立て方。
+
+    request(ctx, i, prepared) は Client のメソッド名・パス・引数を返す。
+    prepare(ctx, n) は n 回分のリクエストで使う対象（削除する記事など）を事前に作る。
+    """
+
+    def __init__(self, name, request, prepare=None, requests=None):
+        self.name = name
+        self.request = request
+        self.prepare = prepare or (lambda ctx, n: None)
+        self.requests = requests  # None の場合は --requests
+
+    def build(self, ctx, count):
+        prepared = self.prepare(ctx, count)
+        return [self.request(ctx, i, prepared) for i in range(count)]
+
+
+def get(path, data=None, **extra):
+    return "get", path, {"data": data, **extra}
+
+
+def send(method, path, body, ctx):
+    return method, path, {"data": body, "content_type": JSON, **ctx.header}
+
+
+def bulk_items(prefix, size=100):
+    return [{"title": f"{prefix} {i}", "content": "bulk"} for i in range(size)]
+
+
+def create_comment(ctx, i, prepared):
+    blog_id = ctx.any_entry()
+    body = {"content": f"c{i}", "blog_entry_id": blog_id}
+    return send("post", f"/api/blog/{blog_id}/comments/", body, ctx)
+
+
+SCENARIOS = [
+    # --- 読み取り ---
+    Scenario(
+        "blog.list", lambda ctx, i, p: get("/api/blog/", {"limit": 20, "offset": i % 50 * 20})
+    ),
+    Scenario("blog.list_cursor", lambda ctx, i, p: get("/api/blog/", {"limit": 20, "cursor": ""})),
+    Scenario(
+        "blog.list_activity",
+        lambda ctx, i, p: get("/api/blog/", {"limit": 20, "cursor": "", "sort": "activity"}),
+    ),
+    Scenario("blog.detail", lambda ctx, i, p: get(f"/api/blog/{ctx.any_entry()}")),
+    Scenario(
+        "blog.search",
+        lambda ctx, i, p: get("/api/blog/search", {"q": f"title {ctx.random.randrange(1000)}"}),
+    ),
+    Scenario(
+        "comments.list",
+        lambda ctx, i, p: get(f"/api/blog/{ctx.any_entry()}/comments/", {"limit": 20}),
+    ),
+    # --- 書き込み ---
+    Scenario(
+        "blog.create",
+        lambda ctx, i, p: send("post", "/api/blog/", {"title": f"new {i}", "content": "c"}, ctx),
+    ),
+    Scenario(
+        "blog.update",
+        lambda ctx, i, p: send("put", f"/api/blog/{p[i % len(p)]}", {"title": f"u{i}"}, ctx),
+        prepare=lambda ctx, n: ctx.own_entries(10),
+    ),
+    Scenario(
+        "blog.delete",
+        lambda ctx, i, p: ("delete", f"/api/blog/{p[i]}", dict(ctx.header)),
+        prepare=lambda ctx, n: ctx.own_entries(n),
+    ),
+    Scenario("comments.create", create_comment),
+    Scenario(
+        "comments.update",
+        lambda ctx, i, p: send(
+            "put", f"/api/blog/{p[0]}/comments/{p[1][i % len(p[1])]}", {"content": f"u{i}"}, ctx
+        ),
+        prepare=lambda ctx, n: ctx.own_comments(10),
+    ),
+    Scenario(
+        "comments.delete",
+        lambda ctx, i, p: ("delete", f"/api/blog/{p[0]}/comments/{p[1][i]}", dict(ctx.header)),
+        prepare=lambda ctx, n: ctx.own_comments(n),
+    ),
+    # --- 一括操作（100 件ずつ） ---
+    Scenario(
+        "bulk.create_entries",
+        lambda ctx, i, p: send("post", "/api/blog/bulk", {"items": bulk_items(f"b{i}")}, ctx),
+        requests=20,
+    ),
+    Scenario(
+        "bulk.update_entries",
+        lambda ctx, i, p: send(
+            "put", "/api/blog/bulk", {"items": [{"id": pk, "title": f"u{i}"} for pk in p]}, ctx
+        ),
+        prepare=lambda ctx, n: ctx.own_entries(100),
+        requests=20,
+    ),
+    Scenario(
+        "bulk.delete_entries",
+        lambda ctx, i, p: send("post", "/api/blog/bulk/delete", {"ids": p[i]}, ctx),
+        prepare=lambda ctx, n: [ctx.own_entries(100) for _ in range(n)],
+        requests=20,
+    ),
+    Scenario(
+        "bulk.create_comments",
+        lambda ctx, i, p: send(
+            "post",
+            "/api/blog/comments/bulk",
+            {"items": [{"blog_entry_id": ctx.any_entry(), "content": "b"} for _ in range(100)]},
+            ctx,
+        ),
+        requests=20,
+    ),
+    Scenario(
+        "bulk.update_comments",
+        lambda ctx, i, p: send(
+            "put",
+            "/api/blog/comments/bulk",
+            {"items": [{"id": pk, "content": f"u{i}"} for pk in p[1]]},
+            ctx,
+        ),
+        prepare=lambda ctx, n: ctx.own_comments(100),
+        requests=20,
+    ),
+    Scenario(
+        "bulk.delete_comments",
+        lambda ctx, i, p: send("post", "/api/blog/comments/bulk/delete", {"ids": p[i][1]}, ctx),
+        prepare=lambda ctx, n: [ctx.own_comments(100) for _ in range(n)],
+        requests=20,
+    ),
+    # --- 認証（パスワードのハッシュ計算が支配的なので回数を減らす） ---
+    Scenario(
+        "auth.register",
+        lambda ctx, i, p: send(
+            "post",
+            "/api/auth/register",
+            {"username": f"bench{i}", "email": f"bench{i}@example.com", "password": PASSWORD},
+            ctx,
+        ),
+        requests=10,
+    ),
+    Scenario(
+        "auth.login",
+        lambda ctx, i, p: send(
+            "post", "/api/auth/login", {"email": ctx.user.email, "password": PASSWORD}, ctx
+        ),
+        requests=10,
+    ),
+    Scenario(
+        "auth.logout",
+        lambda ctx, i, p: send(
+            "post",
+            "/api/auth/logout",
+            {"access_token": "x", "token_type": "bearer", "expires_in": 0},
+            ctx,
+        ),
+    ),
+    Scenario("auth.me", lambda ctx, i, p: ("get", "/api/auth/me", dict(ctx.header))),
+    Scenario("metrics", lambda ctx, i, p: get("/api/metrics")),
+]
+
+
+# --- 計測 ---------------------------------------------------------------------
+
+
+@contextmanager
+def count_queries():
+    from django.db import connection
+
+    counter = [0]
+
+    def wrapper(execute, sql, params, many, context):
+        counter[0] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield counter
+
+
+def call(client, request):
+    method, path, kwargs = request
+    data = kwargs.pop("data", None)
+    response = getattr(client, method)(path, data, **kwargs)
+    assert response.status_code < 400, (method, path, response.status_code, response.content[:200])
+    return response
+
+
+def run_scenario(client, ctx, scenario, count, alloc_samples, warmup):
+    requests = scenario.build(ctx, count + warmup + alloc_samples)
+    for request in requests[:warmup]:
+        call(client, request)
+
+    latencies, queries = [], 0
+    measured = requests[warmup : warmup + count]
+    started = time.perf_counter()
+    for request in measured:
+        with count_queries() as counter:
+            t0 = time.perf_counter()
+            call(client, request)
+            latencies.append(time.perf_counter() - t0)
+        queries += counter[0]
+    elapsed = time.perf_counter() - started
+
+    # tracemalloc はレイテンシを大きく悪化させるため、別のリクエストで計測する
+    peaks = []
+    tracemalloc.start()
+    try:
+        for request in requests[warmup + count :]:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            call(client, request)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+    finally:
+        tracemalloc.stop()
+
+    result = summarize(latencies, elapsed)
+    result["queries_per_request"] = round(queries / len(measured), 2) if measured else 0
+    result["alloc_peak_kb"] = round(sum(peaks) / len(peaks) / 1024, 1) if peaks else None
+    return result
+
+
+# --- 回帰の判定 ---------------------------------------------------------------------
+
+
+def find_regressions(results, baseline, max_regression, min_delta_ms):
+    """p95 が (1 + max_regression) 倍かつ min_delta_ms 以上悪化したか、クエリ数が増えたルート"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        p95, base_p95 = result["p95_ms"], before["p95_ms"]
+        if p95 > base_p95 * (1 + max_regression) and p95 - base_p95 >= min_delta_ms:
+            regressions.append(f"{name}: p95 {base_p95}ms -> {p95}ms")
+        if result["queries_per_request"] > before["queries_per_request"]:
+            regressions.append(
+                f"{name}: queries/request {before['queries_per_request']}"
+                f" -> {result['queries_per_request']}"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", choices=SCALES, default="full")
+    parser.add_argument("--requests", type=int, default=200, help="ルートごとのリクエスト数")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--alloc-samples", type=int, default=10)
+    parser.add_argument("--only", nargs="*", help="実行するシナリオ名（前方一致）")
+    parser.add_argument("--cache", action="store_true", help="レスポンスキャッシュを有効にする")
+    parser.add_argument("--async-views", action="store_true", help="非同期版のビューを使う")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="結果の JSON の出力先（省略時は標準出力）")
+    parser.add_argument("--baseline", help="比較対象の結果 JSON")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="許容する p95 の悪化率")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="p95 の悪化とみなす最小差")
+    args = parser.parse_args()
+
+    setup_django()
+    import django
+    from django.test import Client, override_settings
+
+    scale = SCALES[args.scale]
+    started = time.perf_counter()
+    users, entry_ids = seed_blog(**scale, password=PASSWORD)
+    seed_seconds = round(time.perf_counter() - started, 1)
+    ctx = Context(users, entry_ids, args.seed)
+
+    overrides = {}
+    if not args.cache:
+        overrides["CACHES"] = NO_CACHE
+    if args.async_views:
+        overrides["ROOT_URLCONF"] = "config.urls_async"
+
+    results = {}
+    with override_settings(**overrides):
+        client = Client()
+        for scenario in SCENARIOS:
+            if args.only and not any(scenario.name.startswith(name) for name in args.only):
+                continue
+            count = min(args.requests, scenario.requests or args.requests)
+            results[scenario.name] = run_scenario(
+                client, ctx, scenario, count, args.alloc_samples, args.warmup
+            )
+            print(f"{scenario.name}: {results[scenario.name]}", file=sys.stderr)
+
+    report = {
+        "config": {**vars(args), **scale, "seed_seconds": seed_seconds},
+        "environment": {
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "sqlite": sqlite3.sqlite_version,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = find_regressions(results, baseline, args.max_regression, args.min_delta_ms)
+        if regressions:
+            print("回帰を検出しました:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
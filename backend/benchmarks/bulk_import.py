@@ -0,0 +1,103 @@
+"""
+記事・コメントのインポート速度の比較（1 件ずつの POST と一括エンドポイント）。
+
+同じ件数の記事とコメントを、POST /api/blog/ と POST /api/blog/{id}/comments/ で 1 件ずつ作る場合と、
+POST /api/blog/bulk と POST /api/blog/comments/bulk で BULK_MAX_ITEMS 件ずつ作る場合の
+所要時間と行数/秒を比較する。1 件ずつの POST は遅いため、--single-rows 件で計測して行数/秒で比べる。
+
+    cd backend
+    python -m benchmarks.bulk_import --rows 10000 --single-rows 1000
+"""
+
+import argparse
+import json
+import time
+
+from .common import auth_header, setup_django
+
+
+def import_one_by_one(client, header, rows):
+    from blog.models import BlogEntry
+
+    started = time.perf_counter()
+    for i in range(rows):
+        response = client.post(
+            "/api/blog/",
+            {"title": f"title {i}", "content": f"content {i}"},
+            content_type="application/json",
+            **header,
+        )
+        assert response.status_code == 200, response.content[:200]
+        entry_id = response.json()["id"]
+        response = client.post(
+            f"/api/blog/{entry_id}/comments/",
+            {"blog_entry_id": entry_id, "content": f"comment {i}"},
+            content_type="application/json",
+            **header,
+        )
+        assert response.status_code == 200, response.content[:200]
+    elapsed = time.perf_counter() - started
+    assert BlogEntry.objects.count() == rows
+    return elapsed
+
+
+def import_in_bulk(client, header, rows):
+    from blog.models import BlogEntry
+    from blog.schemas import BULK_MAX_ITEMS
+
+    started = time.perf_counter()
+    for offset in range(0, rows, BULK_MAX_ITEMS):
+        chunk = range(offset, min(rows, offset + BULK_MAX_ITEMS))
+        items = [{"title": f"title {i}", "content": f"content {i}"} for i in chunk]
+        response = client.post(
+            "/api/blog/bulk", {"items": items}, content_type="application/json", **header
+        )
+        assert response.status_code == 200, response.content[:200]
+        entry_ids = [result["id"] for result in response.json()["results"]]
+        items = [
+            {"blog_entry_id": entry_id, "content": f"comment {i}"}
+            for i, entry_id in zip(chunk, entry_ids)
+        ]
+        response = client.post(
+            "/api/blog/comments/bulk", {"items": items}, content_type="application/json", **header
+        )
+        assert response.status_code == 200, response.content[:200]
+    elapsed = time.perf_counter() - started
+    assert BlogEntry.objects.count() == rows
+    return elapsed
+
+
+def result(rows, elapsed):
+    # 記事とコメントで 1 行ずつ
+    return {"seconds": round(elapsed, 3), "rows_per_second": round(rows * 2 / elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--single-rows", type=int, default=1000)
+    args = parser.parse_args()
+
+    setup_django()
+    from blog.models import BlogEntry
+    from django.contrib.auth import get_user_model
+    from django.test import Client
+
+    user = get_user_model().objects.create_user(username="importer", email="importer@example.com")
+    client, header = Client(), auth_header(user)
+
+    single = result(args.single_rows, import_one_by_one(client, header, args.single_rows))
+    BlogEntry.objects.all().delete()
+    bulk = result(args.rows, import_in_bulk(client, header, args.rows))
+
+    speedup = round(bulk["rows_per_second"] / single["rows_per_second"], 1)
+    print(
+        json.dumps(
+            {"config": vars(args), "one_by_one": single, "bulk": bulk, "speedup": speedup},
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
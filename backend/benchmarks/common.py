@@ -0,0 +1,201 @@
+"""
+ベンチマーク共通のヘルパー。
+
+ベンチマークは backend ディレクトリで `python -m benchmarks.<名前>` として実行する。
+開発用の db.sqlite3 には触れず、一時ディレクトリに作ったテスト用データベースを使う。
+"""
+
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+
+def setup_django():
+    """Django を初期化し、一時ファイルのテスト用データベースを作成する"""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    # ベンチマーク専用の鍵（.env が無くても動かせるようにする）
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-0123456789abcdef")
+
+    import django
+
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    if connection.vendor == "sqlite":
+        tmpdir = tempfile.mkdtemp(prefix="ninja2-bench-")
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(tmpdir, "bench.sqlite3")
+    # SQLite 以外では Django のテストと同じ test_<DB名> のデータベースを作り直す
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed_blog(users=10, entries=200, comments_per_entry=5, password=None, batch_size=5000):
+    """
+    ベンチマーク用のユーザー・記事・コメントを bulk_create でバッチごとに作成する。
+
+    password を指定すると全ユーザーに同じパスワードを設定する（ハッシュ計算は 1 回だけ）。
+    comment_count も作成時に設定する。戻り値は (ユーザーの一覧, 記事 id の一覧)。
+    """
+    from blog.models import BlogEntry, Comment
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from django.db import transaction
+
+    User = get_user_model()
+    hashed = make_password(password)
+    authors = []
+    for batch in batched(
+        (
+            User(username=f"user{i}", email=f"user{i}@example.com", password=hashed)
+            for i in range(users)
+        ),
+        batch_size,
+    ):
+        with transaction.atomic():
+            authors.extend(User.objects.bulk_create(batch))
+
+    entry_ids = []
+    entry_rows = (
+        BlogEntry(
+            title=f"title {i}",
+            content=f"content {i} " * 50,
+            author=authors[i % users],
+            comment_count=comments_per_entry,
+        )
+        for i in range(entries)
+    )
+    for batch in batched(entry_rows, batch_size):
+        with transaction.atomic():
+            entry_ids.extend(entry.id for entry in BlogEntry.objects.bulk_create(batch))
+
+    comment_rows = (
+        Comment(blog_entry_id=entry_id, content=f"comment {j}", author=authors[j % users])
+        for entry_id in entry_ids
+        for j in range(comments_per_entry)
+    )
+    for batch in batched(comment_rows, batch_size):
+        with transaction.atomic():
+            Comment.objects.bulk_create(batch)
+    return authors, entry_ids
+
+
+def auth_header(user):
+    """ログイン API と同じ形式の JWT を発行し、Authorization ヘッダーとして返す"""
+    import datetime
+
+    import jwt
+    from django.conf import settings
+
+    payload = {
+        "user_id": str(user.id),
+        "username": user.username,
+        "is_active": user.is_active,
+        "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=1),
+    }
+    token = jwt.encode(payload, settings.SECRET_KEY, algorithm="HS256")
+    return {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+
+@contextmanager
+def simulated_db_latency(seconds):
+    """すべてのデータベース接続のクエリごとに待ち時間を加える（スレッドごとの接続も含む）"""
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def on_connection_created(sender, connection, **kwargs):
+        connection.execute_wrappers.append(wrapper)
+
+    for conn in connections.all():
+        conn.execute_wrappers.append(wrapper)
+    connection_created.connect(on_connection_created)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(on_connection_created)
+        for conn in connections.all():
+            if wrapper in conn.execute_wrappers:
+                conn.execute_wrappers.remove(wrapper)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def summarize(latencies, elapsed):
+    """レイテンシ（秒）のリストから集計値（ミリ秒）を作る"""
+    return {
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+# --- ASGI アプリケーションを直接呼び出すための最小限のクライアント -------------
+
+
+async def asgi_request(app, method, path, query_string="", headers=None, body=b""):
+    """ASGI アプリケーションに HTTP リクエストを 1 件送り、(ステータス, 本文) を返す"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query_string.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"testserver"), *(headers or [])],
+        "server": ("testserver", 80),
+        "client": ("127.0.0.1", 50000),
+    }
+    request_sent = False
+    disconnected = asyncio.Event()
+    status = None
+    chunks = []
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    disconnected.set()
+    return status, b"".join(chunks)
@@ -0,0 +1,123 @@
+"""
+データベース接続の設定ごとのリクエスト処理時間の比較。
+
+同じ読み取りリクエストを WSGIHandler で 1 件ずつ処理し（リクエストの終了時に Django が
+CONN_MAX_AGE に従って接続を閉じる）、接続の確立にかかる分のオーバーヘッドを比較する。
+
+- SQLite: リクエストごとの接続（PRAGMA あり・なし）と永続接続 (CONN_MAX_AGE)
+- PostgreSQL (DB_ENGINE=django.db.backends.postgresql): リクエストごとの接続・永続接続・
+  コネクションプール（psycopg[pool] がある場合）
+
+    cd backend
+    python -m benchmarks.db_connections --requests 500
+"""
+
+import argparse
+import json
+import time
+
+from .common import seed_blog, setup_django, summarize
+
+NO_CACHE = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+
+def run_mode(paths, conn_max_age, options=None, pragmas=None):
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.db import connection
+    from django.db.backends.signals import connection_created
+    from django.test import override_settings
+    from django.test.client import RequestFactory
+
+    connects = []
+
+    def on_connection_created(sender, connection, **kwargs):
+        connects.append(connection.alias)
+
+    connection.close()
+    if connection.vendor == "postgresql":
+        connection.close_pool()
+    connection.settings_dict["CONN_MAX_AGE"] = conn_max_age
+    if options is not None:
+        connection.settings_dict["OPTIONS"] = options
+
+    factory = RequestFactory()
+    latencies = []
+    connection_created.connect(on_connection_created)
+    overrides = {"ROOT_URLCONF": "config.urls", "CACHES": NO_CACHE}
+    if pragmas is not None:
+        overrides["SQLITE_PRAGMAS"] = pragmas
+    try:
+        with override_settings(**overrides):
+            app = WSGIHandler()
+            started = time.perf_counter()
+            for path in paths:
+                begin = time.perf_counter()
+                statuses = []
+                response = app(
+                    factory.get(path).environ, lambda status, headers: statuses.append(status)
+                )
+                body = b"".join(response)
+                # WSGI サーバーと同じく close() で request_finished を送り、接続を閉じるか判断させる
+                response.close()
+                latencies.append(time.perf_counter() - begin)
+                assert statuses[0].startswith("200"), (statuses, body[:200])
+            elapsed = time.perf_counter() - started
+    finally:
+        connection_created.disconnect(on_connection_created)
+    result = summarize(latencies, elapsed)
+    result["connections_opened"] = len(connects)
+    result["settings"] = {
+        "CONN_MAX_AGE": conn_max_age,
+        "OPTIONS": connection.settings_dict["OPTIONS"],
+    }
+    return result
+
+
+def sqlite_modes(paths):
+    from django.conf import settings
+
+    return {
+        "per_request_plain": run_mode(paths, 0, pragmas={}),
+        "per_request_pragmas": run_mode(paths, 0, pragmas=settings.SQLITE_PRAGMAS),
+        "persistent": run_mode(paths, 60, pragmas=settings.SQLITE_PRAGMAS),
+    }
+
+
+def postgresql_modes(paths):
+    results = {
+        "per_request": run_mode(paths, 0, options={}),
+        "persistent": run_mode(paths, 60, options={}),
+    }
+    try:
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        return results
+    results["pool"] = run_mode(paths, 0, options={"pool": {"min_size": 1, "max_size": 4}})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--entries", type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+
+    _, entry_ids = seed_blog(entries=args.entries)
+    paths = [f"/api/blog/{entry_ids[i % len(entry_ids)]}" for i in range(args.requests)]
+
+    if connection.vendor == "sqlite":
+        results = sqlite_modes(paths)
+    else:
+        results = postgresql_modes(paths)
+    print(
+        json.dumps(
+            {"config": vars(args), "vendor": connection.vendor, "results": results}, indent=2
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
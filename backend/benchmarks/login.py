@@ -0,0 +1,98 @@
+"""
+ログイン API のスループット（1 コアあたりのログイン数/秒）。
+
+POST /api/auth/login を 1 スレッドで順に呼び出し、成功・パスワード誤り・存在しない
+メールアドレスのそれぞれについてログイン数/秒と 1 回あたりのクエリ数を計測する。
+パスワードハッシュの計算は CPU を占有するため、1 スレッドの値がそのまま 1 コアあたりの値になる。
+あわせて、発行したアクセストークンでの JWTAuth の認証（失効リストの照合を含む）の所要時間を計測する。
+--iterations で PBKDF2 の反復回数 (PASSWORD_HASH_ITERATIONS) を変えて比較できる。
+
+    cd backend
+    python -m benchmarks.login --logins 50 --iterations 600000
+"""
+
+import argparse
+import json
+import time
+
+from .common import seed_blog, setup_django, summarize
+
+PASSWORD = "bench-pass-1234-word"
+
+
+def run_logins(client, logins, emails, password):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    latencies = []
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        for i in range(logins):
+            begin = time.perf_counter()
+            response = client.post(
+                "/api/auth/login",
+                {"email": emails[i % len(emails)], "password": password},
+                content_type="application/json",
+            )
+            latencies.append(time.perf_counter() - begin)
+            assert response.status_code in (200, 401), response.content[:200]
+        elapsed = time.perf_counter() - started
+    result = summarize(latencies, elapsed)
+    result["queries_per_login"] = round(len(queries) / logins, 2)
+    return result
+
+
+def time_jwt_auth(token, rounds=10000):
+    """claims-only の JWTAuth.authenticate 1 回あたりのマイクロ秒（失効リストの照合あり・なし）"""
+    from auth_api.api import JWTAuth
+
+    auth = JWTAuth(claims_only=True)
+    auth.authenticate(None, token)  # 失効リストの初回の同期を済ませておく
+    timings = {}
+    for name, func in (
+        ("decode_only", lambda: auth.decode(token)),
+        ("authenticate", lambda: auth.authenticate(None, token)),
+    ):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            func()
+        timings[f"{name}_us"] = round((time.perf_counter() - started) / rounds * 1e6, 2)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=None, help="PBKDF2 の反復回数")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.contrib.auth.hashers import get_hasher
+    from django.test import Client
+
+    if args.iterations:
+        settings.PASSWORD_HASH_ITERATIONS = args.iterations
+    seed_blog(users=args.users, entries=0, comments_per_entry=0, password=PASSWORD)
+
+    client = Client()
+    emails = [f"user{i}@example.com" for i in range(args.users)]
+    unknown = [f"nobody{i}@example.com" for i in range(args.users)]
+    results = {
+        "success": run_logins(client, args.logins, emails, PASSWORD),
+        "wrong_password": run_logins(client, args.logins, emails, "wrong-password"),
+        "unknown_email": run_logins(client, args.logins, unknown, PASSWORD),
+    }
+    response = client.post(
+        "/api/auth/login",
+        {"email": emails[0], "password": PASSWORD},
+        content_type="application/json",
+    )
+    results["jwt_auth"] = time_jwt_auth(response.json()["access_token"])
+    config = {**vars(args), "iterations": get_hasher().iterations}
+    print(json.dumps({"config": config, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+本文の HTML 変換 (blog/rendering.py) のコストと、保存済みの HTML を使う場合の比較。
+
+- render_us / hash_us: 本文の大きさごとの、Markdown の変換 + サニタイズと content_hash だけの時間
+  （save() で本文が変わっていなければ hash だけで済む）
+- page: 記事一覧 1 ページ分（--limit 件）の HTML を、読み取りのたびに変換する場合と、
+  content_html を ?fields= で取得する場合のリクエスト時間
+- backfill: rebuild_content_html（--rows 件）の実行時間をプロセス数ごとに計測する
+
+    cd backend
+    python -m benchmarks.rendering --repeat 200 --rows 2000 --workers 1,4
+"""
+
+import argparse
+import json
+import time
+
+from .common import seed_blog, setup_django, summarize
+
+NO_CACHE = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+PARAGRAPH = (
+    "Django Ninja で **API** を作るときは、[ドキュメント](https://django-ninja.dev/) の"
+    "例を参考に `Router` を分けると見通しがよくなります。\n\n"
+)
+SECTION = (
+    "## 見出し\n\n"
+    + PARAGRAPH * 3
+    + "- 項目 1\n- 項目 2\n  - 入れ子の項目\n\n"
+    + "```python\n@router.get('/')\ndef index(request):\n    return {'ok': True}\n```\n\n"
+    + "| 列 | 値 |\n|:--|--:|\n| a | 1 |\n| b | 2 |\n\n"
+    + "> 引用 ~~取り消し~~\n\n"
+)
+# 本文の大きさの例（コメント・普通の記事・長い記事）
+SAMPLES = {"comment": PARAGRAPH, "entry": SECTION * 4, "long_entry": SECTION * 30}
+
+
+def time_per_call(func, text, repeat):
+    """func(text) の 1 回あたりのマイクロ秒"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(text)
+    return round((time.perf_counter() - started) / repeat * 1_000_000, 1)
+
+
+def time_page(params, repeat, on_read=False):
+    """記事一覧 1 ページ分のリクエスト時間。on_read なら本文を取得して HTML に変換する"""
+    from blog.rendering import render_markdown
+    from django.test import Client, override_settings
+
+    client = Client()
+    latencies = []
+    with override_settings(CACHES=NO_CACHE):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            begin = time.perf_counter()
+            response = client.get("/api/blog/", params)
+            assert response.status_code == 200, response.content[:200]
+            if on_read:
+                [render_markdown(item["content"]) for item in response.json()["items"]]
+            latencies.append(time.perf_counter() - begin)
+        elapsed = time.perf_counter() - started
+    return summarize(latencies, elapsed)
+
+
+def time_backfill(workers, batch_size):
+    from blog.derived import rebuild_content_html
+    from blog.models import BlogEntry
+
+    BlogEntry.objects.update(content_html="", content_hash="")
+    started = time.perf_counter()
+    rows = rebuild_content_html(BlogEntry, batch_size=batch_size, workers=workers)
+    elapsed = time.perf_counter() - started
+    # 2 回目はハッシュが一致するので変換しない
+    started = time.perf_counter()
+    rebuild_content_html(BlogEntry, batch_size=batch_size, workers=workers)
+    unchanged = time.perf_counter() - started
+    return {
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed, 1),
+        "unchanged_seconds": round(unchanged, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--workers", default="1,4", help="カンマ区切りのプロセス数")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+    from blog.models import BlogEntry
+    from blog.rendering import content_hash, render_markdown
+
+    results = {"per_document": {}}
+    for name, text in SAMPLES.items():
+        render_us = time_per_call(render_markdown, text, args.repeat)
+        hash_us = time_per_call(content_hash, text, args.repeat)
+        results["per_document"][name] = {
+            "bytes": len(text.encode()),
+            "render_us": render_us,
+            "hash_us": hash_us,
+            "render_to_hash_ratio": round(render_us / hash_us, 1),
+        }
+
+    seed_blog(entries=args.rows, comments_per_entry=0)
+    BlogEntry.objects.update(content=SAMPLES["entry"])
+    results["backfill"] = {
+        f"workers_{n}": time_backfill(int(n), args.batch_size) for n in args.workers.split(",")
+    }
+
+    results["page"] = {
+        "render_on_read": time_page(
+            {"limit": args.limit, "fields": "content"}, args.repeat, on_read=True
+        ),
+        "stored_html": time_page({"limit": args.limit, "fields": "content_html"}, args.repeat),
+    }
+    print(json.dumps({"config": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
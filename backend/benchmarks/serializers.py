@@ -0,0 +1,124 @@
+"""
+一覧レスポンスのシリアライズ方法の比較。
+
+1 ページ分（--limit 件）の記事一覧を、次の組み合わせで JSON にするまでの時間を計測する。
+検証は ninja と同じくページ全体のスキーマ (items + count) で行う。
+
+- 取得: モデルのインスタンス (blog_entry_queryset, from_attributes) / .values() の dict (blog_entry_rows)
+- エンコード: ninja の JSONRenderer / ORJSONRenderer
+
+orm_json が以前の経路、rows_orjson が現在の一覧エンドポイントの経路。
+
+あわせて /api/blog/?limit=... へのリクエスト全体の時間をレンダラーごとに計測する。
+
+    cd backend
+    python -m benchmarks.serializers --limit 100 --repeat 500
+"""
+
+import argparse
+import json
+import time
+from typing import List
+
+from .common import seed_blog, setup_django, summarize
+
+NO_CACHE = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+
+def page_schema():
+    from blog.schemas import BlogEntryResponse
+    from pydantic import BaseModel
+
+    class Page(BaseModel):
+        items: List[BlogEntryResponse]
+        count: int
+
+    return Page
+
+
+def time_pipeline(fetch, renderer, repeat, from_attributes):
+    """取得 → ページのスキーマで検証 → エンコードを repeat 回実行する"""
+    Page = page_schema()
+    stages = {"fetch": 0.0, "validate": 0.0, "render": 0.0}
+    latencies = []
+    size = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        items = fetch()
+        t1 = time.perf_counter()
+        data = Page.model_validate(
+            {"items": items, "count": len(items)}, from_attributes=from_attributes
+        ).model_dump()
+        t2 = time.perf_counter()
+        body = renderer.render(None, data, response_status=200)
+        t3 = time.perf_counter()
+        stages["fetch"] += t1 - t0
+        stages["validate"] += t2 - t1
+        stages["render"] += t3 - t2
+        latencies.append(t3 - t0)
+        size = len(body)
+    result = summarize(latencies, time.perf_counter() - started)
+    result["stages_mean_ms"] = {k: round(v / repeat * 1000, 3) for k, v in stages.items()}
+    result["body_bytes"] = size
+    return result
+
+
+def time_endpoint(renderer, limit, repeat):
+    """一覧エンドポイントへのリクエスト全体（ETag・COUNT(*) を含む）"""
+    from config.urls import api as ninja_api
+    from django.test import Client, override_settings
+
+    original = ninja_api.renderer
+    ninja_api.renderer = renderer
+    client = Client()
+    latencies = []
+    try:
+        with override_settings(CACHES=NO_CACHE):
+            started = time.perf_counter()
+            for _ in range(repeat):
+                begin = time.perf_counter()
+                response = client.get("/api/blog/", {"limit": limit})
+                latencies.append(time.perf_counter() - begin)
+                assert response.status_code == 200, response.content[:200]
+            elapsed = time.perf_counter() - started
+    finally:
+        ninja_api.renderer = original
+    return summarize(latencies, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=500)
+    parser.add_argument("--entries", type=int, default=1000)
+    args = parser.parse_args()
+
+    setup_django()
+    from blog.queries import blog_entry_queryset, blog_entry_rows
+    from config.renderers import ORJSONRenderer
+    from ninja.renderers import JSONRenderer
+
+    seed_blog(entries=args.entries)
+    limit = args.limit
+
+    def orm():
+        return list(blog_entry_queryset()[:limit])
+
+    def rows():
+        return list(blog_entry_rows()[:limit])
+
+    json_renderer, orjson_renderer = JSONRenderer(), ORJSONRenderer()
+    results = {
+        "orm_json": time_pipeline(orm, json_renderer, args.repeat, True),
+        "orm_orjson": time_pipeline(orm, orjson_renderer, args.repeat, True),
+        "rows_json": time_pipeline(rows, json_renderer, args.repeat, False),
+        "rows_orjson": time_pipeline(rows, orjson_renderer, args.repeat, False),
+        "endpoint_json": time_endpoint(json_renderer, limit, args.repeat),
+        "endpoint_orjson": time_endpoint(orjson_renderer, limit, args.repeat),
+    }
+    print(json.dumps({"config": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
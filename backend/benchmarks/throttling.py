@@ -0,0 +1,96 @@
+"""
+レート制限 (config/throttling.py) の 1 回の判定にかかる時間。
+
+RateThrottle.allow_request をリクエストごとに呼び、記録先・キーの種類・スレッド数ごとに
+1 回あたりのマイクロ秒を計測する。比較のため、ログイン 1 回分のパスワード検証の時間も出力する。
+
+    cd backend
+    python -m benchmarks.throttling --checks 100000 --threads 8
+"""
+
+import argparse
+import json
+import threading
+import time
+
+from .common import setup_django
+
+RATE = "1000000/min"  # 計測中に拒否されないレート
+
+
+def time_checks(throttle, requests, checks, threads=1):
+    """threads 個のスレッドで合計 checks 回判定し、1 回あたりのマイクロ秒を返す"""
+    per_thread = checks // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(offset):
+        barrier.wait()
+        for i in range(per_thread):
+            throttle.allow_request(requests[(offset + i) % len(requests)])
+
+    workers = [threading.Thread(target=worker, args=(n * 7919,)) for n in range(threads)]
+    for t in workers:
+        t.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return round(elapsed / (per_thread * threads) * 1_000_000, 3)
+
+
+def make_requests(count, email=False):
+    from django.test.client import RequestFactory
+
+    factory = RequestFactory()
+    requests = []
+    for i in range(count):
+        if email:
+            body = json.dumps({"email": f"user{i}@example.com", "password": "x"})
+            request = factory.post(
+                "/api/auth/login", body, content_type="application/json", REMOTE_ADDR="10.0.0.1"
+            )
+        else:
+            ip = f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+            request = factory.post("/api/auth/login", REMOTE_ADDR=ip)
+        requests.append(request)
+    return requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--checks", type=int, default=100_000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--keys", type=int, default=10_000)
+    args = parser.parse_args()
+
+    setup_django()
+    from config.throttling import CacheStore, LocalBucketStore, RateThrottle
+    from django.contrib.auth.hashers import check_password, make_password
+
+    single = make_requests(1)
+    many = make_requests(args.keys)
+    emails = make_requests(min(args.keys, 1000), email=True)
+
+    results = {}
+    for name, store in (("local", LocalBucketStore()), ("cache_locmem", CacheStore())):
+        ip = RateThrottle("bench", rate=RATE, store=store)
+        email = RateThrottle("bench_email", key="email", rate=RATE, store=store)
+        results[name] = {
+            "ip_single_key_us": time_checks(ip, single, args.checks),
+            "ip_many_keys_us": time_checks(ip, many, args.checks),
+            "email_from_body_us": time_checks(email, emails, args.checks),
+            f"ip_many_keys_{args.threads}_threads_us": time_checks(
+                ip, many, args.checks, threads=args.threads
+            ),
+        }
+
+    encoded = make_password("bench-pass-1234")
+    started = time.perf_counter()
+    check_password("bench-pass-1234", encoded)
+    results["password_check_us"] = round((time.perf_counter() - started) * 1_000_000, 1)
+    print(json.dumps({"config": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+WSGI（同期ビュー）と ASGI（非同期ビュー）の同時リクエスト処理性能の比較。
+
+クエリごとに待ち時間を加えて DB のレイテンシを模擬し、同じ読み取りリクエストを
+WSGI はスレッドプール、ASGI はイベントループ上で並行に処理させてスループットを比較する。
+
+    cd backend
+    python -m benchmarks.wsgi_vs_asgi --concurrency 32 --requests 640 --latency-ms 5
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .common import asgi_request, seed_blog, setup_django, simulated_db_latency, summarize
+
+# レスポンスキャッシュを無効にして、毎回ビューと ORM を通す
+NO_CACHE = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+
+def request_paths(entry_ids, count):
+    """一覧と詳細を交互に読むリクエストの一覧"""
+    paths = []
+    for i in range(count):
+        if i % 2:
+            paths.append((f"/api/blog/{entry_ids[i % len(entry_ids)]}", ""))
+        else:
+            paths.append(("/api/blog/", "limit=20"))
+    return paths
+
+
+def run_wsgi(paths, concurrency):
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.test import override_settings
+    from django.test.client import RequestFactory
+
+    factory = RequestFactory()
+
+    def call(path_and_query):
+        path, query = path_and_query
+        environ = factory.get(path, QUERY_STRING=query).environ
+        statuses = []
+        started = time.perf_counter()
+        body = b"".join(app(environ, lambda status, headers: statuses.append(status)))
+        elapsed = time.perf_counter() - started
+        assert statuses[0].startswith("200"), (statuses, body[:200])
+        return elapsed
+
+    with override_settings(ROOT_URLCONF="config.urls", CACHES=NO_CACHE):
+        app = WSGIHandler()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            started = time.perf_counter()
+            latencies = list(pool.map(call, paths))
+            elapsed = time.perf_counter() - started
+    return summarize(latencies, elapsed)
+
+
+def run_asgi(paths, concurrency):
+    from django.core.handlers.asgi import ASGIHandler
+    from django.test import override_settings
+
+    async def main(app):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call(path, query):
+            async with semaphore:
+                started = time.perf_counter()
+                status, body = await asgi_request(app, "GET", path, query)
+                elapsed = time.perf_counter() - started
+                assert status == 200, (status, body[:200])
+                return elapsed
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(call(path, query) for path, query in paths))
+        return latencies, time.perf_counter() - started
+
+    with override_settings(ROOT_URLCONF="config.urls_async", CACHES=NO_CACHE):
+        latencies, elapsed = asyncio.run(main(ASGIHandler()))
+    return summarize(latencies, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=320)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--entries", type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    _, entry_ids = seed_blog(entries=args.entries)
+    paths = request_paths(entry_ids, args.requests)
+
+    with simulated_db_latency(args.latency_ms / 1000):
+        results = {
+            "config": vars(args),
+            "wsgi": run_wsgi(paths, args.concurrency),
+            "asgi": run_asgi(paths, args.concurrency),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+BlogEntry の非正規化カラム (comment_count / last_activity_at) の更新。
+
+- comment_count: コメント数
+- last_activity_at: 最新コメントの投稿日時（コメントが無ければ記事の作成日時）
+
+コメント 1 件の作成・削除では、読み出しをせずに F() 式の UPDATE 1 回で更新する（signals.py）。
+一括作成・一括削除や修復ではコメントテーブルからのサブクエリで再計算する。
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .cache import bump_versions, entry_list_version_key, entry_version_key
+from .models import BlogEntry, Comment
+
+# defer_activity() のブロック内で更新が必要になった記事 id
+_deferred = ContextVar("deferred_activity", default=None)
+
+
+def comment_count_subquery():
+    return Coalesce(
+        Subquery(
+            Comment.objects.filter(blog_entry=OuterRef("pk"))
+            .order_by()
+            .values("blog_entry")
+            .annotate(count=Count("id"))
+            .values("count")
+        ),
+        0,
+    )
+
+
+def last_activity_subquery():
+    # (blog_entry, -created_at, -id) のインデックスで先頭 1 件だけを読む
+    latest = Comment.objects.filter(blog_entry=OuterRef("pk")).order_by("-created_at", "-id")
+    return Coalesce(Subquery(latest.values("created_at")[:1]), F("created_at"))
+
+
+@contextmanager
+def defer_activity():
+    """ブロック内のコメントの作成・削除による更新を、終了時の 1 回の再計算にまとめる"""
+    touched = set()
+    token = _deferred.set(touched)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+    if touched:
+        refresh_activity(touched)
+
+
+def comment_added(entry_id, created_at):
+    touched = _deferred.get()
+    if touched is not None:
+        touched.add(entry_id)
+        return
+    BlogEntry.objects.filter(id=entry_id).update(
+        comment_count=F("comment_count") + 1,
+        last_activity_at=Greatest(F("last_activity_at"), created_at),
+    )
+
+
+def comment_removed(entry_id):
+    touched = _deferred.get()
+    if touched is not None:
+        touched.add(entry_id)
+        return
+    BlogEntry.objects.filter(id=entry_id).update(
+        # 値がずれていても CHECK 制約 (>= 0) に違反しないようにする
+        comment_count=Greatest(F("comment_count") - 1, 0),
+        last_activity_at=last_activity_subquery(),
+    )
+
+
+def refresh_activity(entry_ids):
+    """指定した記事の comment_count / last_activity_at をコメントから再計算する（1 クエリ）"""
+    return BlogEntry.objects.filter(id__in=entry_ids).update(
+        comment_count=comment_count_subquery(), last_activity_at=last_activity_subquery()
+    )
+
+
+def repair_activity(batch_size=1000, progress=None):
+    """すべての記事を id 順のバッチで再計算する。戻り値は処理した件数"""
+    last_id, total = 0, 0
+    while True:
+        ids = list(
+            BlogEntry.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        refresh_activity(ids)
+        bump_versions(entry_list_version_key(), *(entry_version_key(pk) for pk in ids))
+        last_id, total = ids[-1], total + len(ids)
+        if progress:
+            progress(total)
+    return total
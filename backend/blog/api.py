@@ -1,71 +1,228 @@
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
 from auth_api.api import JWTAuth
-from django.http import HttpRequest
-from ninja import NinjaAPI, Router
+from auth_api.principal import as_user
+from config.replicas import read_from_replica
+from config.throttling import RateThrottle
+from django.http import Http404, HttpRequest, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from ninja import NinjaAPI, Path, Query, Router
+from ninja.decorators import decorate_view
+from ninja.errors import HttpError
 from ninja.pagination import paginate
 
-from .models import BlogEntry, Comment
+from . import bulk
+from .cache import (
+    cached_response,
+    comment_list_version_key,
+    entry_list_version_key,
+    entry_version_key,
+    invalidate_comments,
+    invalidate_entry,
+)
+from .conditional import (
+    blog_entry_detail_validators,
+    blog_entry_list_validators,
+    comment_list_validators,
+    conditional,
+)
+from .export import CONTENT_TYPE, iter_export
+from .loaders import batch_entries, parse_ids
+from .models import MAX_COMMENT_DEPTH, BlogEntry, Comment, entry_changes, with_rendered
+from .pagination import BlogEntryPagination, KeysetPagination
+from .queries import (
+    LIST_EXCLUDED_FIELDS,
+    OPTIONAL_FIELDS,
+    blog_entry_queryset,
+    blog_entry_rows,
+    comment_queryset,
+    comment_rows,
+    nested_comment_fields,
+    select_fields,
+)
 from .schemas import (
+    BlogEntryBatchResponse,
+    BlogEntryBulkCreate,
+    BlogEntryBulkUpdate,
     BlogEntryCreate,
+    BlogEntryDetailFields,
     BlogEntryDetailResponse,
+    BlogEntryFields,
     BlogEntryResponse,
     BlogEntryUpdate,
+    BlogSearchResponse,
+    BulkDelete,
+    BulkResponse,
+    CommentBulkCreate,
+    CommentBulkUpdate,
     CommentCreate,
+    CommentFields,
     CommentResponse,
+    CommentThreadResponse,
     CommentUpdate,
 )
+from .search import get_search_backend
+from .threads import delete_thread, get_parent, thread_page, thread_root, thread_rows
 
 # NinjaAPI インスタンスの作成
 api = NinjaAPI()
 
+# 書き込み系エンドポイントのユーザーごとのレート制限（settings.THROTTLE_RATES の write / bulk）
+write_throttle = RateThrottle("write", key="user")
+bulk_throttle = RateThrottle("bulk", key="user")
+
 # メインのブログルーター
 router = Router()
 
 
-@router.get("/", response=List[BlogEntryResponse])
-@paginate
-def list_blog_entries(request):
-    return BlogEntry.objects.all()
+def raise_not_owned(queryset):
+    """所有者条件付きの更新・削除が 0 件だった場合に、404 と 403 を区別して送出する"""
+    if queryset.exists():
+        raise HttpError(403, "Not authorized")
+    raise Http404
+
+
+def update_owned(queryset, owner_id, fields):
+    """
+    UPDATE ... WHERE id=? AND author_id=? の 1 クエリで、作者本人の場合だけ指定フィールドを更新する。
+    QuerySet.update() は auto_now を反映しないため updated_at を明示的に設定する。
+    """
+    updated = queryset.filter(author_id=owner_id).update(**fields, updated_at=timezone.now())
+    if not updated:
+        raise_not_owned(queryset)
+
+
+def delete_owned(queryset, owner_id):
+    """DELETE ... WHERE id=? AND author_id=? で、作者本人の場合だけ削除する"""
+    deleted, _ = queryset.filter(author_id=owner_id).delete()
+    if not deleted:
+        raise_not_owned(queryset)
+
+
+@router.get("/", response=List[BlogEntryFields], exclude_unset=True)
+@decorate_view(read_from_replica)
+@decorate_view(cached_response("list_blog_entries", lambda **kw: [entry_list_version_key()]))
+@conditional(blog_entry_list_validators)
+@paginate(BlogEntryPagination)
+def list_blog_entries(request, fields: Optional[str] = None):
+    """
+    記事一覧。本文 (content) の代わりに抜粋 (excerpt) を返す。
+    fields（カンマ区切り）で返すフィールドを指定すると、その列だけを取得する（content も指定できる）
+    """
+    return blog_entry_rows(names=select_fields(BlogEntryResponse, fields, LIST_EXCLUDED_FIELDS))
+
+
+@router.get("/search", response=BlogSearchResponse)
+def search_blog_entries(
+    request, q: str, limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None
+):
+    """全文検索（関連度順）。次ページは next の値を cursor に指定する"""
+    backend = get_search_backend()
+    if backend is None:
+        raise HttpError(501, "Search is not supported on this database")
+    items, next_cursor = backend.search(q, limit, cursor)
+    return {"items": items, "next": next_cursor}
+
+
+@router.get("/batch", response=BlogEntryBatchResponse, exclude_unset=True)
+@decorate_view(read_from_replica)
+def get_blog_entries_batch(request, ids: str, fields: Optional[str] = None):
+    """
+    カンマ区切りの ids（最大 100 件）の記事を、詳細と同じ形でまとめて返す（記事とコメントを 1 クエリずつで取得）。
+    結果は ids の順で、見つからない id は status が not_found になる。fields は詳細と同じ
+    """
+    keys, names = parse_ids(ids), select_fields(BlogEntryDetailResponse, fields, OPTIONAL_FIELDS)
+    return {"items": batch_entries(request, keys, names)}
+
+
+@router.get("/export")
+def export_blog_entries(request, since: Optional[datetime] = None, comments: bool = False):
+    """
+    全記事を NDJSON (1 行 1 記事) でストリーミングする。並び順は (changed_at, id) の昇順。
+    comments=true でコメントも含める。since を指定するとその日時以降に更新された記事だけ
+    （comments=true ではコメントが作成・更新された記事も）を返す
+    """
+    return StreamingHttpResponse(iter_export(since, comments), content_type=CONTENT_TYPE)
+
+
+# --- 一括操作 ------------------------------------------------------------------
+# /{entry_id} より先に登録する（"bulk" が entry_id として解釈されないように）
+
+
+@router.post("/bulk", response=BulkResponse, auth=JWTAuth(), throttle=bulk_throttle)
+def create_blog_entries_bulk(request, payload: BlogEntryBulkCreate):
+    """記事の一括作成"""
+    return {"results": bulk.create_entries(payload.items, as_user(request.auth))}
+
 
+@router.put("/bulk", response=BulkResponse, auth=JWTAuth(), throttle=bulk_throttle)
+def update_blog_entries_bulk(request, payload: BlogEntryBulkUpdate):
+    """記事の一括更新（作者本人の記事のみ。それ以外は項目ごとに forbidden / not_found）"""
+    return {"results": bulk.update_entries(payload.items, request.auth.id)}
 
-@router.get("/{entry_id}", response=BlogEntryDetailResponse)
-def get_blog_entry(request, entry_id: int):
-    entry = BlogEntry.objects.get(id=entry_id)
+
+@router.post("/bulk/delete", response=BulkResponse, auth=JWTAuth(), throttle=bulk_throttle)
+def delete_blog_entries_bulk(request, payload: BulkDelete):
+    """記事の一括削除"""
+    return {"results": bulk.delete_entries(payload.ids, request.auth.id)}
+
+
+@router.post("/comments/bulk", response=BulkResponse, auth=JWTAuth(), throttle=bulk_throttle)
+def create_comments_bulk(request, payload: CommentBulkCreate):
+    """コメントの一括作成（記事をまたいでよい）"""
+    return {"results": bulk.create_comments(payload.items, as_user(request.auth))}
+
+
+@router.put("/comments/bulk", response=BulkResponse, auth=JWTAuth(), throttle=bulk_throttle)
+def update_comments_bulk(request, payload: CommentBulkUpdate):
+    """コメントの一括更新"""
+    return {"results": bulk.update_comments(payload.items, request.auth.id)}
+
+
+@router.post("/comments/bulk/delete", response=BulkResponse, auth=JWTAuth(), throttle=bulk_throttle)
+def delete_comments_bulk(request, payload: BulkDelete):
+    """コメントの一括削除"""
+    return {"results": bulk.delete_comments(payload.ids, request.auth.id)}
+
+
+@router.get("/{entry_id}", response=BlogEntryDetailFields, exclude_unset=True)
+@decorate_view(read_from_replica)
+@decorate_view(
+    cached_response("get_blog_entry", lambda entry_id, **kw: [entry_version_key(entry_id)])
+)
+@conditional(blog_entry_detail_validators)
+def get_blog_entry(request, entry_id: int, fields: Optional[str] = None):
+    """記事の詳細とコメント。fields で返すフィールドを指定できる（comments を省くとコメントを取得しない）"""
+    names = select_fields(BlogEntryDetailResponse, fields, OPTIONAL_FIELDS)
+    entry = get_object_or_404(blog_entry_rows(names=names), id=entry_id)
+    if "comments" in names:
+        comments = comment_rows(names=nested_comment_fields(names))
+        entry["comments"] = list(comments.filter(blog_entry_id=entry_id))
     return entry
 
 
-@router.post("/", response=BlogEntryResponse, auth=JWTAuth())
+@router.post("/", response=BlogEntryResponse, auth=JWTAuth(), throttle=write_throttle)
 def create_blog_entry(request, payload: BlogEntryCreate):
     entry = BlogEntry.objects.create(
-        title=payload.title, content=payload.content, author=request.auth
+        title=payload.title, content=payload.content, author=as_user(request.auth)
     )
     return entry
 
 
-@router.put("/{entry_id}", response=BlogEntryResponse, auth=JWTAuth())
+@router.put("/{entry_id}", response=BlogEntryResponse, auth=JWTAuth(), throttle=write_throttle)
 def update_blog_entry(request, entry_id: int, payload: BlogEntryUpdate):
-    entry = BlogEntry.objects.get(id=entry_id)
+    entries = BlogEntry.objects.filter(id=entry_id)
+    update_owned(entries, request.auth.id, entry_changes(payload.dict(exclude_unset=True)))
+    # QuerySet.update() は post_save を送らないため、キャッシュは明示的に無効化する
+    invalidate_entry(entry_id)
+    return get_object_or_404(blog_entry_queryset(), id=entry_id)
 
-    # 認証済みユーザーが作者であることを確認
-    if entry.author != request.auth:
-        return router.api.create_response(request, {"detail": "Not authorized"}, status=403)
 
-    for attr, value in payload.dict(exclude_unset=True).items():
-        setattr(entry, attr, value)
-    entry.save()
-    return entry
-
-
-@router.delete("/{entry_id}", auth=JWTAuth())
+@router.delete("/{entry_id}", auth=JWTAuth(), throttle=write_throttle)
 def delete_blog_entry(request, entry_id: int):
-    entry = BlogEntry.objects.get(id=entry_id)
-
-    # 認証済みユーザーが作者であることを確認
-    if entry.author != request.auth:
-        return router.api.create_response(request, {"detail": "Not authorized"}, status=403)
-
-    entry.delete()
+    delete_owned(BlogEntry.objects.filter(id=entry_id), request.auth.id)
     return {"success": True}
 
 
@@ -73,43 +230,76 @@ def delete_blog_entry(request, entry_id: int):
 comment_router = Router()
 
 
-@comment_router.get("/", response=List[CommentResponse])
-@paginate
-def list_comments(request, blog_id: int):
-    return Comment.objects.filter(blog_entry_id=blog_id)
+@comment_router.get("/", response=List[CommentFields], exclude_unset=True)
+@decorate_view(read_from_replica)
+@decorate_view(
+    cached_response("list_comments", lambda blog_id, **kw: [comment_list_version_key(blog_id)])
+)
+@conditional(comment_list_validators)
+@paginate(KeysetPagination)
+def list_comments(
+    request, blog_id: Path[int], top_level: bool = False, fields: Optional[str] = None
+):
+    """
+    記事のコメント一覧（新しい順）。top_level=true で返信を除いたトップレベルのコメントだけ。
+    fields で返すフィールドを指定できる
+    """
+    names = select_fields(CommentResponse, fields, OPTIONAL_FIELDS)
+    rows = comment_rows(names=names).filter(blog_entry_id=blog_id)
+    if top_level:
+        rows = rows.filter(parent__isnull=True)
+    return rows
+
+
+@comment_router.get("/{comment_id}/thread", response=CommentThreadResponse, exclude_unset=True)
+@decorate_view(read_from_replica)
+def get_comment_thread(
+    request,
+    blog_id: Path[int],
+    comment_id: int,
+    depth: Optional[int] = Query(None, ge=0, le=MAX_COMMENT_DEPTH),
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, pattern=r"^\d+$"),
+    fields: Optional[str] = None,
+):
+    """
+    コメントとその返信のツリーを深さ優先の順で返す（サブツリー全体を 1 クエリで取得する）。
+    depth でコメントから何階層下までを含めるかを制限する。次ページは next の値を cursor に指定する。
+    fields で返すフィールドを指定できる
+    """
+    names = select_fields(CommentResponse, fields, OPTIONAL_FIELDS)
+    root = thread_root(blog_id, comment_id).first()
+    if root is None:
+        raise Http404
+    rows = list(thread_rows(blog_id, root, depth, cursor, names)[: limit + 1])
+    return thread_page(rows, limit)
 
 
-@comment_router.post("/", response=CommentResponse, auth=JWTAuth())
-def create_comment(request, blog_id: int, payload: CommentCreate):
+@comment_router.post("/", response=CommentResponse, auth=JWTAuth(), throttle=write_throttle)
+def create_comment(request, blog_id: Path[int], payload: CommentCreate):
+    parent = get_parent(blog_id, payload.parent_id)
     comment = Comment.objects.create(
-        content=payload.content, blog_entry_id=blog_id, author=request.auth
+        content=payload.content, blog_entry_id=blog_id, parent=parent, author=as_user(request.auth)
     )
     return comment
 
 
-@comment_router.put("/{comment_id}", response=CommentResponse, auth=JWTAuth())
-def update_comment(request, blog_id: int, comment_id: int, payload: CommentUpdate):
-    comment = Comment.objects.get(id=comment_id, blog_entry_id=blog_id)
-
-    # 認証済みユーザーが作者であることを確認
-    if comment.author != request.auth:
-        return router.api.create_response(request, {"detail": "Not authorized"}, status=403)
-
-    for attr, value in payload.dict(exclude_unset=True).items():
-        setattr(comment, attr, value)
-    comment.save()
-    return comment
-
-
-@comment_router.delete("/{comment_id}", auth=JWTAuth())
-def delete_comment(request, blog_id: int, comment_id: int):
-    comment = Comment.objects.get(id=comment_id, blog_entry_id=blog_id)
-
-    # 認証済みユーザーが作者であることを確認
-    if comment.author != request.auth:
-        return router.api.create_response(request, {"detail": "Not authorized"}, status=403)
-
-    comment.delete()
+@comment_router.put(
+    "/{comment_id}", response=CommentResponse, auth=JWTAuth(), throttle=write_throttle
+)
+def update_comment(request, blog_id: Path[int], comment_id: int, payload: CommentUpdate):
+    comments = Comment.objects.filter(id=comment_id, blog_entry_id=blog_id)
+    update_owned(comments, request.auth.id, with_rendered(payload.dict(exclude_unset=True)))
+    invalidate_comments(blog_id)
+    return get_object_or_404(comment_queryset(), id=comment_id, blog_entry_id=blog_id)
+
+
+@comment_router.delete("/{comment_id}", auth=JWTAuth(), throttle=write_throttle)
+def delete_comment(request, blog_id: Path[int], comment_id: int):
+    """コメントを返信ごと削除する"""
+    comments = Comment.objects.filter(id=comment_id, blog_entry_id=blog_id)
+    if not delete_thread(comments, request.auth.id):
+        raise_not_owned(comments)
     return {"success": True}
 
 
@@ -1,6 +1,36 @@
 from django.apps import AppConfig
+from django.core import checks
+from django.db.models.signals import post_migrate
 
 
 class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
+
+    def ready(self):
+        # シグナルハンドラを登録
+        from . import signals  # noqa: F401
+
+        post_migrate.connect(ensure_search_index, sender=self)
+
+        # レスポンスキャッシュのヒット率を /api/metrics に出す
+        from metrics.registry import registry
+
+        from .cache import cache_metrics, check_shared_cache
+
+        registry.register_collector(cache_metrics)
+
+        # レスポンスキャッシュを有効にしたのに、キャッシュをプロセス間で共有していない設定を検出する
+        checks.register(check_shared_cache, checks.Tags.caches)
+
+
+def ensure_search_index(sender, using, **kwargs):
+    """マイグレーション後に全文検索のトリガーを再作成する"""
+    from django.db import connections
+
+    from .search import get_search_backend
+
+    conn = connections[using]
+    backend = get_search_backend(conn.vendor)
+    if backend is not None:
+        backend.ensure_installed(conn)
@@ -0,0 +1,207 @@
+"""
+記事・コメントの一括作成・更新・削除。
+
+入力の形式はエンドポイントのスキーマで一括検証し（1 件でも不正なら 422）、
+存在と所有者の確認は id の一覧から 1 クエリでまとめて行う。確認と書き込み
+(bulk_create / bulk_update / 1 回の DELETE) は 1 トランザクションで実行する。
+結果は入力と同じ順序で、項目ごとのステータスとして返す。
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from .activity import defer_activity, refresh_activity
+from .cache import bump_versions, entry_list_version_key, invalidate_comments, invalidate_entry
+from .models import (
+    MAX_COMMENT_DEPTH,
+    BlogEntry,
+    Comment,
+    entry_changes,
+    make_excerpt,
+    path_segment,
+    with_rendered,
+)
+from .rendering import rendered_fields
+from .threads import PARENT_FIELDS, subtrees
+
+# bulk_create / bulk_update の 1 クエリあたりの行数
+BATCH_SIZE = 500
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+NOT_FOUND = "not_found"
+FORBIDDEN = "forbidden"
+INVALID = "invalid"
+
+
+def item_result(index, status, pk=None):
+    return {"index": index, "id": pk, "status": status}
+
+
+def check_owned(rows, index, pk, owner_id):
+    """rows ({id: author_id}) を使って 1 項目の権限を確認し、問題があれば結果を返す"""
+    if pk not in rows:
+        return item_result(index, NOT_FOUND, pk)
+    if rows[pk] != owner_id:
+        return item_result(index, FORBIDDEN, pk)
+    return None
+
+
+def create_entries(items, author):
+    """BlogEntryCreate の一覧から記事をまとめて作成する"""
+    # bulk_create は save() を通らないため、excerpt と HTML もここで作る
+    entries = [
+        BlogEntry(
+            title=item.title,
+            content=item.content,
+            excerpt=make_excerpt(item.content),
+            author=author,
+            **rendered_fields(item.content),
+        )
+        for item in items
+    ]
+    with transaction.atomic():
+        BlogEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+    # bulk_create は post_save を送らないため、キャッシュは明示的に無効化する
+    bump_versions(entry_list_version_key())
+    return [item_result(i, CREATED, entry.id) for i, entry in enumerate(entries)]
+
+
+def create_comments(items, author):
+    """
+    CommentCreate の一覧からコメントをまとめて作成する。
+    記事または返信先が無い項目は not_found、返信先が深さの上限に達している項目は invalid
+    """
+    entry_ids = {item.blog_entry_id for item in items}
+    parent_ids = {item.parent_id for item in items if item.parent_id is not None}
+    results, comments = [], []
+    with transaction.atomic():
+        existing = set(BlogEntry.objects.filter(id__in=entry_ids).values_list("id", flat=True))
+        parents = Comment.objects.only(*PARENT_FIELDS).in_bulk(parent_ids)
+        for index, item in enumerate(items):
+            parent = parents.get(item.parent_id)
+            if item.blog_entry_id not in existing or (
+                item.parent_id is not None
+                and (parent is None or parent.blog_entry_id != item.blog_entry_id)
+            ):
+                results.append(item_result(index, NOT_FOUND))
+                continue
+            if parent is not None and parent.depth >= MAX_COMMENT_DEPTH:
+                results.append(item_result(index, INVALID))
+                continue
+            comments.append(
+                Comment(
+                    content=item.content,
+                    blog_entry_id=item.blog_entry_id,
+                    parent=parent,
+                    depth=parent.depth + 1 if parent else 0,
+                    author=author,
+                    **rendered_fields(item.content),
+                )
+            )
+            results.append(item_result(index, CREATED))
+        Comment.objects.bulk_create(comments, batch_size=BATCH_SIZE)
+        # path は id が決まってから設定する（bulk_create は Comment.save() を呼ばない）
+        for comment in comments:
+            parent_path = comment.parent.path if comment.parent else ""
+            comment.path = parent_path + path_segment(comment.id)
+        Comment.objects.bulk_update(comments, ["path"], batch_size=BATCH_SIZE)
+        # bulk_create は post_save を送らないため、記事のコメント数はまとめて再計算する
+        refresh_activity({comment.blog_entry_id for comment in comments})
+
+    created = iter(comments)
+    for result in results:
+        if result["status"] == CREATED:
+            result["id"] = next(created).id
+    for blog_id in {comment.blog_entry_id for comment in comments}:
+        invalidate_comments(blog_id)
+    return results
+
+
+def update_objects(model, items, owner_id, extra_fields=(), prepare=None):
+    """
+    id 付きの更新内容の一覧を、作者本人のものだけまとめて更新する。
+
+    指定されたフィールドと id / author_id だけを読み込み、bulk_update で書き戻す。
+    prepare を指定すると、各項目の更新内容 (dict) を prepare(更新内容) に置き換える。
+    戻り値は (結果, 更新したインスタンスの一覧)。
+    """
+    changes = [item.dict(exclude_unset=True) for item in items]
+    if prepare is not None:
+        changes = [prepare(change) for change in changes]
+    fields = sorted({name for change in changes for name in change} - {"id"})
+    results, updated = [], {}
+    now = timezone.now()
+    with transaction.atomic():
+        objects = model.objects.only("id", "author", *fields, *extra_fields).in_bulk(
+            [item.id for item in items]
+        )
+        rows = {pk: obj.author_id for pk, obj in objects.items()}
+        for index, change in enumerate(changes):
+            pk = change.pop("id")
+            error = check_owned(rows, index, pk, owner_id)
+            if error:
+                results.append(error)
+                continue
+            obj = objects[pk]
+            for name, value in change.items():
+                setattr(obj, name, value)
+            obj.updated_at = now
+            updated[pk] = obj
+            results.append(item_result(index, UPDATED, pk))
+        model.objects.bulk_update(
+            list(updated.values()), [*fields, "updated_at"], batch_size=BATCH_SIZE
+        )
+    return results, list(updated.values())
+
+
+def update_entries(items, owner_id):
+    """BlogEntryBulkUpdate の一覧で記事をまとめて更新する"""
+    results, entries = update_objects(BlogEntry, items, owner_id, prepare=entry_changes)
+    for entry in entries:
+        invalidate_entry(entry.id)
+    return results
+
+
+def update_comments(items, owner_id):
+    """CommentBulkUpdate の一覧でコメントをまとめて更新する"""
+    results, comments = update_objects(
+        Comment, items, owner_id, extra_fields=["blog_entry"], prepare=with_rendered
+    )
+    for blog_id in {comment.blog_entry_id for comment in comments}:
+        invalidate_comments(blog_id)
+    return results
+
+
+def delete_objects(model, ids, owner_id, expand=None):
+    """
+    id の一覧のうち、作者本人のものだけを 1 回の DELETE で削除する。
+    expand を指定すると、削除するクエリセットを expand(クエリセット) に置き換える
+    """
+    results, owned = [], set()
+    with transaction.atomic():
+        rows = dict(model.objects.filter(id__in=ids).values_list("id", "author_id"))
+        for index, pk in enumerate(ids):
+            error = check_owned(rows, index, pk, owner_id)
+            if error:
+                results.append(error)
+                continue
+            owned.add(pk)
+            results.append(item_result(index, DELETED, pk))
+        # キャッシュの無効化は post_delete のシグナル (signals.py) で行われる。
+        # コメント数の更新は 1 件ごとではなく、削除後に記事ごとにまとめて再計算する
+        if owned:
+            targets = model.objects.filter(id__in=owned)
+            with defer_activity():
+                (expand(targets) if expand else targets).delete()
+    return results
+
+
+def delete_entries(ids, owner_id):
+    return delete_objects(BlogEntry, ids, owner_id)
+
+
+def delete_comments(ids, owner_id):
+    """コメントの一括削除（返信もサブツリーごと削除する）"""
+    return delete_objects(Comment, ids, owner_id, expand=subtrees)
@@ -0,0 +1,348 @@
+"""
+ブログの読み取り系エンドポイントのレスポンスキャッシュ。
+
+レンダリング済みの JSON バイト列を Django のキャッシュフレームワークに保存する。
+キャッシュキーには記事ごと・一覧ごとの「バージョン」を含めており、
+BlogEntry / Comment の post_save / post_delete でバージョンを上げることで
+古いエントリを一括で無効化する（signals.py）。
+
+バージョンは Django のキャッシュに置くため、キャッシュをすべてのプロセス（Web のワーカー・
+管理コマンド・ジョブのワーカー）で共有していないと、ほかのプロセスの書き込みで無効にならない。
+そのため、プロセスごとのキャッシュ (LocMemCache など) ではレスポンスキャッシュを使わない
+（cache_enabled / check_shared_cache）。
+"""
+
+import asyncio
+import hashlib
+import inspect
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+
+from config.replicas import primary_reads
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpRequest, HttpResponse
+from django.urls import resolve
+from django.utils.cache import get_conditional_response
+
+# キャッシュに保存するレスポンスヘッダー
+CACHED_HEADERS = ("Content-Type", "ETag")
+
+_stats = defaultdict(lambda: {"hit": 0, "miss": 0})
+_stats_lock = threading.Lock()
+
+
+# プロセスごとに別々になる（ほかのプロセスと共有できない）キャッシュのバックエンド
+PROCESS_LOCAL_CACHES = (LocMemCache, DummyCache)
+
+
+def get_cache():
+    return caches[getattr(settings, "BLOG_CACHE_ALIAS", "default")]
+
+
+def cache_enabled():
+    """
+    レスポンスキャッシュを使うか。BLOG_CACHE_ENABLED が None なら、キャッシュが
+    プロセス間で共有されるバックエンド (Redis・Memcached など) の場合だけ使う
+    """
+    enabled = getattr(settings, "BLOG_CACHE_ENABLED", None)
+    if enabled is None:
+        return not isinstance(get_cache(), PROCESS_LOCAL_CACHES)
+    return enabled
+
+
+def check_shared_cache(app_configs=None, **kwargs):
+    """BLOG_CACHE_ENABLED=True なのにキャッシュがプロセスごとの場合は起動時にエラーにする"""
+    if getattr(settings, "BLOG_CACHE_ENABLED", None) and isinstance(
+        get_cache(), PROCESS_LOCAL_CACHES
+    ):
+        return [
+            checks.Error(
+                "BLOG_CACHE_ENABLED=True requires a cache shared between processes.",
+                hint="Set CACHE_BACKEND to Redis or Memcached, or unset BLOG_CACHE_ENABLED.",
+                id="blog.E001",
+            )
+        ]
+    return []
+
+
+# --- バージョン管理 ------------------------------------------------------------
+
+
+def entry_version_key(entry_id):
+    return f"blog:ver:entry:{entry_id}"
+
+
+def entry_list_version_key():
+    return "blog:ver:entries"
+
+
+def comment_list_version_key(blog_id):
+    return f"blog:ver:comments:{blog_id}"
+
+
+def get_versions(keys):
+    """
+    バージョン番号をまとめて取得する。未設定のキーは現在時刻で初期化する。
+    （キャッシュから追い出された後に古いバージョン番号が再利用されないようにするため）
+    """
+    cache = get_cache()
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+async def aget_versions(keys):
+    """get_versions の非同期版"""
+    cache = get_cache()
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, time.time_ns(), timeout=None)
+            versions[key] = await cache.aget(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*keys):
+    """バージョンを上げて、そのバージョンを含むキャッシュキーをすべて無効にする"""
+    cache = get_cache()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate_entry(entry_id):
+    """記事の作成・更新・削除時に呼ぶ"""
+    bump_versions(
+        entry_version_key(entry_id), entry_list_version_key(), comment_list_version_key(entry_id)
+    )
+
+
+def invalidate_comments(blog_id):
+    """
+    コメントの作成・更新・削除時に呼ぶ
+    （記事詳細にはコメントが、記事一覧にはコメント数と最終アクティビティが含まれる）
+    """
+    bump_versions(
+        entry_version_key(blog_id), entry_list_version_key(), comment_list_version_key(blog_id)
+    )
+
+
+# --- 統計 ----------------------------------------------------------------------
+
+
+def record(route, outcome):
+    with _stats_lock:
+        _stats[route][outcome] += 1
+
+
+def cache_stats():
+    """ルートごとのヒット/ミス数のスナップショットを返す"""
+    with _stats_lock:
+        return {route: dict(counts) for route, counts in _stats.items()}
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def cache_metrics():
+    """/api/metrics 用に、ヒット/ミス数をカウンターとして返す"""
+    from metrics.registry import Counter
+
+    counter = Counter(
+        "blog_response_cache_total", "ブログのレスポンスキャッシュのヒット/ミス数", ("route", "result")
+    )
+    for route, counts in cache_stats().items():
+        for result, count in counts.items():
+            counter.inc(route, result, amount=count)
+    return [counter]
+
+
+# --- デコレーター --------------------------------------------------------------
+
+
+def make_key(route, versions, kwargs, request):
+    raw = repr((sorted(kwargs.items()), sorted(request.GET.lists()), versions))
+    digest = hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+    return f"blog:resp:{route}:{digest}"
+
+
+def cache_payload(response):
+    """キャッシュに保存する (本文, ヘッダー) を返す。保存しないレスポンスは None"""
+    if response.status_code != 200 or response.streaming:
+        return None
+    headers = {name: response[name] for name in CACHED_HEADERS if response.has_header(name)}
+    return response.content, headers
+
+
+def hit_response(route, request, cached):
+    """キャッシュ済みのバイト列からレスポンスを組み立てる（If-None-Match なども評価する）"""
+    record(route, "hit")
+    content, headers = cached
+    response = HttpResponse(content)
+    for name, value in headers.items():
+        response[name] = value
+    response = get_conditional_response(request, etag=headers.get("ETag"), response=response)
+    response["X-Cache"] = "HIT"
+    return response
+
+
+def cached_response(route, versions, timeout=None):
+    """
+    ninja の @decorate_view で使うビューデコレーター（同期・非同期どちらのビューにも対応）。
+
+    versions(**kwargs) はキャッシュキーに含めるバージョンキーの一覧を返す。
+    同じキーの再計算はロック (cache.add) で 1 リクエストに制限し、
+    ほかのリクエストは計算結果がキャッシュされるのを待つ。
+    キャッシュに保存するレスポンスは、read_from_replica のビューでも primary から読んで作る
+    （書き込み直後の新しいバージョンのキーに、レプリケーションが遅れたレプリカの古い内容を
+    保存すると、タイムアウトまで全員に古い内容を返すことになるため）。
+    書き込み直後で primary に固定されたリクエスト (request.read_primary) と、
+    cache_enabled() が False の場合はキャッシュを使わない。
+    """
+
+    def get_timeout():
+        if timeout is None:
+            return getattr(settings, "BLOG_CACHE_TIMEOUT", 300)
+        return timeout
+
+    def get_lock_timeout():
+        return getattr(settings, "BLOG_CACHE_LOCK_TIMEOUT", 10)
+
+    def use_cache(request):
+        return (
+            request.method == "GET"
+            and not getattr(request, "read_primary", False)
+            and cache_enabled()
+        )
+
+    def decorator(view):
+        if inspect.iscoroutinefunction(view):
+
+            @wraps(view)
+            async def async_view_with_cache(request, **kwargs):
+                if not use_cache(request):
+                    return await view(request, **kwargs)
+
+                cache = get_cache()
+                key = make_key(route, await aget_versions(versions(**kwargs)), kwargs, request)
+                cached = await cache.aget(key)
+
+                if cached is None:
+                    lock_key = f"{key}:lock"
+                    if await cache.aadd(lock_key, 1, timeout=get_lock_timeout()):
+                        try:
+                            record(route, "miss")
+                            with primary_reads():
+                                response = await view(request, **kwargs)
+                            payload = cache_payload(response)
+                            if payload is not None:
+                                await cache.aset(key, payload, timeout=get_timeout())
+                            response["X-Cache"] = "MISS"
+                            return response
+                        finally:
+                            await cache.adelete(lock_key)
+                    cached = await await_for(cache, key, lock_key, get_lock_timeout())
+                    if cached is None:
+                        record(route, "miss")
+                        return await view(request, **kwargs)
+
+                return hit_response(route, request, cached)
+
+            return async_view_with_cache
+
+        @wraps(view)
+        def view_with_cache(request, **kwargs):
+            if not use_cache(request):
+                return view(request, **kwargs)
+
+            cache = get_cache()
+            key = make_key(route, get_versions(versions(**kwargs)), kwargs, request)
+            cached = cache.get(key)
+
+            if cached is None:
+                lock_key = f"{key}:lock"
+                if cache.add(lock_key, 1, timeout=get_lock_timeout()):
+                    try:
+                        record(route, "miss")
+                        with primary_reads():
+                            response = view(request, **kwargs)
+                        payload = cache_payload(response)
+                        if payload is not None:
+                            cache.set(key, payload, timeout=get_timeout())
+                        response["X-Cache"] = "MISS"
+                        return response
+                    finally:
+                        cache.delete(lock_key)
+                cached = wait_for(cache, key, lock_key, get_lock_timeout())
+                if cached is None:
+                    # 待ちきれなかった場合はキャッシュせずに計算する
+                    record(route, "miss")
+                    return view(request, **kwargs)
+
+            return hit_response(route, request, cached)
+
+        return view_with_cache
+
+    return decorator
+
+
+def warm_request(path):
+    """
+    warm_responses 用の GET リクエスト（クエリ文字列・Cookie・認証なし）。
+    匿名の GET と同じキャッシュキーになる
+    """
+    request = HttpRequest()
+    request.method = "GET"
+    request.path = request.path_info = path
+    request.META["REQUEST_METHOD"] = "GET"
+    return request
+
+
+def warm_responses(*paths, urlconf="config.urls"):
+    """
+    paths の GET のビューを直接呼び、レスポンスキャッシュに載せる（ワーカーから使う。
+    ミドルウェアは通らないが、キャッシュするビューはミドルウェアの結果に依存しない）
+    """
+    for path in paths:
+        match = resolve(path, urlconf=urlconf)
+        match.func(warm_request(path), *match.args, **match.kwargs)
+
+
+def wait_for(cache, key, lock_key, lock_timeout):
+    """ほかのリクエストが計算中のキャッシュができあがるのを待つ"""
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.01)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+        if cache.get(lock_key) is None:
+            # 計算していたリクエストが失敗した
+            return cache.get(key)
+    return None
+
+
+async def await_for(cache, key, lock_key, lock_timeout):
+    """wait_for の非同期版"""
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+        cached = await cache.aget(key)
+        if cached is not None:
+            return cached
+        if await cache.aget(lock_key) is None:
+            return await cache.aget(key)
+    return None
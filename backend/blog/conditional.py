@@ -0,0 +1,126 @@
+"""
+ETag による条件付きリクエスト (304 Not Modified) のサポート。
+
+バリデータ (ETag) は DB の updated_at の最大値と件数などの集約を 1 クエリで計算し、
+If-None-Match が一致した場合はスキーマのシリアライズを行わずに 304 を返す。
+DB の状態から作るため、どのプロセス（Web のワーカー・管理コマンド・ジョブのワーカー）の
+書き込みでも変わる。件数を含めるので行の削除でも変わる。
+
+Last-Modified は付けない（updated_at の最大値は行の削除で変わらないため、
+If-Modified-Since だけを送るクライアントに古い内容で 304 を返してしまう）。
+"""
+
+import hashlib
+import inspect
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Max, Sum
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+
+from .models import BlogEntry, Comment
+
+# ninja に一時レスポンス (ヘッダー設定用) を渡してもらうための引数名
+RESPONSE_ARG = "conditional_response"
+
+
+def make_etag(request, *parts):
+    """集約値とクエリ文字列（ページ位置など）から弱い ETag を作る"""
+    query = sorted(request.GET.lists())
+    digest = hashlib.md5(repr((parts, query)).encode(), usedforsecurity=False).hexdigest()
+    return f'W/"{digest}"'
+
+
+def evaluate_conditions(validators, request, response, kwargs):
+    """
+    バリデータを計算し、条件に一致すれば 304 レスポンスを返す。
+    一致しなければ一時レスポンスに ETag を設定して None を返す。
+    """
+    etag = validators(request, **kwargs)
+    if not etag:
+        return None
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+    response.headers["ETag"] = etag
+    return None
+
+
+def conditional(validators):
+    """
+    ninja のビューに条件付きリクエストを追加するデコレーター（同期・非同期どちらのビューにも対応）。
+
+    validators(request, **kwargs) は ETag を返す。
+    対象が存在しない場合は None を返せば、そのままビューが実行される。
+    @paginate より外側（@router.get の直下）に付けること。
+    """
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def view_with_conditional(request, **kwargs):
+                response = kwargs.pop(RESPONSE_ARG)
+                not_modified = await sync_to_async(evaluate_conditions)(
+                    validators, request, response, kwargs
+                )
+                if not_modified is not None:
+                    return not_modified
+                return await func(request, **kwargs)
+
+        else:
+
+            @wraps(func)
+            def view_with_conditional(request, **kwargs):
+                response = kwargs.pop(RESPONSE_ARG)
+                not_modified = evaluate_conditions(validators, request, response, kwargs)
+                if not_modified is not None:
+                    return not_modified
+                return func(request, **kwargs)
+
+        # ninja が一時レスポンスを渡せるよう、HttpResponse 型の引数をシグネチャに追加する
+        signature = inspect.signature(func)
+        parameter = inspect.Parameter(
+            RESPONSE_ARG, inspect.Parameter.KEYWORD_ONLY, annotation=HttpResponse
+        )
+        params = [p for p in signature.parameters.values() if p.kind != p.VAR_KEYWORD]
+        view_with_conditional.__signature__ = signature.replace(parameters=[*params, parameter])
+        return view_with_conditional
+
+    return decorator
+
+
+# --- 各エンドポイントのバリデータ ---------------------------------------------
+
+
+def blog_entry_list_validators(request, **kwargs):
+    # 削除を検知するために件数も、コメント数の変化を検知するためにその合計も ETag に含める
+    stats = BlogEntry.objects.aggregate(
+        last=Max("updated_at"),
+        activity=Max("last_activity_at"),
+        count=Count("id"),
+        comments=Sum("comment_count"),
+    )
+    return make_etag(request, stats["last"], stats["activity"], stats["count"], stats["comments"])
+
+
+def blog_entry_detail_validators(request, entry_id, **kwargs):
+    # コメントの編集は updated_at の最大値で、削除は件数で検知する
+    rows = (
+        BlogEntry.objects.filter(id=entry_id)
+        .order_by()
+        .values("updated_at")
+        .annotate(last_comment=Max("comments__updated_at"), comment_count=Count("comments"))
+        .values_list("updated_at", "last_comment", "comment_count")
+    )[:1]
+    if not rows:
+        return None
+    return make_etag(request, entry_id, *rows[0])
+
+
+def comment_list_validators(request, blog_id, **kwargs):
+    stats = Comment.objects.filter(blog_entry_id=blog_id).aggregate(
+        last=Max("updated_at"), count=Count("id")
+    )
+    return make_etag(request, blog_id, stats["last"], stats["count"])
@@ -0,0 +1,112 @@
+"""
+記事・コメントの content から作る派生カラム (excerpt, content_html) の一括再計算。
+
+通常は save()（と QuerySet.update / bulk_update の前の with_excerpt / with_rendered）で更新される。
+カラムの追加後や作り方を変えた後に、既存の行を id 順のバッチで埋め直す。
+
+HTML の変換は CPU 負荷が高いため、rebuild_content_html は workers 個のプロセスで並列に変換する
+（DB の読み書きは親プロセスだけが行う）。content_hash が今の本文と一致する行は変換しない。
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from .cache import (
+    bump_versions,
+    comment_list_version_key,
+    entry_list_version_key,
+    entry_version_key,
+)
+from .models import RENDERED_FIELDS, BlogEntry, Comment, make_excerpt
+from .rendering import content_hash, render_markdown
+
+
+def rebuild_excerpts(batch_size=1000, progress=None, only_missing=True):
+    """
+    記事の excerpt を content から作り直す。only_missing なら excerpt が空の記事だけを対象にする。
+    戻り値は更新した件数
+    """
+    entries = BlogEntry.objects.order_by("id").only("id", "content", "excerpt")
+    if only_missing:
+        entries = entries.filter(excerpt="").exclude(content="")
+    last_id, total = 0, 0
+    while True:
+        batch = list(entries.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        changed = []
+        for entry in batch:
+            excerpt = make_excerpt(entry.content)
+            if excerpt != entry.excerpt:
+                entry.excerpt = excerpt
+                changed.append(entry)
+        # updated_at は変えない（内容の更新ではないため、エクスポートの差分同期の対象にしない）
+        BlogEntry.objects.bulk_update(changed, ["excerpt"])
+        if changed:
+            bump_versions(entry_list_version_key(), *(entry_version_key(e.pk) for e in changed))
+        last_id, total = batch[-1].id, total + len(changed)
+        if progress:
+            progress(total)
+    return total
+
+
+@contextmanager
+def render_pool(workers):
+    """本文の一覧を HTML の一覧に変換する関数（workers が 2 以上ならプロセスプールで並列に変換する）"""
+    if workers <= 1:
+        yield lambda contents: [render_markdown(content) for content in contents]
+        return
+    # fork は DB 接続などの状態を子プロセスに引き継いでしまうので spawn で起動する
+    # （子プロセスは Django に依存しない rendering.py だけを読み込む）
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+
+        def render_many(contents):
+            chunksize = max(1, len(contents) // (workers * 4))
+            return list(pool.map(render_markdown, contents, chunksize=chunksize))
+
+        yield render_many
+
+
+def stale_version_keys(model, objects):
+    """HTML を作り直した行を含むレスポンスキャッシュのバージョンのキー"""
+    if model is BlogEntry:
+        return [entry_list_version_key(), *(entry_version_key(obj.pk) for obj in objects)]
+    blog_ids = {obj.blog_entry_id for obj in objects}
+    return [
+        *(entry_version_key(blog_id) for blog_id in blog_ids),
+        *(comment_list_version_key(blog_id) for blog_id in blog_ids),
+    ]
+
+
+def rebuild_content_html(model, batch_size=500, workers=1, progress=None):
+    """
+    model (BlogEntry または Comment) の content_html を、content_hash が今の本文と
+    一致しない行（未作成、本文の変更、RENDERER_VERSION の変更）だけ作り直す。戻り値は更新した件数
+    """
+    # コメントはキャッシュの無効化に記事の id を使う
+    extra = ["blog_entry"] if model is Comment else []
+    rows = model.objects.order_by("id").only("id", "content", "content_hash", *extra)
+    last_id, total = 0, 0
+    with render_pool(workers) as render_many:
+        while True:
+            batch = list(rows.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            stale = []
+            for obj in batch:
+                digest = content_hash(obj.content)
+                if digest != obj.content_hash:
+                    obj.content_hash = digest
+                    stale.append(obj)
+            for obj, html in zip(stale, render_many([obj.content for obj in stale])):
+                obj.content_html = html
+            # updated_at は変えない（rebuild_excerpts と同じ）
+            model.objects.bulk_update(stale, RENDERED_FIELDS)
+            if stale:
+                bump_versions(*stale_version_keys(model, stale))
+            last_id, total = batch[-1].id, total + len(stale)
+            if progress:
+                progress(total)
+    return total
@@ -0,0 +1,77 @@
+"""
+記事（とコメント）の NDJSON エクスポート。
+
+1 行 1 記事の JSON を StreamingHttpResponse で返す。記事は .iterator(chunk_size=...) で
+チャンクごとに読み出し（PostgreSQL ではサーバーサイドカーソル）、コメントは
+チャンクごとの prefetch_related でまとめて取得するため、メモリ使用量は
+テーブルの大きさによらずチャンク 1 つ分で一定になる。
+
+並び順は (changed_at, id) の昇順。changed_at は記事の updated_at で、comments=true では
+記事とそのコメントの updated_at のうち最も新しいもの（コメントの作成・編集でも記事が再送される）。
+差分同期では前回受け取った最後の changed_at を since に指定する（その時刻と同じ記事も
+含めて返すため、受け取り側は id で上書きする）。削除された記事・コメントは行に現れないので、
+削除を反映するには since なしで全件を取り直す。
+"""
+
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment
+from .queries import blog_entry_detail_queryset, blog_entry_queryset
+from .schemas import BlogEntryDetailExport, BlogEntryExport, CommentExport
+
+# 1 回に読み出す記事の件数（レスポンスもこの件数ごとにまとめて送る）
+CHUNK_SIZE = 500
+
+CONTENT_TYPE = "application/x-ndjson"
+
+
+def comments_changed_at():
+    """記事のコメントのうち最後に更新された日時（コメントが無ければ記事の updated_at）"""
+    latest = Comment.objects.filter(blog_entry=OuterRef("pk")).order_by("-updated_at")
+    return Coalesce(Subquery(latest.values("updated_at")[:1]), F("updated_at"))
+
+
+def export_queryset(since=None, comments=False):
+    if comments:
+        queryset = blog_entry_detail_queryset(BlogEntryDetailExport, CommentExport)
+        queryset = queryset.annotate(changed_at=Greatest(F("updated_at"), comments_changed_at()))
+    else:
+        queryset = blog_entry_queryset(BlogEntryExport).annotate(changed_at=F("updated_at"))
+    if since is not None:
+        queryset = queryset.filter(changed_at__gte=since)
+    return queryset.order_by("changed_at", "id")
+
+
+def export_schema(comments=False):
+    return BlogEntryDetailExport if comments else BlogEntryExport
+
+
+def to_line(schema, entry):
+    return schema.model_validate(entry).model_dump_json().encode() + b"\n"
+
+
+def iter_export(since=None, comments=False, chunk_size=CHUNK_SIZE):
+    """エクスポートの本文をチャンクごとの bytes として返すジェネレーター"""
+    schema = export_schema(comments)
+    lines = []
+    for entry in export_queryset(since, comments).iterator(chunk_size=chunk_size):
+        lines.append(to_line(schema, entry))
+        if len(lines) >= chunk_size:
+            yield b"".join(lines)
+            lines = []
+    if lines:
+        yield b"".join(lines)
+
+
+async def aiter_export(since=None, comments=False, chunk_size=CHUNK_SIZE):
+    """iter_export の非同期版（ASGI で 1 チャンクごとにスレッドを切り替えないようにする）"""
+    schema = export_schema(comments)
+    lines = []
+    async for entry in export_queryset(since, comments).aiterator(chunk_size=chunk_size):
+        lines.append(to_line(schema, entry))
+        if len(lines) >= chunk_size:
+            yield b"".join(lines)
+            lines = []
+    if lines:
+        yield b"".join(lines)
@@ -0,0 +1,64 @@
+"""
+ブログのリクエスト単位のローダー (config/loaders.py の DataLoader)。
+
+- entry_loader(request, names): 記事 id → 記事の行（names のフィールド。comments を含めばコメントも）
+- user_loader(request): ユーザー id → ユーザー
+
+同じリクエストの中で同じ記事・ユーザーを何度参照しても、読み込みは id__in のクエリ 1 回にまとまる。
+"""
+
+from collections import defaultdict
+from functools import partial
+
+from config.loaders import request_loader
+from django.contrib.auth import get_user_model
+from ninja.errors import ValidationError
+
+from .queries import blog_entry_rows, comment_rows, nested_comment_fields
+from .schemas import BATCH_MAX_IDS
+
+
+def load_entries(ids, names):
+    """id__in の 1 クエリで記事を、comments を含む場合はもう 1 クエリでそれらのコメントを読み込む"""
+    entries = {row["id"]: row for row in blog_entry_rows(names=names).filter(id__in=ids)}
+    if "comments" in names and entries:
+        comments = defaultdict(list)
+        # 記事ごとに詳細と同じ順（新しい順）に並ぶ
+        rows = comment_rows(names=nested_comment_fields(names))
+        for row in rows.filter(blog_entry_id__in=list(entries)):
+            comments[row["blog_entry_id"]].append(row)
+        for pk, entry in entries.items():
+            entry["comments"] = comments[pk]
+    return entries
+
+
+def entry_loader(request, names):
+    return request_loader(
+        request, f"blog.entries:{','.join(names)}", partial(load_entries, names=names)
+    )
+
+
+def user_loader(request):
+    return request_loader(request, "users", get_user_model().objects.in_bulk)
+
+
+def parse_ids(ids):
+    """カンマ区切りの id の一覧を int のリストにする（順序と重複はそのまま）"""
+    try:
+        keys = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError as e:
+        raise ValidationError([{"ids": "ids must be comma-separated integers"}]) from e
+    if not keys or len(keys) > BATCH_MAX_IDS:
+        raise ValidationError([{"ids": f"Specify 1 to {BATCH_MAX_IDS} ids"}])
+    return keys
+
+
+def batch_entries(request, keys, names):
+    """keys の順に記事を返す。見つからない id は status が not_found の項目になる"""
+    entries = entry_loader(request, names).load_many(keys)
+    return [
+        {"id": key, "status": "ok", "entry": entry}
+        if entry is not None
+        else {"id": key, "status": "not_found", "entry": None}
+        for key, entry in zip(keys, entries)
+    ]
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from blog.derived import rebuild_content_html
+from blog.models import BlogEntry, Comment
+
+MODELS = {"entries": BlogEntry, "comments": Comment}
+
+
+class Command(BaseCommand):
+    help = "記事・コメントの本文の HTML (content_html) を、本文が変わった行だけ複数プロセスで作成します"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="1バッチで処理する件数")
+        parser.add_argument(
+            "--workers", type=int, default=1, help="HTML に変換するプロセス数（1 ならこのプロセスで変換する）"
+        )
+        parser.add_argument(
+            "--only", choices=sorted(MODELS), help="記事 (entries) かコメント (comments) だけを対象にする"
+        )
+
+    def handle(self, *args, **options):
+        names = [options["only"]] if options["only"] else list(MODELS)
+        for name in names:
+
+            def progress(count):
+                self.stdout.write(f"{name}: {count} 件更新しました")
+
+            total = rebuild_content_html(
+                MODELS[name],
+                batch_size=options["batch_size"],
+                workers=options["workers"],
+                progress=progress,
+            )
+            self.stdout.write(self.style.SUCCESS(f"{name}: HTML を作成しました（{total} 件）"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from blog.derived import rebuild_excerpts
+
+
+class Command(BaseCommand):
+    help = "ブログ記事の一覧用の抜粋 (excerpt) を本文からバッチ単位で作成します"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="1バッチで処理する件数")
+        parser.add_argument(
+            "--all", action="store_true", help="抜粋が空の記事だけでなく、すべての記事を作り直す"
+        )
+
+    def handle(self, *args, **options):
+        def progress(count):
+            self.stdout.write(f"{count} 件更新しました")
+
+        total = rebuild_excerpts(
+            batch_size=options["batch_size"], progress=progress, only_missing=not options["all"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"抜粋を作成しました（{total} 件）"))
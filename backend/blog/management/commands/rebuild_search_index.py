@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "ブログ記事の全文検索インデックスをバッチ単位で作り直します"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="1バッチで処理する件数")
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        if backend is None:
+            raise CommandError("このデータベースでは全文検索がサポートされていません")
+
+        def progress(count):
+            self.stdout.write(f"{count} 件処理しました")
+
+        total = backend.rebuild(batch_size=options["batch_size"], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f"検索インデックスを再構築しました（{total} 件）"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from blog.activity import repair_activity
+
+
+class Command(BaseCommand):
+    help = "ブログ記事のコメント数と最終アクティビティ日時をコメントからバッチ単位で再計算します"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="1バッチで処理する件数")
+
+    def handle(self, *args, **options):
+        def progress(count):
+            self.stdout.write(f"{count} 件処理しました")
+
+        total = repair_activity(batch_size=options["batch_size"], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f"コメント数を再計算しました（{total} 件）"))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogentry',
+            index=models.Index(fields=['-created_at', '-id'], name='blog_entry_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['blog_entry', '-created_at', '-id'], name='blog_comment_entry_created_idx'),
+        ),
+    ]
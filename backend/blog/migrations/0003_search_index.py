@@ -0,0 +1,66 @@
+from django.db import migrations
+
+# このマイグレーションの時点の blog.search の DDL の複製
+# （アプリのコードを import すると、後の変更でこのマイグレーションの内容が変わってしまう）
+SQLITE_INSTALL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS blog_entry_fts USING fts5("
+    "title, content, content='blog_blogentry', content_rowid='id')",
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_entry_fts_ai AFTER INSERT ON blog_blogentry BEGIN
+        INSERT INTO blog_entry_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_entry_fts_ad AFTER DELETE ON blog_blogentry BEGIN
+        INSERT INTO blog_entry_fts(blog_entry_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_entry_fts_au
+    AFTER UPDATE OF title, content ON blog_blogentry BEGIN
+        INSERT INTO blog_entry_fts(blog_entry_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO blog_entry_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    "INSERT INTO blog_entry_fts(blog_entry_fts) VALUES ('rebuild')",
+]
+SQLITE_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS blog_entry_fts_ai",
+    "DROP TRIGGER IF EXISTS blog_entry_fts_ad",
+    "DROP TRIGGER IF EXISTS blog_entry_fts_au",
+    "DROP TABLE IF EXISTS blog_entry_fts",
+]
+POSTGRES_INSTALL = [
+    "CREATE INDEX IF NOT EXISTS blog_entry_search_gin ON blog_blogentry USING GIN ("
+    "to_tsvector('simple'::regconfig, "
+    "COALESCE((title)::text, '') || ' ' || COALESCE((content)::text, '')))",
+]
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS blog_entry_search_gin",
+]
+
+INSTALL = {"sqlite": SQLITE_INSTALL, "postgresql": POSTGRES_INSTALL}
+UNINSTALL = {"sqlite": SQLITE_UNINSTALL, "postgresql": POSTGRES_UNINSTALL}
+
+
+def install_search_index(apps, schema_editor):
+    for sql in INSTALL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def uninstall_search_index(apps, schema_editor):
+    for sql in UNINSTALL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:05
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# 0003_search_index の時点の SQLite の全文検索のトリガーの複製（アプリのコードは import しない）
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_entry_fts_ai AFTER INSERT ON blog_blogentry BEGIN
+        INSERT INTO blog_entry_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_entry_fts_ad AFTER DELETE ON blog_blogentry BEGIN
+        INSERT INTO blog_entry_fts(blog_entry_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_entry_fts_au
+    AFTER UPDATE OF title, content ON blog_blogentry BEGIN
+        INSERT INTO blog_entry_fts(blog_entry_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO blog_entry_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+
+
+def backfill_comment_activity(apps, schema_editor):
+    BlogEntry = apps.get_model('blog', 'BlogEntry')
+    Comment = apps.get_model('blog', 'Comment')
+    comments = Comment.objects.filter(blog_entry=OuterRef('pk')).order_by()
+    BlogEntry.objects.update(
+        comment_count=Coalesce(
+            Subquery(comments.values('blog_entry').annotate(c=Count('id')).values('c')), 0
+        ),
+        last_activity_at=Coalesce(
+            Subquery(comments.order_by('-created_at', '-id').values('created_at')[:1]),
+            F('created_at'),
+        ),
+    )
+
+
+def reinstall_search_triggers(apps, schema_editor):
+    # SQLite では AddField でテーブルが作り直され、全文検索のトリガーが消えることがある
+    # （PostgreSQL の式インデックスは消えない）
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in SQLITE_TRIGGERS:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogentry',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='blogentry',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='blogentry',
+            index=models.Index(fields=['-last_activity_at', '-id'], name='blog_entry_activity_id_idx'),
+        ),
+        migrations.RunPython(backfill_comment_activity, migrations.RunPython.noop),
+        migrations.RunPython(reinstall_search_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_comment_activity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogentry',
+            index=models.Index(fields=['updated_at', 'id'], name='blog_entry_updated_id_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, LPad
+
+# このマイグレーションの時点の blog.models.PATH_SEGMENT_WIDTH（アプリのコードは import しない）
+PATH_SEGMENT_WIDTH = 10
+
+
+def backfill_comment_paths(apps, schema_editor):
+    # 既存のコメントはすべてトップレベル (path は自分の id だけ)
+    Comment = apps.get_model('blog', 'Comment')
+    Comment.objects.update(
+        path=LPad(Cast('id', CharField()), PATH_SEGMENT_WIDTH, Value('0'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_export_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='blog.comment'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=250),
+        ),
+        migrations.RunPython(backfill_comment_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('parent__isnull', True)), fields=['blog_entry', '-created_at', '-id'], name='blog_comment_toplevel_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['blog_entry', 'path'], name='blog_comment_thread_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:43
+
+from django.db import migrations, models
+
+# このマイグレーションの時点の blog.models.EXCERPT_LENGTH / make_excerpt の複製
+# （アプリのコードを import すると、後の変更でこのマイグレーションの結果が変わってしまう）
+EXCERPT_LENGTH = 200
+BATCH_SIZE = 1000
+
+
+def make_excerpt(content):
+    text = ' '.join(content.split())
+    if len(text) <= EXCERPT_LENGTH:
+        return text
+    return text[: EXCERPT_LENGTH - 1] + '…'
+
+
+def backfill_excerpts(apps, schema_editor):
+    # 既存の記事の excerpt を id 順のバッチで埋める（バッチごとにコミットする）
+    BlogEntry = apps.get_model('blog', 'BlogEntry')
+    entries = (
+        BlogEntry.objects.using(schema_editor.connection.alias)
+        .filter(excerpt='')
+        .exclude(content='')
+        .order_by('id')
+        .only('id', 'content')
+    )
+    last_id = 0
+    while True:
+        batch = list(entries.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        for entry in batch:
+            entry.excerpt = make_excerpt(entry.content)
+        BlogEntry.objects.using(schema_editor.connection.alias).bulk_update(batch, ['excerpt'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    # 大きなテーブルでも 1 つの長いトランザクションにしない
+    atomic = False
+
+    dependencies = [
+        ('blog', '0006_comment_threads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogentry',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.RunPython(backfill_excerpts, migrations.RunPython.noop),
+    ]
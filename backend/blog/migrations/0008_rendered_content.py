@@ -0,0 +1,99 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:49
+
+import hashlib
+
+import nh3
+from django.db import migrations, models
+from markdown_it import MarkdownIt
+
+# このマイグレーションの時点の blog.rendering (RENDERER_VERSION = "1") の複製
+# （アプリのコードを import すると、後の変更でこのマイグレーションの結果が変わってしまう。
+# 後で RENDERER_VERSION を上げた場合は、rebuild_content_html がハッシュの違う行を作り直す）
+RENDERER_VERSION = '1'
+ALLOWED_TAGS = set(
+    'a blockquote br code del em h1 h2 h3 h4 h5 h6 hr img li ol p pre s strong'
+    ' table tbody td th thead tr ul'.split()
+)
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title'},
+    'img': {'src', 'alt', 'title'},
+    'ol': {'start'},
+    'code': {'class'},
+    'td': {'style'},
+    'th': {'style'},
+}
+ALLOWED_URL_SCHEMES = {'http', 'https', 'mailto'}
+ALLOWED_STYLES = {'text-align'}
+BATCH_SIZE = 500
+
+
+def render_markdown(markdown, text):
+    return nh3.clean(
+        markdown.render(text),
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        url_schemes=ALLOWED_URL_SCHEMES,
+        filter_style_properties=ALLOWED_STYLES,
+        link_rel='nofollow noopener noreferrer',
+    )
+
+
+def content_hash(text):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(RENDERER_VERSION.encode())
+    digest.update(b'\0')
+    digest.update(text.encode())
+    return digest.hexdigest()
+
+
+def backfill_content_html(apps, schema_editor):
+    # 既存の記事・コメントの HTML を id 順のバッチで作る（バッチごとにコミットする）
+    markdown = MarkdownIt('commonmark', {'html': False}).enable(['table', 'strikethrough'])
+    for model_name in ('BlogEntry', 'Comment'):
+        model = apps.get_model('blog', model_name)
+        manager = model.objects.using(schema_editor.connection.alias)
+        rows = manager.filter(content_hash='').order_by('id').only('id', 'content')
+        last_id = 0
+        while True:
+            batch = list(rows.filter(id__gt=last_id)[:BATCH_SIZE])
+            if not batch:
+                break
+            for obj in batch:
+                obj.content_html = render_markdown(markdown, obj.content)
+                obj.content_hash = content_hash(obj.content)
+            manager.bulk_update(batch, ['content_html', 'content_hash'])
+            last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    # 大きなテーブルでも 1 つの長いトランザクションにしない
+    atomic = False
+
+    dependencies = [
+        ('blog', '0007_entry_excerpt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogentry',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='blogentry',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(backfill_content_html, migrations.RunPython.noop),
+    ]
@@ -1,27 +1,135 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
+
+from .rendering import content_hash, render_markdown, rendered_fields
+
+# コメントの path の 1 階層分の桁数（id を 0 埋めした 10 進数）
+PATH_SEGMENT_WIDTH = 10
+# 返信の最大の深さ（トップレベルのコメントが 0）。path の長さの上限もこれで決まる
+MAX_COMMENT_DEPTH = 24
+
+
+# 記事一覧に載せる本文の抜粋 (excerpt) の最大文字数
+EXCERPT_LENGTH = 200
+# content から作る HTML とそのハッシュのフィールド（BlogEntry と Comment で共通）
+RENDERED_FIELDS = ("content_html", "content_hash")
+
+
+def path_segment(pk):
+    return f"{pk:0{PATH_SEGMENT_WIDTH}d}"
+
+
+def make_excerpt(content):
+    """本文の抜粋（空白をまとめ、EXCERPT_LENGTH 文字を超える分は「…」で省略する）"""
+    text = " ".join(content.split())
+    if len(text) <= EXCERPT_LENGTH:
+        return text
+    return text[: EXCERPT_LENGTH - 1] + "…"
+
+
+def with_excerpt(changes):
+    """記事の更新内容に content があれば excerpt を加える（save() を通らない QuerySet.update / bulk_update 用）"""
+    if changes.get("content") is None:
+        return changes
+    return {**changes, "excerpt": make_excerpt(changes["content"])}
+
+
+def with_rendered(changes):
+    """更新内容に content があれば content_html / content_hash を加える（with_excerpt と同じ用途）"""
+    if changes.get("content") is None:
+        return changes
+    return {**changes, **rendered_fields(changes["content"])}
+
+
+def entry_changes(changes):
+    """記事の更新内容に、content から作る派生カラム (excerpt, content_html, content_hash) を加える"""
+    return with_rendered(with_excerpt(changes))
+
+
+def render_content(obj):
+    """
+    obj.content の HTML を content_html に設定する。content_hash が今の本文と一致していれば
+    （本文が変わっていなければ）変換しない。変換したかを返す
+    """
+    digest = content_hash(obj.content)
+    if digest == obj.content_hash:
+        return False
+    obj.content_html, obj.content_hash = render_markdown(obj.content), digest
+    return True
+
+
+def add_update_fields(kwargs, *names):
+    """save(update_fields=...) に content が含まれていれば、content から作るフィールドも加える"""
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and "content" in update_fields:
+        kwargs["update_fields"] = {*update_fields, *names}
 
 
 class BlogEntry(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
+    # 一覧用の本文の抜粋（save() で content から作る。一覧では content を読まない）
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, editable=False)
+    # content を Markdown として変換した HTML（save() で、content_hash が変わったときだけ作り直す）
+    content_html = models.TextField(blank=True, editable=False)
+    content_hash = models.CharField(max_length=32, blank=True, editable=False)
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="blog_entries"
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # コメントから非正規化した値（activity.py で更新する）
+    comment_count = models.PositiveIntegerField(default=0)
+    last_activity_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ["-created_at"]
         verbose_name_plural = "Blog entries"
+        indexes = [
+            # キーセットページネーション (created_at, id) 用
+            models.Index(fields=["-created_at", "-id"], name="blog_entry_created_id_idx"),
+            # 「最近コメントがあった順」のキーセットページネーション用
+            models.Index(fields=["-last_activity_at", "-id"], name="blog_entry_activity_id_idx"),
+            # エクスポートの差分同期 (updated_at, id) 用
+            models.Index(fields=["updated_at", "id"], name="blog_entry_updated_id_idx"),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.excerpt = make_excerpt(self.content)
+        render_content(self)
+        add_update_fields(kwargs, "excerpt", *RENDERED_FIELDS)
+        super().save(*args, **kwargs)
+
+    @property
+    def author_username(self):
+        return self.author.username
+
 
 class Comment(models.Model):
+    """
+    記事へのコメント。parent を指定すると返信になる。
+
+    path は祖先から自分までの id を PATH_SEGMENT_WIDTH 桁ずつ連結した文字列（マテリアライズドパス）。
+    あるコメント以下のスレッドは path の範囲検索 1 回で、深さ優先の順 (path 順) に取得できる
+    （threads.py）。path は id が決まってから設定するため、作成時は INSERT の後に UPDATE を行う。
+    """
+
     blog_entry = models.ForeignKey(BlogEntry, on_delete=models.CASCADE, related_name="comments")
+    parent = models.ForeignKey(
+        "self", on_delete=models.CASCADE, null=True, blank=True, related_name="replies"
+    )
+    path = models.CharField(
+        max_length=PATH_SEGMENT_WIDTH * (MAX_COMMENT_DEPTH + 1), blank=True, editable=False
+    )
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
     content = models.TextField()
+    # BlogEntry と同じ（content の HTML とハッシュ）
+    content_html = models.TextField(blank=True, editable=False)
+    content_hash = models.CharField(max_length=32, blank=True, editable=False)
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="blog_comments"
     )
@@ -30,6 +138,39 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # 記事ごとのキーセットページネーション (blog_entry, created_at, id) 用
+            models.Index(
+                fields=["blog_entry", "-created_at", "-id"], name="blog_comment_entry_created_idx"
+            ),
+            # トップレベルのコメントだけの新しい順の一覧用（返信は含めない部分インデックス）
+            models.Index(
+                fields=["blog_entry", "-created_at", "-id"],
+                condition=models.Q(parent__isnull=True),
+                name="blog_comment_toplevel_idx",
+            ),
+            # スレッド（サブツリー）の path の範囲検索と path 順の取得用
+            models.Index(fields=["blog_entry", "path"], name="blog_comment_thread_idx"),
+        ]
 
     def __str__(self):
         return f"Comment by {self.author.username} on {self.blog_entry.title}"
+
+    def save(self, *args, **kwargs):
+        render_content(self)
+        add_update_fields(kwargs, *RENDERED_FIELDS)
+        if self.path:
+            return super().save(*args, **kwargs)
+        # 新規作成: INSERT で id を決めてから path を設定する
+        parent_path = ""
+        if self.parent_id is not None:
+            # parent にインスタンスを渡していなければここで読み込まれる
+            parent_path, self.depth = self.parent.path, self.parent.depth + 1
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+            self.path = parent_path + path_segment(self.pk)
+            Comment.objects.using(self._state.db).filter(pk=self.pk).update(path=self.path)
+
+    @property
+    def author_username(self):
+        return self.author.username
@@ -0,0 +1,182 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Literal, Optional
+
+from django.db.models import F, Q, QuerySet
+from django.http import HttpRequest
+from ninja import Field, Schema
+from ninja.conf import settings as ninja_settings
+from ninja.errors import ValidationError
+from ninja.pagination import AsyncPaginationBase
+
+
+class KeysetPagination(AsyncPaginationBase):
+    """
+    (key_field, id) の複合キーによるカーソル（キーセット）ページネーション。
+    key_field はデフォルトで created_at。
+
+    `cursor` パラメータを指定したリクエストだけがキーセットモードになり、
+    指定しない場合は従来どおりの LIMIT/OFFSET + COUNT(*) で応答する。
+    最初のページは `?cursor=` （空文字）で取得する。
+    キーセットモードでは `with_count=true` のときだけ COUNT(*) を実行する。
+    """
+
+    # BlogEntry / Comment の Meta.ordering (-created_at) に id を加えて一意にしたもの
+    key_field = "created_at"
+    # .values() のクエリセットが key_field を選択していない場合（?fields= で省いた場合）に、
+    # カーソルを作るために追加で取得する別名（レスポンスのスキーマには含まれない）
+    cursor_key = "cursor_key"
+
+    class Input(Schema):
+        limit: int = Field(ninja_settings.PAGINATION_PER_PAGE, ge=1)
+        offset: int = Field(0, ge=0)
+        cursor: Optional[str] = None
+        with_count: bool = False
+
+    class Output(Schema):
+        items: List[Any]
+        count: Optional[int] = None
+        next: Optional[str] = None
+        prev: Optional[str] = None
+
+    def __init__(self, max_limit: int = ninja_settings.PAGINATION_MAX_LIMIT, **kwargs: Any) -> None:
+        self.max_limit = max_limit
+        super().__init__(**kwargs)
+
+    def get_key_field(self, pagination: Input) -> str:
+        """並び順のキーにするフィールド名（リクエストごとに切り替える場合はオーバーライドする）"""
+        return self.key_field
+
+    @staticmethod
+    def ordering(field: str, reverse: bool = False):
+        return (field, "id") if reverse else (f"-{field}", "-id")
+
+    # --- カーソルのエンコード/デコード -------------------------------------
+
+    @classmethod
+    def encode_cursor(cls, item: Any, field: str, reverse: bool = False) -> str:
+        """アイテム（モデルのインスタンスまたは .values() の dict）の (key_field, id) を不透明なカーソル文字列に変換する"""
+        if isinstance(item, dict):
+            value, pk = item.get(field, item.get(cls.cursor_key)), item["id"]
+        else:
+            value, pk = getattr(item, field), item.id
+        data = {"c": value.isoformat(), "i": pk}
+        if reverse:
+            data["r"] = 1
+        raw = json.dumps(data, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str):
+        """カーソル文字列を (key_field の値, id, reverse) に戻す。空文字は先頭ページ"""
+        if not cursor:
+            return None
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            return datetime.fromisoformat(data["c"]), int(data["i"]), bool(data.get("r"))
+        except (ValueError, TypeError, KeyError, binascii.Error) as e:
+            raise ValidationError([{"cursor": "Invalid cursor"}]) from e
+
+    # --- クエリ組み立て ------------------------------------------------------
+
+    def _keyset_queryset(self, queryset: QuerySet, position, field: str) -> QuerySet:
+        """カーソル位置より後ろ（reverse の場合は前）の行に絞り込む"""
+        if queryset._fields and field not in queryset._fields:
+            queryset = queryset.annotate(**{self.cursor_key: F(field)})
+        if position is None:
+            return queryset.order_by(*self.ordering(field))
+
+        value, pk, reverse = position
+        if reverse:
+            condition = Q(**{f"{field}__gt": value}) | Q(**{field: value, "id__gt": pk})
+            return queryset.filter(condition).order_by(*self.ordering(field, reverse=True))
+
+        condition = Q(**{f"{field}__lt": value}) | Q(**{field: value, "id__lt": pk})
+        return queryset.filter(condition).order_by(*self.ordering(field))
+
+    def _keyset_page(self, rows: List[Any], limit: int, position, field: str) -> dict:
+        """limit + 1 件取得した結果からページと前後のカーソルを組み立てる"""
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        reverse = position is not None and position[2]
+        if reverse:
+            rows.reverse()
+
+        next_cursor = prev_cursor = None
+        if rows:
+            # 逆方向に辿ってきた場合、次ページは必ず存在する
+            if has_more or reverse:
+                next_cursor = self.encode_cursor(rows[-1], field)
+            # 先頭ページ以外で、さらに前が残っている場合のみ prev を返す
+            if position is not None and (has_more or not reverse):
+                prev_cursor = self.encode_cursor(rows[0], field, reverse=True)
+
+        return {self.items_attribute: rows, "count": None, "next": next_cursor, "prev": prev_cursor}
+
+    # --- PaginationBase の実装 -----------------------------------------------
+
+    def paginate_queryset(
+        self, queryset: QuerySet, pagination: Input, request: HttpRequest, **params: Any
+    ) -> Any:
+        limit = min(pagination.limit, self.max_limit)
+        field = self.get_key_field(pagination)
+
+        if pagination.cursor is None:
+            queryset = queryset.order_by(*self.ordering(field))
+            offset = pagination.offset
+            return {
+                self.items_attribute: queryset[offset : offset + limit],
+                "count": self._items_count(queryset),
+                # exclude_unset のオペレーションでも next / prev (null) を出力する
+                "next": None,
+                "prev": None,
+            }
+
+        position = self.decode_cursor(pagination.cursor)
+        rows = list(self._keyset_queryset(queryset, position, field)[: limit + 1])
+        result = self._keyset_page(rows, limit, position, field)
+        if pagination.with_count:
+            result["count"] = self._items_count(queryset)
+        return result
+
+    async def apaginate_queryset(
+        self, queryset: QuerySet, pagination: Input, request: HttpRequest, **params: Any
+    ) -> Any:
+        limit = min(pagination.limit, self.max_limit)
+        field = self.get_key_field(pagination)
+
+        if pagination.cursor is None:
+            queryset = queryset.order_by(*self.ordering(field))
+            offset = pagination.offset
+            return {
+                self.items_attribute: [obj async for obj in queryset[offset : offset + limit]],
+                "count": await self._aitems_count(queryset),
+                "next": None,
+                "prev": None,
+            }
+
+        position = self.decode_cursor(pagination.cursor)
+        keyset = self._keyset_queryset(queryset, position, field)
+        rows = [obj async for obj in keyset[: limit + 1]]
+        result = self._keyset_page(rows, limit, position, field)
+        if pagination.with_count:
+            result["count"] = await self._aitems_count(queryset)
+        return result
+
+
+class BlogEntryPagination(KeysetPagination):
+    """
+    記事一覧用。`sort=activity` で「最近コメントがあった順」(last_activity_at, id) に並べる。
+    カーソルは sort ごとに別物なので、sort を変えたら先頭ページから取り直すこと。
+    """
+
+    SORT_FIELDS = {"created": "created_at", "activity": "last_activity_at"}
+
+    class Input(KeysetPagination.Input):
+        sort: Literal["created", "activity"] = "created"
+
+    def get_key_field(self, pagination: Input) -> str:
+        return self.SORT_FIELDS[pagination.sort]
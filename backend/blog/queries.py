@@ -0,0 +1,113 @@
+"""
+レスポンススキーマに合わせてクエリセットを整形するヘルパー。
+
+各エンドポイントはここで作ったクエリセットを使うことで、
+author の select_related・コメントの Prefetch・スキーマに必要な列だけの .only() が
+一貫して適用され、行数に関係なくクエリ数が一定になる。
+
+一覧・詳細の GET では、モデルのインスタンスを作らずにスキーマの形の dict を返す
+.values() のクエリセット (*_rows) を使う（インスタンスの生成と from_attributes での
+属性の読み出しが、100 件のページではクエリそのものより重いため）。
+"""
+
+from django.db.models import F, Prefetch
+from ninja.errors import ValidationError
+
+from .models import BlogEntry, Comment
+from .schemas import BlogEntryDetailResponse, BlogEntryResponse, CommentResponse
+
+# モデルのフィールドではないスキーマ項目 → 取得元のフィールドパス
+# (None はプリフェッチなど別経路で解決するもの)
+DERIVED_FIELDS = {
+    "author_username": "author__username",
+    "comments": None,
+}
+
+
+def schema_only_fields(model, schema):
+    """スキーマのフィールド名から .only() に渡すフィールド名の一覧を作る"""
+    model_fields = {}
+    for field in model._meta.concrete_fields:
+        model_fields[field.name] = field.name
+        model_fields[field.attname] = field.name  # author_id → author
+
+    only = []
+    for name in schema.model_fields:
+        source = model_fields.get(name) or DERIVED_FIELDS.get(name)
+        if source and source not in only:
+            only.append(source)
+    return only
+
+
+# GET で、?fields= を指定しない場合に返さないフィールド（HTML は本文と同じくらい大きいため）
+OPTIONAL_FIELDS = ("content_html",)
+# 一覧で、?fields= を指定しない場合に返さないフィールド（本文は excerpt で代用する）
+LIST_EXCLUDED_FIELDS = ("content", *OPTIONAL_FIELDS)
+
+
+def select_fields(schema, fields=None, exclude=()):
+    """
+    ?fields= の値（カンマ区切りのフィールド名）を schema のフィールド名の一覧にする（id は常に含める）。
+    未指定なら exclude 以外のすべてのフィールド。schema に無い名前があれば 422
+    """
+    if fields is None:
+        return [name for name in schema.model_fields if name not in exclude]
+    names = list(dict.fromkeys(["id", *(n.strip() for n in fields.split(",") if n.strip())]))
+    unknown = [name for name in names if name not in schema.model_fields]
+    if unknown:
+        raise ValidationError([{"fields": f"Unknown fields: {', '.join(unknown)}"}])
+    return names
+
+
+def nested_comment_fields(names):
+    """記事の詳細に含めるコメントのフィールド（記事の fields に content_html があればコメントの HTML も返す）"""
+    exclude = () if "content_html" in names else OPTIONAL_FIELDS
+    return select_fields(CommentResponse, exclude=exclude)
+
+
+def schema_values(model, schema, names=None):
+    """
+    スキーマの各フィールド（names を指定するとその中のもの）をキーにした .values() の引数
+    (フィールド名の一覧, 式の dict) を作る。author_username のような派生フィールドは F() で関連先から読み出す
+    """
+    model_fields = {field.attname for field in model._meta.concrete_fields}
+    fields, expressions = [], {}
+    for name in names or schema.model_fields:
+        if name in model_fields:
+            fields.append(name)
+        elif DERIVED_FIELDS.get(name):
+            expressions[name] = F(DERIVED_FIELDS[name])
+    return fields, expressions
+
+
+def schema_rows(model, schema, names=None):
+    """スキーマの形の dict を返すクエリセット（Meta.ordering はそのまま使われる）"""
+    fields, expressions = schema_values(model, schema, names)
+    return model.objects.values(*fields, **expressions)
+
+
+def comment_queryset(schema=CommentResponse):
+    """コメント一覧・詳細用のクエリセット"""
+    return Comment.objects.select_related("author").only(*schema_only_fields(Comment, schema))
+
+
+def blog_entry_queryset(schema=BlogEntryResponse):
+    """ブログ記事一覧用のクエリセット"""
+    return BlogEntry.objects.select_related("author").only(*schema_only_fields(BlogEntry, schema))
+
+
+def blog_entry_detail_queryset(schema=BlogEntryDetailResponse, comment_schema=CommentResponse):
+    """コメント（とその作者）をまとめてプリフェッチする記事詳細用のクエリセット"""
+    return blog_entry_queryset(schema).prefetch_related(
+        Prefetch("comments", queryset=comment_queryset(comment_schema))
+    )
+
+
+def comment_rows(schema=CommentResponse, names=None):
+    """コメント一覧用の .values() のクエリセット（names を指定するとそのフィールドだけ）"""
+    return schema_rows(Comment, schema, names)
+
+
+def blog_entry_rows(schema=BlogEntryResponse, names=None):
+    """ブログ記事一覧・詳細用の .values() のクエリセット（詳細のコメントは別途 comment_rows で取得する）"""
+    return schema_rows(BlogEntry, schema, names)
@@ -0,0 +1,63 @@
+"""
+記事・コメントの本文 (Markdown) を HTML に変換する。
+
+本文は書き込み時に一度だけ変換してサニタイズし、content_html に保存する（読み取りのたびに変換しない）。
+content_hash は本文と RENDERER_VERSION のハッシュで、保存済みの HTML が今の本文から作られたものかを
+本文を変換せずに判定するために使う。
+
+このモジュールは Django に依存しない（derived.py のバックフィルで、spawn した子プロセスから使う）。
+"""
+
+import hashlib
+
+import nh3
+from markdown_it import MarkdownIt
+
+# 変換の設定（有効な記法・許可するタグなど）を変えたら上げる。
+# すべての content_hash が一致しなくなり、rebuild_content_html ですべて作り直される
+RENDERER_VERSION = "1"
+
+# CommonMark + 表・取り消し線。生の HTML は書けない（エスケープされる）
+_markdown = MarkdownIt("commonmark", {"html": False}).enable(["table", "strikethrough"])
+
+# サニタイズ後に残すタグと属性（Markdown から生成されるものだけ）
+ALLOWED_TAGS = set(
+    "a blockquote br code del em h1 h2 h3 h4 h5 h6 hr img li ol p pre s strong"
+    " table tbody td th thead tr ul".split()
+)
+ALLOWED_ATTRIBUTES = {
+    "a": {"href", "title"},
+    "img": {"src", "alt", "title"},
+    "ol": {"start"},
+    "code": {"class"},  # 言語名 (language-xxx)
+    "td": {"style"},  # 列の揃え (text-align)
+    "th": {"style"},
+}
+ALLOWED_URL_SCHEMES = {"http", "https", "mailto"}
+ALLOWED_STYLES = {"text-align"}
+
+
+def render_markdown(text):
+    """Markdown を HTML に変換し、許可したタグ・属性・URL スキームだけを残す"""
+    return nh3.clean(
+        _markdown.render(text),
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        url_schemes=ALLOWED_URL_SCHEMES,
+        filter_style_properties=ALLOWED_STYLES,
+        link_rel="nofollow noopener noreferrer",
+    )
+
+
+def content_hash(text):
+    """本文と RENDERER_VERSION の 128 ビットのハッシュ（16 進 32 文字）"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(RENDERER_VERSION.encode())
+    digest.update(b"\0")
+    digest.update(text.encode())
+    return digest.hexdigest()
+
+
+def rendered_fields(text):
+    """text から作る content_html / content_hash の dict"""
+    return {"content_html": render_markdown(text), "content_hash": content_hash(text)}
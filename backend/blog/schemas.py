@@ -1,7 +1,13 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
+from uuid import UUID
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, create_model, field_validator
+
+# 一括操作 1 リクエストあたりの最大件数
+BULK_MAX_ITEMS = 1000
+# /api/blog/batch で 1 リクエストに指定できる記事 id の最大数
+BATCH_MAX_IDS = 100
 
 
 class BlogEntryBase(BaseModel):
@@ -20,10 +26,15 @@ class BlogEntryUpdate(BlogEntryBase):
 
 class BlogEntryResponse(BlogEntryBase):
     id: int
-    author_id: int
+    excerpt: str  # 本文の抜粋（一覧では content の代わりに返す）
+    # content を Markdown として変換・サニタイズした HTML（GET では ?fields= で指定したときだけ返す）
+    content_html: Optional[str] = None
+    author_id: UUID
     author_username: str
     created_at: datetime
     updated_at: datetime
+    comment_count: int
+    last_activity_at: datetime  # 最新コメントの投稿日時（コメントが無ければ作成日時）
 
     class Config:
         from_attributes = True
@@ -35,6 +46,7 @@ class CommentBase(BaseModel):
 
 class CommentCreate(CommentBase):
     blog_entry_id: int
+    parent_id: Optional[int] = None  # 返信先のコメント（同じ記事のもの）
 
 
 class CommentUpdate(CommentBase):
@@ -44,7 +56,10 @@ class CommentUpdate(CommentBase):
 class CommentResponse(CommentBase):
     id: int
     blog_entry_id: int
-    author_id: int
+    parent_id: Optional[int] = None
+    depth: int = 0  # トップレベルのコメントが 0
+    content_html: Optional[str] = None  # BlogEntryResponse と同じ
+    author_id: UUID
     author_username: str
     created_at: datetime
     updated_at: datetime
@@ -55,3 +70,117 @@ class CommentResponse(CommentBase):
 
 class BlogEntryDetailResponse(BlogEntryResponse):
     comments: List[CommentResponse]
+
+    @field_validator("comments", mode="before")
+    @classmethod
+    def evaluate_related_manager(cls, v):
+        # entry.comments は RelatedManager なので、プリフェッチ済みの結果をリストとして取り出す
+        if hasattr(v, "all"):
+            return list(v.all())
+        return v
+
+
+def sparse(schema, name):
+    """
+    schema のフィールドをすべて省略可能にしたスキーマ（?fields= で一部のフィールドだけを返すレスポンス用）。
+    exclude_unset=True のオペレーションで使い、取得したフィールドだけを出力する
+    """
+    fields = {key: (Optional[field.annotation], None) for key, field in schema.model_fields.items()}
+    return create_model(name, __config__=ConfigDict(from_attributes=True), **fields)
+
+
+def omit(schema, name, exclude, **extra):
+    """schema から exclude のフィールドを除き、extra のフィールドを加えたスキーマ"""
+    fields = {
+        key: (field.annotation, field)
+        for key, field in schema.model_fields.items()
+        if key not in exclude
+    }
+    return create_model(name, __config__=ConfigDict(from_attributes=True), **fields, **extra)
+
+
+BlogEntryFields = sparse(BlogEntryResponse, "BlogEntryFields")
+BlogEntryDetailFields = sparse(BlogEntryDetailResponse, "BlogEntryDetailFields")
+CommentFields = sparse(CommentResponse, "CommentFields")
+
+# エクスポートの 1 行（一括のデータ出力には HTML は不要なので content_html を含めない）。
+# changed_at は差分同期のキーで、記事とそのコメントのうち最後に更新された日時
+EXPORT_EXCLUDED_FIELDS = ("content_html",)
+CommentExport = omit(CommentResponse, "CommentExport", EXPORT_EXCLUDED_FIELDS)
+BlogEntryExport = omit(
+    BlogEntryResponse, "BlogEntryExport", EXPORT_EXCLUDED_FIELDS, changed_at=(datetime, ...)
+)
+
+
+class BlogEntryDetailExport(BlogEntryExport):
+    comments: List[CommentExport]
+
+    @field_validator("comments", mode="before")
+    @classmethod
+    def evaluate_related_manager(cls, v):
+        return BlogEntryDetailResponse.evaluate_related_manager(v)
+
+
+class BlogEntryBatchItem(BaseModel):
+    id: int
+    status: Literal["ok", "not_found"]
+    entry: Optional[BlogEntryDetailFields] = None
+
+
+class BlogEntryBatchResponse(BaseModel):
+    items: List[BlogEntryBatchItem]  # ids の順（重複した id もそのまま）
+
+
+class CommentThreadResponse(BaseModel):
+    items: List[CommentFields]  # 深さ優先の順（同じ親の返信どうしは古い順）
+    next: Optional[str] = None
+
+
+class BlogSearchHit(BaseModel):
+    id: int
+    title: str  # 一致箇所を <mark> で囲んだ HTML（エスケープ済み）
+    snippet: str  # 本文の一致箇所周辺の抜粋（同上）
+    rank: float
+
+
+class BlogSearchResponse(BaseModel):
+    items: List[BlogSearchHit]
+    next: Optional[str] = None
+
+
+class BlogEntryBulkCreate(BaseModel):
+    items: List[BlogEntryCreate] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+
+
+class BlogEntryBulkUpdateItem(BlogEntryUpdate):
+    id: int
+
+
+class BlogEntryBulkUpdate(BaseModel):
+    items: List[BlogEntryBulkUpdateItem] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+
+
+class CommentBulkCreate(BaseModel):
+    items: List[CommentCreate] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+
+
+class CommentBulkUpdateItem(CommentUpdate):
+    id: int
+
+
+class CommentBulkUpdate(BaseModel):
+    items: List[CommentBulkUpdateItem] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+
+
+class BulkDelete(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+
+
+class BulkItemResult(BaseModel):
+    index: int  # リクエスト内の位置
+    id: Optional[int] = None
+    status: Literal["created", "updated", "deleted", "not_found", "forbidden", "invalid"]
+
+
+class BulkResponse(BaseModel):
+    results: List[BulkItemResult]
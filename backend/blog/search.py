@@ -0,0 +1,278 @@
+"""
+ブログ記事の全文検索インデックス。
+
+データベースごとにバックエンドを切り替える。
+- SQLite: FTS5 の外部コンテンツ仮想テーブル (blog_entry_fts)。トリガーで BlogEntry と同期する
+- PostgreSQL: to_tsvector の式に対する GIN インデックス (SearchVector / SearchRank / SearchHeadline)
+
+どちらも (順位, id) のキーセットでページングする。
+"""
+
+import base64
+import binascii
+import html
+import json
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+from django.utils.module_loading import import_string
+from ninja.errors import ValidationError
+
+from .models import BlogEntry
+
+# スニペット中の一致箇所を示す一時的な区切り文字（HTML エスケープ後に <mark> に置き換える）
+MARK_START = "\x02"
+MARK_END = "\x03"
+
+FTS_TABLE = "blog_entry_fts"
+ENTRY_TABLE = BlogEntry._meta.db_table
+
+SQLITE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {ENTRY_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {ENTRY_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, content ON {ENTRY_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+
+POSTGRES_CONFIG = "simple"
+POSTGRES_INDEX = "blog_entry_search_gin"
+
+
+def highlight(text):
+    """区切り文字付きのテキストを HTML エスケープし、一致箇所を <mark> で囲む"""
+    return html.escape(text or "").replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+
+def encode_cursor(rank, pk):
+    raw = json.dumps([rank, pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        rank, pk = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return float(rank), int(pk)
+    except (ValueError, TypeError, binascii.Error) as e:
+        raise ValidationError([{"cursor": "Invalid cursor"}]) from e
+
+
+class SearchBackend:
+    """検索インデックスの共通インターフェース"""
+
+    def install(self, schema_editor):
+        """インデックスを作成する（マイグレーションから呼ばれる）"""
+
+    def uninstall(self, schema_editor):
+        """インデックスを削除する（マイグレーションの巻き戻し用）"""
+
+    def ensure_installed(self, conn):
+        """トリガーなど、テーブルの作り直しで消えることがあるものを再作成する"""
+
+    def search(self, query, limit, cursor=None):
+        """
+        (結果, 次ページのカーソル) を返す。
+        結果は id / title / snippet / rank を持つ dict のリストで、関連度の高い順に並ぶ。
+        """
+        raise NotImplementedError
+
+    def rebuild(self, batch_size=1000, progress=None):
+        """インデックスを作り直す。戻り値は処理した件数"""
+        raise NotImplementedError
+
+    def build_page(self, rows, limit):
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["rank"], rows[-1]["id"]) if has_more else None
+        return rows, next_cursor
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """SQLite FTS5 による検索。bm25() は値が小さいほど関連度が高い"""
+
+    def install(self, schema_editor):
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"title, content, content='{ENTRY_TABLE}', content_rowid='id')"
+        )
+        for sql in SQLITE_TRIGGERS:
+            schema_editor.execute(sql)
+        schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+    def uninstall(self, schema_editor):
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+    def ensure_installed(self, conn):
+        # SQLite ではマイグレーションでテーブルを作り直すとトリガーが消えるため、migrate 後に再作成する
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE]
+            )
+            if cursor.fetchone() is None:
+                return
+            for sql in SQLITE_TRIGGERS:
+                cursor.execute(sql)
+
+    @staticmethod
+    def match_expression(query):
+        # 各語をフレーズとして引用し、FTS5 の構文として解釈されないようにする（AND 検索）
+        terms = query.split()
+        return " ".join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+    def search(self, query, limit, cursor=None):
+        match = self.match_expression(query)
+        if not match:
+            return [], None
+
+        position = decode_cursor(cursor)
+        where, params = "", [match]
+        if position is not None:
+            where = "WHERE rank > %s OR (rank = %s AND id > %s)"
+            params += [position[0], position[0], position[1]]
+
+        sql = f"""
+            SELECT id, title, snippet, rank FROM (
+                SELECT
+                    rowid AS id,
+                    highlight({FTS_TABLE}, 0, %s, %s) AS title,
+                    snippet({FTS_TABLE}, 1, %s, %s, '…', 24) AS snippet,
+                    bm25({FTS_TABLE}, 10.0, 1.0) AS rank
+                FROM {FTS_TABLE}
+                WHERE {FTS_TABLE} MATCH %s
+            )
+            {where}
+            ORDER BY rank, id
+            LIMIT %s
+        """
+        params = [MARK_START, MARK_END, MARK_START, MARK_END, *params, limit + 1]
+        with connection.cursor() as c:
+            c.execute(sql, params)
+            rows = [
+                {"id": pk, "title": highlight(title), "snippet": highlight(snippet), "rank": rank}
+                for pk, title, snippet, rank in c.fetchall()
+            ]
+        return self.build_page(rows, limit)
+
+    def rebuild(self, batch_size=1000, progress=None):
+        with connection.cursor() as c:
+            c.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')")
+
+        last_id, total = 0, 0
+        while True:
+            with transaction.atomic(), connection.cursor() as c:
+                c.execute(
+                    f"SELECT id FROM {ENTRY_TABLE} WHERE id > %s ORDER BY id LIMIT %s",
+                    [last_id, batch_size],
+                )
+                ids = [row[0] for row in c.fetchall()]
+                if not ids:
+                    break
+                c.execute(
+                    f"INSERT INTO {FTS_TABLE}(rowid, title, content) "
+                    f"SELECT id, title, content FROM {ENTRY_TABLE} WHERE id BETWEEN %s AND %s",
+                    [ids[0], ids[-1]],
+                )
+            last_id, total = ids[-1], total + len(ids)
+            if progress:
+                progress(total)
+        return total
+
+
+class PostgresSearchBackend(SearchBackend):
+    """PostgreSQL の全文検索。SearchRank は値が大きいほど関連度が高い"""
+
+    def vector(self):
+        from django.contrib.postgres.search import SearchVector
+
+        return SearchVector("title", "content", config=POSTGRES_CONFIG)
+
+    def install(self, schema_editor):
+        # SearchVector("title", "content") が生成する式と同じ式にインデックスを張る
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {POSTGRES_INDEX} ON {ENTRY_TABLE} USING GIN ("
+            f"to_tsvector('{POSTGRES_CONFIG}'::regconfig, "
+            f"COALESCE((title)::text, '') || ' ' || COALESCE((content)::text, '')))"
+        )
+
+    def uninstall(self, schema_editor):
+        schema_editor.execute(f"DROP INDEX IF EXISTS {POSTGRES_INDEX}")
+
+    def search(self, query, limit, cursor=None):
+        from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+
+        if not query.split():
+            return [], None
+
+        search_query = SearchQuery(query, config=POSTGRES_CONFIG, search_type="plain")
+        headline = dict(config=POSTGRES_CONFIG, start_sel=MARK_START, stop_sel=MARK_END)
+        queryset = (
+            BlogEntry.objects.annotate(document=self.vector())
+            .filter(document=search_query)
+            .annotate(
+                # float4 のままだとカーソル経由の比較で誤差が出るため float8 にする
+                rank=Cast(SearchRank(F("document"), search_query), FloatField()),
+                title_highlight=SearchHeadline("title", search_query, highlight_all=True, **headline),
+                snippet=SearchHeadline("content", search_query, max_words=35, **headline),
+            )
+        )
+        position = decode_cursor(cursor)
+        if position is not None:
+            rank, pk = position
+            queryset = queryset.filter(Q(rank__lt=rank) | Q(rank=rank, id__gt=pk))
+
+        rows = [
+            {
+                "id": row["id"],
+                "title": highlight(row["title_highlight"]),
+                "snippet": highlight(row["snippet"]),
+                "rank": row["rank"],
+            }
+            for row in queryset.order_by("-rank", "id").values(
+                "id", "title_highlight", "snippet", "rank"
+            )[: limit + 1]
+        ]
+        return self.build_page(rows, limit)
+
+    def rebuild(self, batch_size=1000, progress=None):
+        # 式インデックスなので行ごとの再投入は不要。インデックスだけを作り直す
+        with connection.cursor() as c:
+            c.execute(f"REINDEX INDEX {POSTGRES_INDEX}")
+        total = BlogEntry.objects.count()
+        if progress:
+            progress(total)
+        return total
+
+
+BACKENDS = {
+    "sqlite": SQLiteFTSBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+def get_search_backend(vendor=None):
+    """settings.BLOG_SEARCH_BACKEND が指定されていればそれを、なければ DB の種類から選ぶ"""
+    path = getattr(settings, "BLOG_SEARCH_BACKEND", None)
+    if path:
+        return import_string(path)()
+    backend_class = BACKENDS.get(vendor or connection.vendor)
+    return backend_class() if backend_class else None
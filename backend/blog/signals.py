@@ -0,0 +1,61 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .activity import comment_added, comment_removed
+from .cache import invalidate_comments, invalidate_entry
+from .models import BlogEntry, Comment
+from .tasks import comment_created, entry_created
+
+
+@receiver(post_save, sender=BlogEntry)
+@receiver(post_delete, sender=BlogEntry)
+def invalidate_entry_cache(sender, instance, using=None, **kwargs):
+    """
+    記事が作成・更新・削除されたらレスポンスキャッシュを無効にする。
+    バージョンはコミット後に上げる（コミット前に上げると、その間の読み取りがコミット前の行を
+    新しいバージョンでキャッシュしてしまう）
+    """
+    transaction.on_commit(partial(invalidate_entry, instance.pk), using=using)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_cache(sender, instance, using=None, **kwargs):
+    """コメントが作成・更新・削除されたらレスポンスキャッシュを無効にする（記事と同じくコミット後に）"""
+    transaction.on_commit(partial(invalidate_comments, instance.blog_entry_id), using=using)
+
+
+@receiver(post_save, sender=Comment)
+def count_added_comment(sender, instance, created, raw=False, **kwargs):
+    """コメントの作成時に記事の comment_count / last_activity_at を更新する"""
+    if created and not raw:
+        comment_added(instance.blog_entry_id, instance.created_at)
+
+
+@receiver(post_save, sender=BlogEntry)
+def enqueue_entry_jobs(sender, instance, created, raw=False, **kwargs):
+    """記事の作成後の処理をジョブとして登録する（一括作成では送られない）"""
+    if created and not raw:
+        entry_created(instance)
+
+
+@receiver(post_save, sender=Comment)
+def enqueue_comment_jobs(sender, instance, created, raw=False, **kwargs):
+    """コメントの作成後の処理（通知メールなど）をジョブとして登録する（一括作成では送られない）"""
+    if created and not raw:
+        comment_created(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def count_removed_comment(sender, instance, origin=None, **kwargs):
+    """コメントの削除時に記事の comment_count / last_activity_at を更新する"""
+    # 記事の削除に伴うカスケード削除では、記事ごと消えるので更新しない
+    if isinstance(origin, BlogEntry) or (
+        isinstance(origin, QuerySet) and origin.model is BlogEntry
+    ):
+        return
+    comment_removed(instance.blog_entry_id)
@@ -0,0 +1,82 @@
+"""
+記事・コメントの作成後に、リクエストとは別にワーカーで実行する処理（jobs/ のジョブ）。
+
+signals.py が作成時に enqueue し、コミット後にジョブとして登録される。
+全文検索のインデックスはトリガー / 式インデックスで書き込みと同時に更新されるため、ここでは扱わない。
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import send_mail
+from django.db import transaction
+from jobs.queue import enqueue, task
+
+from .cache import cache_enabled, warm_responses
+from .models import Comment
+
+NOTIFY_COMMENT = "blog.notify_comment"
+SEND_COMMENT_MAIL = "blog.send_comment_mail"
+WARM_ENTRY_CACHE = "blog.warm_entry_cache"
+
+
+def warm_enabled():
+    return getattr(settings, "BLOG_CACHE_WARM", False) and cache_enabled()
+
+
+def comment_created(comment):
+    enqueue(NOTIFY_COMMENT, {"comment_id": comment.pk})
+    if warm_enabled():
+        enqueue(WARM_ENTRY_CACHE, {"entry_id": comment.blog_entry_id})
+
+
+def entry_created(entry):
+    if warm_enabled():
+        enqueue(WARM_ENTRY_CACHE, {"entry_id": entry.pk})
+
+
+@task(NOTIFY_COMMENT)
+def notify_comment(comment_id):
+    """
+    記事の作者（返信なら返信先のコメントの作者にも）に、コメントがあったことをメールで知らせる。
+    メールは宛先ごとのジョブで送る（1 通の送信に失敗しても、送信済みの宛先に再送しない）
+    """
+    comment = (
+        Comment.objects.select_related("blog_entry__author", "parent__author")
+        .filter(id=comment_id)
+        .first()
+    )
+    if comment is None:
+        # 実行までの間に削除された
+        return
+    recipients = {comment.blog_entry.author}
+    if comment.parent is not None:
+        recipients.add(comment.parent.author)
+    # 途中で失敗したときに一部の宛先のジョブだけが登録されないよう、まとめてコミットする
+    with transaction.atomic():
+        for user in recipients:
+            if user.pk == comment.author_id or not user.email:
+                continue
+            enqueue(SEND_COMMENT_MAIL, {"comment_id": comment_id, "user_id": str(user.pk)})
+
+
+@task(SEND_COMMENT_MAIL)
+def send_comment_mail(comment_id, user_id):
+    comment = Comment.objects.select_related("author", "blog_entry").filter(id=comment_id).first()
+    user = get_user_model().objects.filter(pk=user_id).first()
+    if comment is None or user is None or not user.email:
+        return
+    send_mail(
+        f"「{comment.blog_entry.title}」にコメントがありました",
+        f"{comment.author.username} さんのコメント:\n\n{comment.content}",
+        None,
+        [user.email],
+    )
+
+
+@task(WARM_ENTRY_CACHE)
+def warm_entry_cache(entry_id):
+    """
+    記事の詳細と記事一覧の先頭ページを取得し、レスポンスキャッシュに載せる
+    （書き込みでキャッシュが無効になった直後の最初の読み取りが、DB から組み立てずに済む）
+    """
+    warm_responses(f"/api/blog/{entry_id}", "/api/blog/")
@@ -1,3 +1,1568 @@
-from django.test import TestCase
+import importlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from auth_api.cache import user_cache
+from auth_api.tests import TEST_SECRET_KEY, make_token
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core import mail, signing
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management import call_command
+from config.loaders import DataLoader
+from config.replicas import STICKY_COOKIE, STICKY_COOKIE_SALT
+from config.throttling import reset_throttles
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from jobs.models import Job
+from jobs.worker import Worker
+
+from . import export
+from .cache import (
+    cache_stats,
+    cached_response,
+    check_shared_cache,
+    get_cache,
+    reset_cache_stats,
+)
+from .conditional import blog_entry_detail_validators
+from .derived import rebuild_content_html
+from .loaders import user_loader
+from .models import EXCERPT_LENGTH, MAX_COMMENT_DEPTH, BlogEntry, Comment, make_excerpt
+from .rendering import content_hash, render_markdown
+from .schemas import BlogEntryResponse
+
+User = get_user_model()
+
+
+# テストは 1 プロセスで動くため、プロセス内のキャッシュでもレスポンスキャッシュを使う
+@override_settings(BLOG_CACHE_ENABLED=True)
+class BlogTestCase(TestCase):
+    """ブログAPIテスト共通のセットアップ"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="author", email="author@example.com", password="pass-1234-word"
+        )
+
+    def setUp(self):
+        get_cache().clear()
+        user_cache.clear()
+        reset_throttles()
+
+    def committed(self):
+        """書き込みのコミット後の処理（キャッシュのバージョンの更新など）を実行する"""
+        return self.captureOnCommitCallbacks(execute=True)
+
+    def create_entries(self, count, **kwargs):
+        with self.committed():
+            return [
+                BlogEntry.objects.create(
+                    title=f"title {i}", content=f"content {i}", author=self.user, **kwargs
+                )
+                for i in range(count)
+            ]
+
+
+class KeysetPaginationTests(BlogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.entries = self.create_entries(5)
+        # 新しい順 (-created_at, -id)
+        self.expected_ids = [e.id for e in reversed(self.entries)]
+
+    def ids(self, response):
+        return [item["id"] for item in response.json()["items"]]
+
+    def test_offset_mode_is_default(self):
+        response = self.client.get("/api/blog/", {"limit": 2, "offset": 2})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["count"], 5)
+        self.assertEqual(self.ids(response), self.expected_ids[2:4])
+
+    def test_cursor_mode_walks_forward_and_back(self):
+        first = self.client.get("/api/blog/", {"limit": 2, "cursor": ""}).json()
+        self.assertEqual([i["id"] for i in first["items"]], self.expected_ids[:2])
+        self.assertIsNone(first["count"])
+        self.assertIsNone(first["prev"])
+
+        second = self.client.get("/api/blog/", {"limit": 2, "cursor": first["next"]}).json()
+        self.assertEqual([i["id"] for i in second["items"]], self.expected_ids[2:4])
+
+        last = self.client.get("/api/blog/", {"limit": 2, "cursor": second["next"]}).json()
+        self.assertEqual([i["id"] for i in last["items"]], self.expected_ids[4:])
+        self.assertIsNone(last["next"])
+
+        back = self.client.get("/api/blog/", {"limit": 2, "cursor": last["prev"]}).json()
+        self.assertEqual([i["id"] for i in back["items"]], self.expected_ids[2:4])
+        self.assertIsNotNone(back["next"])
+
+        top = self.client.get("/api/blog/", {"limit": 2, "cursor": back["prev"]}).json()
+        self.assertEqual([i["id"] for i in top["items"]], self.expected_ids[:2])
+        self.assertIsNone(top["prev"])
+
+    def test_cursor_mode_count_is_opt_in(self):
+        data = self.client.get("/api/blog/", {"cursor": "", "with_count": True}).json()
+        self.assertEqual(data["count"], 5)
+
+    def test_cursor_mode_breaks_created_at_ties_by_id(self):
+        BlogEntry.objects.update(created_at=self.entries[0].created_at)
+        seen = []
+        cursor = ""
+        while cursor is not None:
+            data = self.client.get("/api/blog/", {"limit": 2, "cursor": cursor}).json()
+            seen += [i["id"] for i in data["items"]]
+            cursor = data["next"]
+        self.assertEqual(seen, sorted(self.expected_ids, reverse=True))
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/blog/", {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 422)
+
+    def test_comment_listing_uses_cursor(self):
+        entry = self.entries[0]
+        comments = [
+            Comment.objects.create(blog_entry=entry, content=f"c{i}", author=self.user)
+            for i in range(3)
+        ]
+        url = f"/api/blog/{entry.id}/comments/"
+        first = self.client.get(url, {"limit": 2, "cursor": ""}).json()
+        self.assertEqual([c["id"] for c in first["items"]], [comments[2].id, comments[1].id])
+        rest = self.client.get(url, {"limit": 2, "cursor": first["next"]}).json()
+        self.assertEqual([c["id"] for c in rest["items"]], [comments[0].id])
+
+
+class QueryCountTests(BlogTestCase):
+    """一覧・詳細のクエリ数が行数に依存しないことを確認する"""
+
+    def add_comments(self, entry, count):
+        start = entry.comments.count()
+        for i in range(start, start + count):
+            commenter = User.objects.create_user(
+                username=f"commenter{entry.id}-{i}", email=f"c{entry.id}-{i}@example.com"
+            )
+            with self.committed():
+                Comment.objects.create(blog_entry=entry, content=f"c{i}", author=commenter)
+
+    def test_list_query_count_is_constant(self):
+        self.create_entries(1)
+        # ETag の集約 + COUNT(*) + 一覧
+        with self.assertNumQueries(3):
+            self.client.get("/api/blog/")
+        self.create_entries(10)
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/blog/")
+        self.assertEqual(response.json()["items"][0]["author_username"], "author")
+
+    def test_detail_query_count_is_constant(self):
+        entry = self.create_entries(1)[0]
+        self.add_comments(entry, 1)
+        # ETag の集約 + 記事 + コメント（作者含む）
+        with self.assertNumQueries(3):
+            self.client.get(f"/api/blog/{entry.id}")
+        self.add_comments(entry, 10)
+        with self.assertNumQueries(3):
+            response = self.client.get(f"/api/blog/{entry.id}")
+        data = response.json()
+        self.assertEqual(len(data["comments"]), 11)
+        self.assertTrue(all(c["author_username"].startswith("commenter") for c in data["comments"]))
+
+    def test_comment_list_query_count_is_constant(self):
+        entry = self.create_entries(1)[0]
+        self.add_comments(entry, 1)
+        # ETag の集約 + COUNT(*) + 一覧
+        with self.assertNumQueries(3):
+            self.client.get(f"/api/blog/{entry.id}/comments/")
+        self.add_comments(entry, 10)
+        with self.assertNumQueries(3):
+            self.client.get(f"/api/blog/{entry.id}/comments/")
+
+    def test_detail_not_found(self):
+        response = self.client.get("/api/blog/999999")
+        self.assertEqual(response.status_code, 404)
+
+
+class SerializationTests(BlogTestCase):
+    """.values() の行と orjson のレンダラーによる一覧・詳細のレスポンス"""
+
+    def test_rows_match_orm_serialization(self):
+        entry = BlogEntry.objects.create(title="日本語のタイトル", content="本文", author=self.user)
+        Comment.objects.create(blog_entry=entry, content="コメント", author=self.user)
+        entry.refresh_from_db()
+
+        data = self.client.get(f"/api/blog/{entry.id}").json()
+        expected = json.loads(BlogEntryResponse.model_validate(entry).model_dump_json())
+        # HTML は ?fields= で指定したときだけ返す
+        self.assertEqual(expected.pop("content_html"), "<p>本文</p>\n")
+        self.assertEqual({k: v for k, v in data.items() if k != "comments"}, expected)
+        self.assertEqual(data["comments"][0]["author_username"], "author")
+        # 一覧は本文の代わりに抜粋を返す
+        del expected["content"]
+        self.assertEqual(self.client.get("/api/blog/").json()["items"], [expected])
+
+    def test_renderer_output(self):
+        BlogEntry.objects.create(title="日本語", content="本文", author=self.user)
+        response = self.client.get("/api/blog/")
+        self.assertEqual(response["Content-Type"], "application/json; charset=utf-8")
+        # ASCII にエスケープせず UTF-8 で出力し、datetime は UTC の "Z" 形式
+        self.assertIn("日本語".encode(), response.content)
+        self.assertTrue(response.json()["items"][0]["created_at"].endswith("Z"))
+
+
+@override_settings(SECRET_KEY=TEST_SECRET_KEY)
+class SparseFieldsTests(BlogTestCase):
+    """?fields= による列の絞り込みと、一覧の抜粋 (excerpt)"""
+
+    def setUp(self):
+        super().setUp()
+        self.entries = [
+            BlogEntry.objects.create(title=f"t{i}", content="長い本文 " * 100, author=self.user)
+            for i in range(3)
+        ]
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json(), [q["sql"] for q in queries]
+
+    def test_list_returns_excerpt_and_never_reads_content(self):
+        data, queries = self.get("/api/blog/")
+        item = data["items"][0]
+        self.assertNotIn("content", item)
+        self.assertEqual(len(item["excerpt"]), EXCERPT_LENGTH)
+        self.assertTrue(item["excerpt"].endswith("…"))
+        self.assertFalse([sql for sql in queries if '"blog_blogentry"."content"' in sql])
+
+    def test_fields_narrow_projection_and_response(self):
+        data, queries = self.get("/api/blog/", fields="title,author_username")
+        expected = {"id": self.entries[-1].id, "title": "t2", "author_username": "author"}
+        self.assertEqual(data["items"][0], expected)
+        self.assertEqual((data["count"], data["next"], data["prev"]), (3, None, None))
+        select = next(sql for sql in queries if "LIMIT" in sql)
+        self.assertNotIn('"blog_blogentry"."excerpt"', select)
+        # 一覧でも明示すれば本文を返す
+        data, _ = self.get("/api/blog/", fields="content")
+        self.assertEqual(set(data["items"][0]), {"id", "content"})
+
+    def test_cursor_pages_without_key_field(self):
+        first, _ = self.get("/api/blog/", fields="title", limit=2, cursor="")
+        self.assertEqual([set(i) for i in first["items"]], [{"id", "title"}] * 2)
+        second, _ = self.get("/api/blog/", fields="title", limit=2, cursor=first["next"])
+        self.assertEqual([i["title"] for i in second["items"]], ["t0"])
+        self.assertIsNone(second["count"])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get("/api/blog/", {"fields": "title,password"})
+        self.assertEqual(response.status_code, 422)
+
+    def test_detail_without_comments_skips_comment_query(self):
+        entry = self.entries[0]
+        Comment.objects.create(blog_entry=entry, content="c", author=self.user)
+        data, queries = self.get(f"/api/blog/{entry.id}", fields="title,comment_count")
+        self.assertEqual(data, {"id": entry.id, "title": "t0", "comment_count": 1})
+        self.assertFalse([sql for sql in queries if 'FROM "blog_comment"' in sql])
+        data, _ = self.get(f"/api/blog/{entry.id}", fields="comments")
+        self.assertEqual(data["comments"][0]["content"], "c")
+
+    def test_comment_list_and_thread_fields(self):
+        entry = self.entries[0]
+        root = Comment.objects.create(blog_entry=entry, content="root", author=self.user)
+        Comment.objects.create(blog_entry=entry, parent=root, content="reply", author=self.user)
+        data, _ = self.get(f"/api/blog/{entry.id}/comments/", fields="content", cursor="")
+        self.assertEqual([i["content"] for i in data["items"]], ["reply", "root"])
+        self.assertEqual(set(data["items"][0]), {"id", "content"})
+        data, _ = self.get(f"/api/blog/{entry.id}/comments/{root.id}/thread", fields="depth")
+        self.assertEqual([i["depth"] for i in data["items"]], [0, 1])
+        self.assertEqual(set(data["items"][0]), {"id", "depth"})
+
+    def test_excerpt_is_maintained_on_writes(self):
+        entry = self.entries[0]
+        header = {"HTTP_AUTHORIZATION": f"Bearer {make_token(self.user)}"}
+        self.client.put(
+            f"/api/blog/{entry.id}",
+            {"content": "  新しい\n本文  "},
+            content_type="application/json",
+            **header,
+        )
+        entry.refresh_from_db()
+        self.assertEqual(entry.excerpt, "新しい 本文")
+        self.client.put(
+            "/api/blog/bulk",
+            {"items": [{"id": entry.id, "content": "一括"}]},
+            content_type="application/json",
+            **header,
+        )
+        entry.refresh_from_db()
+        self.assertEqual(entry.excerpt, "一括")
+
+    def test_migration_backfills_existing_excerpts(self):
+        migration = importlib.import_module("blog.migrations.0007_entry_excerpt")
+        BlogEntry.objects.update(excerpt="")
+        migration.backfill_excerpts(django_apps, SimpleNamespace(connection=connection))
+        self.assertEqual(
+            set(BlogEntry.objects.values_list("excerpt", flat=True)), {make_excerpt("長い本文 " * 100)}
+        )
+
+    def test_rebuild_excerpts_command(self):
+        BlogEntry.objects.update(excerpt="")
+        out = StringIO()
+        call_command("rebuild_excerpts", "--batch-size", "2", stdout=out)
+        self.assertIn("3 件", out.getvalue())
+        self.assertEqual(
+            set(BlogEntry.objects.values_list("excerpt", flat=True)), {make_excerpt("長い本文 " * 100)}
+        )
+
+
+@override_settings(SECRET_KEY=TEST_SECRET_KEY)
+class RenderedContentTests(BlogTestCase):
+    """本文の HTML (content_html) の書き込み時の変換と、?fields= での取得"""
+
+    def setUp(self):
+        super().setUp()
+        self.header = {"HTTP_AUTHORIZATION": f"Bearer {make_token(self.user)}"}
+
+    def test_markdown_is_sanitized(self):
+        html = render_markdown(
+            "**太字** <script>x</script> [a](javascript:alert(1)) [b](https://e.jp)"
+        )
+        self.assertIn("<strong>太字</strong>", html)
+        self.assertIn("&lt;script&gt;", html)
+        self.assertNotIn('href="javascript', html)
+        self.assertIn('<a href="https://e.jp" rel="nofollow noopener noreferrer">b</a>', html)
+
+    def test_save_renders_only_when_content_changes(self):
+        with mock.patch("blog.models.render_markdown", wraps=render_markdown) as render:
+            entry = BlogEntry.objects.create(title="t", content="# 見出し", author=self.user)
+            entry.title = "t2"
+            entry.save()
+            self.assertEqual(render.call_count, 1)
+            entry.content = "*強調*"
+            entry.save(update_fields=["content"])
+            self.assertEqual(render.call_count, 2)
+        entry.refresh_from_db()
+        self.assertEqual(entry.content_html, "<p><em>強調</em></p>\n")
+        self.assertEqual(entry.content_hash, content_hash("*強調*"))
+
+    def test_html_is_returned_only_when_requested(self):
+        entry = BlogEntry.objects.create(title="t", content="本文", author=self.user)
+        Comment.objects.create(blog_entry=entry, content="`c`", author=self.user)
+        data = self.client.get(f"/api/blog/{entry.id}").json()
+        self.assertNotIn("content_html", data)
+        self.assertNotIn("content_html", data["comments"][0])
+        data = self.client.get(f"/api/blog/{entry.id}", {"fields": "content_html,comments"}).json()
+        self.assertEqual(data["content_html"], "<p>本文</p>\n")
+        self.assertEqual(data["comments"][0]["content_html"], "<p><code>c</code></p>\n")
+        data = self.client.get(f"/api/blog/{entry.id}/comments/", {"fields": "content_html"})
+        self.assertEqual(data.json()["items"][0]["content_html"], "<p><code>c</code></p>\n")
+        self.assertNotIn("content_html", self.client.get("/api/blog/").json()["items"][0])
+
+    def test_update_and_bulk_paths_keep_html_in_sync(self):
+        entry = BlogEntry.objects.create(title="t", content="old", author=self.user)
+        comment = Comment.objects.create(blog_entry=entry, content="old", author=self.user)
+        self.client.put(
+            f"/api/blog/{entry.id}",
+            {"content": "new"},
+            content_type="application/json",
+            **self.header,
+        )
+        self.client.put(
+            f"/api/blog/{entry.id}/comments/{comment.id}",
+            {"content": "_new_"},
+            content_type="application/json",
+            **self.header,
+        )
+        response = self.client.post(
+            "/api/blog/comments/bulk",
+            {"items": [{"blog_entry_id": entry.id, "content": "~~bulk~~"}]},
+            content_type="application/json",
+            **self.header,
+        )
+        created = response.json()["results"][0]["id"]
+        self.assertEqual(BlogEntry.objects.get().content_html, "<p>new</p>\n")
+        self.assertEqual(
+            dict(Comment.objects.values_list("id", "content_html")),
+            {comment.id: "<p><em>new</em></p>\n", created: "<p><s>bulk</s></p>\n"},
+        )
+
+    def test_rebuild_content_html_command(self):
+        entries = self.create_entries(3)
+        Comment.objects.create(blog_entry=entries[0], content="c", author=self.user)
+        BlogEntry.objects.filter(id=entries[0].id).update(content_html="", content_hash="")
+        Comment.objects.update(content_html="", content_hash="")
+        out = StringIO()
+        call_command("rebuild_content_html", "--workers", "2", "--batch-size", "2", stdout=out)
+        self.assertIn("entries: HTML を作成しました（1 件）", out.getvalue())
+        self.assertIn("comments: HTML を作成しました（1 件）", out.getvalue())
+        self.assertEqual(BlogEntry.objects.get(id=entries[0].id).content_html, "<p>content 0</p>\n")
+        self.assertEqual(Comment.objects.get().content_html, "<p>c</p>\n")
+        # ハッシュが一致する行は変換しない
+        with mock.patch("blog.derived.render_markdown") as render:
+            self.assertEqual(rebuild_content_html(BlogEntry), 0)
+        render.assert_not_called()
+
+    def test_migration_backfills_existing_html(self):
+        migration = importlib.import_module("blog.migrations.0008_rendered_content")
+        entry = BlogEntry.objects.create(title="t", content="**本文**", author=self.user)
+        comment = Comment.objects.create(
+            blog_entry=entry, content="[a](https://e.jp)", author=self.user
+        )
+        BlogEntry.objects.update(content_html="", content_hash="")
+        Comment.objects.update(content_html="", content_hash="")
+        migration.backfill_content_html(django_apps, SimpleNamespace(connection=connection))
+        entry.refresh_from_db()
+        comment.refresh_from_db()
+        self.assertEqual(entry.content_html, "<p><strong>本文</strong></p>\n")
+        self.assertEqual(entry.content_hash, migration.content_hash("**本文**"))
+        self.assertIn('rel="nofollow noopener noreferrer"', comment.content_html)
+        data = self.client.get(f"/api/blog/{entry.id}", {"fields": "content_html"}).json()
+        self.assertEqual(data["content_html"], entry.content_html)
+
+
+@override_settings(SECRET_KEY=TEST_SECRET_KEY, JWT_CLAIMS_ONLY=True)
+class ClaimsOnlyWriteTests(BlogTestCase):
+    """claims-only モードでは書き込み時に認証のための DB アクセスが発生しない"""
+
+    def setUp(self):
+        super().setUp()
+        self.header = {"HTTP_AUTHORIZATION": f"Bearer {make_token(self.user)}"}
+
+    def test_create_entry_without_user_lookup(self):
+        with self.assertNumQueries(1):
+            response = self.client.post(
+                "/api/blog/",
+                {"title": "hello", "content": "world"},
+                content_type="application/json",
+                **self.header,
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["author_username"], "author")
+        self.assertEqual(BlogEntry.objects.get().author_id, self.user.id)
+
+    def test_ownership_is_checked_by_id(self):
+        entry = self.create_entries(1)[0]
+        other = User.objects.create_user(username="other", email="other@example.com")
+        response = self.client.delete(
+            f"/api/blog/{entry.id}",
+            HTTP_AUTHORIZATION=f"Bearer {make_token(other)}",
+        )
+        self.assertEqual(response.status_code, 403)
+        response = self.client.delete(f"/api/blog/{entry.id}", **self.header)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(SECRET_KEY=TEST_SECRET_KEY)
+class OwnedWriteTests(BlogTestCase):
+    """所有者条件付きの UPDATE / DELETE"""
+
+    def setUp(self):
+        super().setUp()
+        self.entry = self.create_entries(1)[0]
+        self.comment = Comment.objects.create(blog_entry=self.entry, content="c", author=self.user)
+        self.other = User.objects.create_user(username="other", email="other@example.com")
+
+    def request(self, method, url, user=None, data=None):
+        token = make_token(user or self.user)
+        return getattr(self.client, method)(
+            url, data, content_type="application/json", HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+
+    def test_update_entry_only_touches_given_fields(self):
+        # 認証（キャッシュミス）+ UPDATE + 結果の SELECT
+        with self.assertNumQueries(3):
+            response = self.request("put", f"/api/blog/{self.entry.id}", data={"title": "new"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["title"], "new")
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.title, "new")
+        self.assertEqual(self.entry.content, "content 0")
+        self.assertGreater(self.entry.updated_at, self.entry.created_at)
+
+    def test_update_entry_forbidden_and_not_found(self):
+        response = self.request("put", f"/api/blog/{self.entry.id}", self.other, {"title": "x"})
+        self.assertEqual(response.status_code, 403)
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.title, "title 0")
+
+        response = self.request("put", "/api/blog/999999", data={"title": "x"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_delete_entry(self):
+        response = self.request("delete", f"/api/blog/{self.entry.id}", self.other)
+        self.assertEqual(response.status_code, 403)
+        response = self.request("delete", f"/api/blog/{self.entry.id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(BlogEntry.objects.exists())
+        self.assertFalse(Comment.objects.exists())
+        response = self.request("delete", f"/api/blog/{self.entry.id}")
+        self.assertEqual(response.status_code, 404)
+
+    def test_update_and_delete_comment(self):
+        url = f"/api/blog/{self.entry.id}/comments/{self.comment.id}"
+        response = self.request("put", url, self.other, {"content": "x"})
+        self.assertEqual(response.status_code, 403)
+        response = self.request("put", url, data={"content": "edited"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["content"], "edited")
+
+        # 別の記事配下の URL では見つからない
+        other_entry = self.create_entries(1)[0]
+        response = self.request("delete", f"/api/blog/{other_entry.id}/comments/{self.comment.id}")
+        self.assertEqual(response.status_code, 404)
+
+        user_cache.set(self.user.id, self.user)
+        # キャッシュ済みの認証 + path の取得 + 返信を含むサブツリーの SELECT（シグナル受信者のため）
+        # + 返信の CASCADE 確認 + DELETE + 記事のコメント数の UPDATE（+ SAVEPOINT の 2 回）
+        with self.assertNumQueries(7):
+            response = self.request("delete", url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Comment.objects.exists())
+
+
+# レスポンスキャッシュを通さずに、バリデータだけで 304 を返すことを確認する
+@override_settings(BLOG_CACHE_ENABLED=False)
+class ConditionalRequestTests(BlogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.entry = self.create_entries(1)[0]
+
+    def test_detail_returns_304_for_matching_etag(self):
+        url = f"/api/blog/{self.entry.id}"
+        response = self.client.get(url)
+        etag = response["ETag"]
+
+        # ETag の集約の 1 クエリだけで、記事とコメントは読み出さない
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        validated = blog_entry_detail_validators(RequestFactory().get(url), self.entry.id)
+        self.assertEqual(validated, etag)
+
+    def test_etag_follows_writes_from_other_processes(self):
+        url = f"/api/blog/{self.entry.id}"
+        etag = self.client.get(url)["ETag"]
+        # キャッシュが消えても ETag は変わらない
+        get_cache().clear()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # ほかのプロセスの書き込み（このプロセスのキャッシュのバージョンは上がらない）
+        BlogEntry.objects.filter(id=self.entry.id).update(
+            title="updated", updated_at=timezone.now()
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["title"], "updated")
+
+    def test_detail_etag_changes_with_comments(self):
+        url = f"/api/blog/{self.entry.id}"
+        etag = self.client.get(url)["ETag"]
+        with self.committed():
+            comment = Comment.objects.create(blog_entry=self.entry, content="c", author=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response["ETag"]
+        with self.committed():
+            comment.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_detects_deletes_without_last_modified(self):
+        other = self.create_entries(1)[0]
+        response = self.client.get("/api/blog/")
+        self.assertFalse(response.has_header("Last-Modified"))
+        etag = response["ETag"]
+        with self.committed():
+            other.delete()
+        response = self.client.get(
+            "/api/blog/", HTTP_IF_NONE_MATCH=etag, HTTP_IF_MODIFIED_SINCE=http_date(time.time())
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 1)
+
+    def test_list_etag_depends_on_page_and_content(self):
+        etag = self.client.get("/api/blog/")["ETag"]
+        self.assertEqual(self.client.get("/api/blog/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # 別のページは別の ETag
+        response = self.client.get("/api/blog/", {"offset": 1}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        self.create_entries(1)
+        self.assertEqual(self.client.get("/api/blog/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_comment_list(self):
+        url = f"/api/blog/{self.entry.id}/comments/"
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.committed():
+            Comment.objects.create(blog_entry=self.entry, content="c", author=self.user)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_missing_entry_still_404(self):
+        self.assertEqual(self.client.get("/api/blog/999999").status_code, 404)
+
+
+@override_settings(SECRET_KEY=TEST_SECRET_KEY)
+class ResponseCacheTests(BlogTestCase):
+    def setUp(self):
+        super().setUp()
+        reset_cache_stats()
+        self.entry = self.create_entries(1)[0]
+        self.url = f"/api/blog/{self.entry.id}"
+
+    def test_second_read_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertEqual(cache_stats()["get_blog_entry"], {"hit": 1, "miss": 1})
+
+    def test_cache_hit_honors_if_none_match(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_comment_invalidates_detail_and_comment_list(self):
+        comments_url = f"{self.url}/comments/"
+        self.client.get(self.url)
+        self.client.get(comments_url)
+        with self.committed():
+            Comment.objects.create(blog_entry=self.entry, content="new", author=self.user)
+        self.assertEqual(len(self.client.get(self.url).json()["comments"]), 1)
+        self.assertEqual(self.client.get(comments_url).json()["count"], 1)
+
+    def test_versions_are_bumped_after_commit(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Comment.objects.create(blog_entry=self.entry, content="new", author=self.user)
+            # コミット前はバージョンが変わらない（コミット前の行を新しいバージョンでキャッシュしない）
+            self.assertEqual(self.client.get(self.url)["X-Cache"], "HIT")
+        for callback in callbacks:
+            callback()
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(len(response.json()["comments"]), 1)
+
+    def test_update_through_api_invalidates(self):
+        self.client.get(self.url)
+        self.client.get("/api/blog/")
+        self.client.put(
+            self.url,
+            {"title": "updated"},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {make_token(self.user)}",
+        )
+        self.assertEqual(self.client.get(self.url).json()["title"], "updated")
+        self.assertEqual(self.client.get("/api/blog/").json()["items"][0]["title"], "updated")
+
+    def test_query_string_is_part_of_key(self):
+        self.create_entries(2)
+        self.client.get("/api/blog/", {"limit": 1})
+        response = self.client.get("/api/blog/", {"limit": 2})
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(len(response.json()["items"]), 2)
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def view(request, **kwargs):
+            calls.append(1)
+            time.sleep(0.2)
+            return HttpResponse(b"{}", content_type="application/json")
+
+        cached_view = cached_response("stampede", lambda **kw: ["blog:ver:stampede"])(view)
+        request = RequestFactory().get("/stampede")
+        responses = []
+        threads = [
+            threading.Thread(target=lambda: responses.append(cached_view(request)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(r["X-Cache"] for r in responses), ["HIT"] * 4 + ["MISS"])
+
+
+class SharedCacheTests(BlogTestCase):
+    """レスポンスキャッシュは、ほかのプロセスと共有できるキャッシュの場合だけ使う"""
+
+    def setUp(self):
+        super().setUp()
+        self.entry = self.create_entries(1)[0]
+        self.url = f"/api/blog/{self.entry.id}"
+
+    @override_settings(BLOG_CACHE_ENABLED=None)
+    def test_process_local_cache_is_not_used(self):
+        self.client.get(self.url)
+        # ほかのプロセスの書き込み（このプロセスのキャッシュのバージョンは上がらない）
+        BlogEntry.objects.filter(id=self.entry.id).update(title="updated")
+        response = self.client.get(self.url)
+        self.assertNotIn("X-Cache", response)
+        self.assertEqual(response.json()["title"], "updated")
+
+    @override_settings(BLOG_CACHE_ENABLED=None)
+    def test_write_through_another_cache_instance_is_not_served_stale(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        backend = "django.core.cache.backends.filebased.FileBasedCache"
+        with self.settings(CACHES={"default": {"BACKEND": backend, "LOCATION": location}}):
+            self.assertEqual(self.client.get(self.url)["X-Cache"], "MISS")
+            self.assertEqual(self.client.get(self.url)["X-Cache"], "HIT")
+            # 別のプロセス（同じ場所を指す別のキャッシュのインスタンス）で書き込む
+            other = FileBasedCache(location, {})
+            with mock.patch("blog.cache.get_cache", return_value=other), self.committed():
+                self.entry.title = "updated"
+                self.entry.save()
+            response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["title"], "updated")
+
+    def test_enabled_process_local_cache_fails_check(self):
+        self.assertEqual([error.id for error in check_shared_cache()], ["blog.E001"])
+        with self.settings(BLOG_CACHE_ENABLED=None):
+            self.assertEqual(check_shared_cache(), [])
+
+
+@override_settings(SECRET_KEY=TEST_SECRET_KEY, ROOT_URLCONF="config.urls_async")
+class AsyncApiTests(BlogTestCase):
+    """config/urls_async.py の非同期版エンドポイント"""
+
+    def setUp(self):
+        super().setUp()
+        self.header = {"HTTP_AUTHORIZATION": f"Bearer {make_token(self.user)}"}
+
+    def test_crud_round_trip(self):
+        response = self.client.post(
+            "/api/blog/", {"title": "t", "content": "c"}, content_type="application/json", **self.header
+        )
+        self.assertEqual(response.status_code, 200)
+        entry_id = response.json()["id"]
+
+        response = self.client.post(
+            f"/api/blog/{entry_id}/comments/",
+            {"content": "hi", "blog_entry_id": entry_id},
+            content_type="application/json",
+            **self.header,
+        )
+        self.assertEqual(response.status_code, 200)
+        comment_id = response.json()["id"]
+
+        detail = self.client.get(f"/api/blog/{entry_id}").json()
+        self.assertEqual([c["id"] for c in detail["comments"]], [comment_id])
+        self.assertEqual(self.client.get("/api/blog/").json()["count"], 1)
+        page = self.client.get(f"/api/blog/{entry_id}/comments/", {"cursor": ""}).json()
+        self.assertEqual(len(page["items"]), 1)
+
+        response = self.client.put(
+            f"/api/blog/{entry_id}", {"title": "new"}, content_type="application/json", **self.header
+        )
+        self.assertEqual(response.json()["title"], "new")
+        self.assertEqual(self.client.get(f"/api/blog/{entry_id}").json()["title"], "new")
+
+        with self.committed():
+            response = self.client.delete(
+                f"/api/blog/{entry_id}/comments/{comment_id}", **self.header
+            )
+        self.assertEqual(response.status_code, 200)
+        with self.committed():
+            response = self.client.delete(f"/api/blog/{entry_id}", **self.header)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(f"/api/blog/{entry_id}").status_code, 404)
+
+    def test_ownership_and_not_found(self):
+        entry = self.create_entries(1)[0]
+        other = User.objects.create_user(username="other", email="other@example.com")
+        response = self.client.put(
+            f"/api/blog/{entry.id}",
+            {"title": "x"},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {make_token(other)}",
+        )
+        self.assertEqual(response.status_code, 403)
+        response = self.client.delete("/api/blog/999999", **self.header)
+        self.assertEqual(response.status_code, 404)
+
+    def test_conditional_get(self):
+        entry = self.create_entries(1)[0]
+        etag = self.client.get(f"/api/blog/{entry.id}")["ETag"]
+        response = self.client.get(f"/api/blog/{entry.id}", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_bulk(self):
+        items = [{"title": f"t{i}", "content": "c"} for i in range(3)]
+        response = self.client.post(
+            "/api/blog/bulk", {"items": items}, content_type="application/json", **self.header
+        )
+        ids = [r["id"] for r in response.json()["results"]]
+        self.assertEqual(BlogEntry.objects.filter(id__in=ids).count(), 3)
+        response = self.client.post(
+            "/api/blog/bulk/delete", {"ids": ids}, content_type="application/json", **self.header
+        )
+        self.assertEqual({r["status"] for r in response.json()["results"]}, {"deleted"})
+        self.assertFalse(BlogEntry.objects.exists())
+
+    def test_batch_and_fields(self):
+        entry = self.create_entries(1)[0]
+        response = self.client.get("/api/blog/batch", {"ids": f"{entry.id},999999"})
+        items = response.json()["items"]
+        self.assertEqual([i["status"] for i in items], ["ok", "not_found"])
+        self.assertEqual(items[0]["entry"]["comments"], [])
+        data = self.client.get("/api/blog/", {"fields": "title"}).json()
+        self.assertEqual(data["items"], [{"id": entry.id, "title": "title 0"}])
+
+    async def test_export(self):
+        await sync_to_async(self.create_entries)(2)
+        response = await self.async_client.get("/api/blog/export", {"comments": True})
+        self.assertEqual(response["Content-Type"], export.CONTENT_TYPE)
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row["title"] for row in rows], ["title 0", "title 1"])
+
+    def test_me(self):
+        response = self.client.get("/api/auth/me", **self.header)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["username"], "author")
+        self.assertEqual(self.client.get("/api/auth/me").status_code, 401)
+
+
+class SearchTests(BlogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.django = BlogEntry.objects.create(
+            title="Django ninja", content="Fast APIs with django and pydantic", author=self.user
+        )
+        self.other = BlogEntry.objects.create(
+            title="Cooking", content="A recipe that mentions django once", author=self.user
+        )
+        BlogEntry.objects.create(title="Unrelated", content="nothing here", author=self.user)
+
+    def search(self, **params):
+        response = self.client.get("/api/blog/search", params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_results_are_ranked_and_highlighted(self):
+        data = self.search(q="django")
+        self.assertEqual([hit["id"] for hit in data["items"]], [self.django.id, self.other.id])
+        self.assertEqual(data["items"][0]["title"], "<mark>Django</mark> ninja")
+        self.assertIn("<mark>django</mark>", data["items"][1]["snippet"])
+
+    def test_snippets_are_escaped(self):
+        BlogEntry.objects.create(title="xss", content="<script>django</script>", author=self.user)
+        snippet = self.search(q="script")["items"][0]["snippet"]
+        self.assertNotIn("<script>", snippet)
+        self.assertIn("&lt;", snippet)
+
+    def test_index_follows_updates_and_deletes(self):
+        BlogEntry.objects.filter(id=self.other.id).update(content="no longer relevant")
+        self.assertEqual([hit["id"] for hit in self.search(q="django")["items"]], [self.django.id])
+        self.django.delete()
+        self.assertEqual(self.search(q="django")["items"], [])
+
+    def test_keyset_paging(self):
+        first = self.search(q="django", limit=1)
+        self.assertEqual([hit["id"] for hit in first["items"]], [self.django.id])
+        second = self.search(q="django", limit=1, cursor=first["next"])
+        self.assertEqual([hit["id"] for hit in second["items"]], [self.other.id])
+        self.assertIsNone(second["next"])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.search(q='"AND OR NEAR(')["items"], [])
+        self.assertEqual(self.search(q="   ")["items"], [])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as c:
+            c.execute("INSERT INTO blog_entry_fts(blog_entry_fts) VALUES ('delete-all')")
+        self.assertEqual(self.search(q="django")["items"], [])
+        out = StringIO()
+        call_command("rebuild_search_index", batch_size=2, stdout=out)
+        self.assertIn("3", out.getvalue())
+        self.assertEqual(len(self.search(q="django")["items"]), 2)
+
+
+class BulkApiTests(BlogTestCase):
+    """一括作成・更新・削除"""
+
+    def setUp(self):
+        super().setUp()
+        self.other = User.objects.create_user(username="other", email="other@example.com")
+
+    def request(self, method, url, data, user=None):
+        token = make_token(user or self.user)
+        return getattr(self.client, method)(
+            url, data, content_type="application/json", HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+
+    def statuses(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [(r["index"], r["status"]) for r in response.json()["results"]]
+
+    def test_create_entries_with_constant_queries(self):
+        items = [{"title": f"t{i}", "content": "c"} for i in range(50)]
+        # 認証 + トランザクション内の INSERT（SAVEPOINT を含む）
+        with self.assertNumQueries(4):
+            response = self.request("post", "/api/blog/bulk", {"items": items})
+        results = response.json()["results"]
+        self.assertEqual({r["status"] for r in results}, {"created"})
+        created = BlogEntry.objects.filter(id__in=[r["id"] for r in results])
+        self.assertEqual(created.count(), 50)
+        self.assertEqual(set(created.values_list("author_id", flat=True)), {self.user.id})
+
+    def test_invalid_item_rejects_whole_request(self):
+        items = [{"title": "ok", "content": "c"}, {"title": "", "content": "c"}]
+        response = self.request("post", "/api/blog/bulk", {"items": items})
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(BlogEntry.objects.exists())
+
+    def test_update_entries_checks_ownership_per_item(self):
+        mine = self.create_entries(2)
+        theirs = BlogEntry.objects.create(title="theirs", content="c", author=self.other)
+        items = [
+            {"id": mine[0].id, "title": "new 0"},
+            {"id": theirs.id, "title": "hacked"},
+            {"id": 999999, "title": "missing"},
+            {"id": mine[1].id, "content": "new content"},
+        ]
+        response = self.request("put", "/api/blog/bulk", {"items": items})
+        self.assertEqual(
+            self.statuses(response),
+            [(0, "updated"), (1, "forbidden"), (2, "not_found"), (3, "updated")],
+        )
+        mine[0].refresh_from_db()
+        mine[1].refresh_from_db()
+        theirs.refresh_from_db()
+        self.assertEqual((mine[0].title, mine[0].content), ("new 0", "content 0"))
+        self.assertEqual((mine[1].title, mine[1].content), ("title 1", "new content"))
+        self.assertEqual(theirs.title, "theirs")
+
+    def test_delete_entries(self):
+        mine = self.create_entries(2)
+        theirs = BlogEntry.objects.create(title="theirs", content="c", author=self.other)
+        ids = [mine[0].id, theirs.id, mine[1].id]
+        response = self.request("post", "/api/blog/bulk/delete", {"ids": ids})
+        self.assertEqual(
+            self.statuses(response), [(0, "deleted"), (1, "forbidden"), (2, "deleted")]
+        )
+        self.assertEqual(list(BlogEntry.objects.values_list("id", flat=True)), [theirs.id])
+
+    def test_comments_across_entries(self):
+        first, second = self.create_entries(2)
+        items = [
+            {"blog_entry_id": first.id, "content": "a"},
+            {"blog_entry_id": 999999, "content": "b"},
+            {"blog_entry_id": second.id, "content": "c"},
+        ]
+        response = self.request("post", "/api/blog/comments/bulk", {"items": items})
+        self.assertEqual(
+            self.statuses(response), [(0, "created"), (1, "not_found"), (2, "created")]
+        )
+        results = response.json()["results"]
+        comment = Comment.objects.get(id=results[2]["id"])
+        self.assertEqual((comment.blog_entry_id, comment.content), (second.id, "c"))
+
+        ids = [results[0]["id"], comment.id]
+        items = [{"id": i, "content": "x"} for i in ids]
+        response = self.request("put", "/api/blog/comments/bulk", {"items": items}, self.other)
+        self.assertEqual(self.statuses(response), [(0, "forbidden"), (1, "forbidden")])
+        response = self.request(
+            "put", "/api/blog/comments/bulk", {"items": [{"id": ids[0], "content": "edited"}]}
+        )
+        self.assertEqual(self.statuses(response), [(0, "updated")])
+        self.assertEqual(Comment.objects.get(id=ids[0]).content, "edited")
+
+        response = self.request("post", "/api/blog/comments/bulk/delete", {"ids": ids})
+        self.assertEqual(self.statuses(response), [(0, "deleted"), (1, "deleted")])
+        self.assertFalse(Comment.objects.exists())
+
+    def test_bulk_writes_invalidate_cache(self):
+        entry = self.create_entries(1)[0]
+        self.client.get("/api/blog/")
+        self.client.get(f"/api/blog/{entry.id}")
+        self.request("post", "/api/blog/bulk", {"items": [{"title": "new", "content": "c"}]})
+        self.assertEqual(self.client.get("/api/blog/").json()["count"], 2)
+        items = [{"blog_entry_id": entry.id, "content": "c"}]
+        self.request("post", "/api/blog/comments/bulk", {"items": items})
+        self.assertEqual(len(self.client.get(f"/api/blog/{entry.id}").json()["comments"]), 1)
+
+
+class CommentActivityTests(BlogTestCase):
+    """BlogEntry.comment_count / last_activity_at の非正規化"""
+
+    def setUp(self):
+        super().setUp()
+        self.entry = self.create_entries(1)[0]
+        self.header = {"HTTP_AUTHORIZATION": f"Bearer {make_token(self.user)}"}
+
+    def add_comment(self, entry=None):
+        entry = entry or self.entry
+        with self.committed():
+            response = self.client.post(
+                f"/api/blog/{entry.id}/comments/",
+                {"content": "c", "blog_entry_id": entry.id},
+                content_type="application/json",
+                **self.header,
+            )
+        return response.json()
+
+    def test_counts_follow_comment_create_and_delete(self):
+        first = self.add_comment()
+        second = self.add_comment()
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.comment_count, 2)
+        latest = Comment.objects.get(id=second["id"]).created_at
+        self.assertEqual(self.entry.last_activity_at, latest)
+
+        self.client.delete(f"/api/blog/{self.entry.id}/comments/{second['id']}", **self.header)
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.comment_count, 1)
+        self.assertEqual(
+            self.entry.last_activity_at, Comment.objects.get(id=first["id"]).created_at
+        )
+
+        Comment.objects.filter(id=first["id"]).delete()
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.comment_count, 0)
+        self.assertEqual(self.entry.last_activity_at, self.entry.created_at)
+
+    def test_list_exposes_counts_and_is_invalidated(self):
+        self.assertEqual(self.client.get("/api/blog/").json()["items"][0]["comment_count"], 0)
+        self.add_comment()
+        item = self.client.get("/api/blog/").json()["items"][0]
+        self.assertEqual(item["comment_count"], 1)
+        self.assertIn("last_activity_at", item)
+
+    def test_bulk_comments_update_counts(self):
+        other = self.create_entries(1)[0]
+        items = [{"blog_entry_id": self.entry.id, "content": "c"}] * 3
+        items.append({"blog_entry_id": other.id, "content": "c"})
+        token = make_token(self.user)
+        self.client.post(
+            "/api/blog/comments/bulk",
+            {"items": items},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+        )
+        counts = dict(BlogEntry.objects.values_list("id", "comment_count"))
+        self.assertEqual(counts, {self.entry.id: 3, other.id: 1})
+
+        ids = list(Comment.objects.filter(blog_entry=self.entry).values_list("id", flat=True))
+        # 削除したコメント数によらず、記事の再計算は 1 回の UPDATE で行う
+        with self.assertNumQueries(8):
+            self.client.post(
+                "/api/blog/comments/bulk/delete",
+                {"ids": ids[:2]},
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f"Bearer {token}",
+            )
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.comment_count, 1)
+
+    def test_sort_by_activity(self):
+        older, newer = self.entry, self.create_entries(1)[0]
+        self.add_comment(older)
+        ids = [i["id"] for i in self.client.get("/api/blog/").json()["items"]]
+        self.assertEqual(ids, [newer.id, older.id])
+
+        page = self.client.get("/api/blog/", {"sort": "activity", "limit": 1, "cursor": ""}).json()
+        self.assertEqual([i["id"] for i in page["items"]], [older.id])
+        page = self.client.get(
+            "/api/blog/", {"sort": "activity", "limit": 1, "cursor": page["next"]}
+        ).json()
+        self.assertEqual([i["id"] for i in page["items"]], [newer.id])
+        offset = self.client.get("/api/blog/", {"sort": "activity"}).json()
+        self.assertEqual([i["id"] for i in offset["items"]], [older.id, newer.id])
+
+    def test_repair_command(self):
+        self.add_comment()
+        self.add_comment()
+        BlogEntry.objects.update(comment_count=42)
+        self.client.get("/api/blog/")
+        out = StringIO()
+        call_command("repair_comment_stats", batch_size=1, stdout=out)
+        self.assertIn("1", out.getvalue())
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.comment_count, 2)
+        self.assertEqual(self.client.get("/api/blog/").json()["items"][0]["comment_count"], 2)
+
+
+class ExportTests(BlogTestCase):
+    """NDJSON のストリーミングエクスポート"""
+
+    def export(self, **params):
+        response = self.client.get("/api/blog/export", params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], export.CONTENT_TYPE)
+        self.assertTrue(response.streaming)
+        body = b"".join(response.streaming_content)
+        return [json.loads(line) for line in body.splitlines()]
+
+    def test_exports_entries_in_update_order(self):
+        entries = self.create_entries(3)
+        entries[0].title = "edited"
+        entries[0].save()
+        rows = self.export()
+        self.assertEqual([row["id"] for row in rows], [entries[1].id, entries[2].id, entries[0].id])
+        self.assertEqual(rows[-1]["title"], "edited")
+        self.assertNotIn("comments", rows[0])
+
+    def test_since_filter(self):
+        old, new = self.create_entries(2)
+        BlogEntry.objects.filter(id=old.id).update(updated_at=old.updated_at.replace(year=2000))
+        since = new.updated_at.isoformat()
+        self.assertEqual([row["id"] for row in self.export(since=since)], [new.id])
+
+    def test_since_includes_comment_changes(self):
+        entry, other = self.create_entries(2)
+        comment = Comment.objects.create(blog_entry=entry, content="c", author=self.user)
+        past = timezone.now().replace(year=2000)
+        BlogEntry.objects.update(updated_at=past)
+        Comment.objects.update(updated_at=past)
+        since = timezone.now().isoformat()
+        self.assertEqual(self.export(since=since, comments=True), [])
+
+        # コメントだけを編集・追加する（記事の updated_at は変わらない）
+        comment.content = "edited"
+        comment.save()
+        rows = self.export(since=since, comments=True)
+        self.assertEqual([row["id"] for row in rows], [entry.id])
+        self.assertEqual(rows[0]["comments"][0]["content"], "edited")
+        self.assertEqual(rows[0]["changed_at"], rows[0]["comments"][0]["updated_at"])
+        self.assertEqual(self.export(since=since), [])
+
+        since = rows[-1]["changed_at"]
+        Comment.objects.create(blog_entry=other, content="new", author=self.user)
+        rows = self.export(since=since, comments=True)
+        self.assertEqual([row["id"] for row in rows], [entry.id, other.id])
+
+    def test_rows_do_not_include_content_html(self):
+        entry = self.create_entries(1)[0]
+        Comment.objects.create(blog_entry=entry, content="c", author=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            rows = self.export(comments=True)
+        self.assertNotIn("content_html", rows[0])
+        self.assertNotIn("content_html", rows[0]["comments"][0])
+        self.assertEqual(rows[0]["changed_at"], rows[0]["comments"][0]["updated_at"])
+        self.assertFalse(any("content_html" in query["sql"] for query in queries.captured_queries))
+
+    def test_nested_comments_are_fetched_per_chunk(self):
+        entries = self.create_entries(3)
+        for entry in entries:
+            Comment.objects.create(blog_entry=entry, content="c", author=self.user)
+
+        # 記事は 1 クエリをチャンクごとに読み出し、コメントはチャンクごとに 1 クエリ
+        with self.assertNumQueries(3):
+            chunks = list(export.iter_export(comments=True, chunk_size=2))
+        self.assertEqual(len(chunks), 2)
+        rows = [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+        self.assertEqual([len(row["comments"]) for row in rows], [1, 1, 1])
+        self.assertEqual(rows[0]["comments"][0]["blog_entry_id"], entries[0].id)
+
+
+@override_settings(SECRET_KEY=TEST_SECRET_KEY)
+class CommentThreadTests(BlogTestCase):
+    """返信のツリー（マテリアライズドパス）"""
+
+    def setUp(self):
+        super().setUp()
+        self.entry = self.create_entries(1)[0]
+        self.header = {"HTTP_AUTHORIZATION": f"Bearer {make_token(self.user)}"}
+        self.url = f"/api/blog/{self.entry.id}/comments/"
+
+    def reply(self, parent=None, content="c"):
+        response = self.client.post(
+            self.url,
+            {"blog_entry_id": self.entry.id, "content": content, "parent_id": parent},
+            content_type="application/json",
+            **self.header,
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()["id"]
+
+    def build_thread(self):
+        # root ─┬─ a ── a1 ── a2
+        #       └─ b
+        root = self.reply(content="root")
+        a = self.reply(root, "a")
+        a1 = self.reply(a, "a1")
+        b = self.reply(root, "b")
+        a2 = self.reply(a1, "a2")
+        return root, a, a1, a2, b
+
+    def test_thread_is_depth_first_in_one_query(self):
+        root, a, a1, a2, b = self.build_thread()
+        self.reply(content="other top-level")
+        # 起点の path の取得 + サブツリーの範囲検索
+        with self.assertNumQueries(2):
+            response = self.client.get(f"{self.url}{root}/thread")
+        items = response.json()["items"]
+        self.assertEqual([c["id"] for c in items], [root, a, a1, a2, b])
+        self.assertEqual([c["depth"] for c in items], [0, 1, 2, 3, 1])
+        self.assertEqual(items[2]["parent_id"], a)
+
+        # 途中のコメントを起点にし、depth で階層を制限する
+        response = self.client.get(f"{self.url}{a}/thread", {"depth": 1})
+        self.assertEqual([c["id"] for c in response.json()["items"]], [a, a1])
+
+    def test_thread_pagination(self):
+        ids = self.build_thread()
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            data = self.client.get(f"{self.url}{ids[0]}/thread", params).json()
+            seen += [c["id"] for c in data["items"]]
+            cursor = data["next"]
+            if not cursor:
+                break
+        self.assertEqual(seen, [ids[0], ids[1], ids[2], ids[3], ids[4]])
+        response = self.client.get(f"{self.url}{ids[0]}/thread", {"cursor": "not-a-path"})
+        self.assertEqual(response.status_code, 422)
+
+    def test_top_level_list(self):
+        root, *_ = self.build_thread()
+        other = self.reply(content="newer top-level")
+        response = self.client.get(self.url, {"top_level": "true"})
+        self.assertEqual([c["id"] for c in response.json()["items"]], [other, root])
+        self.assertEqual(self.client.get(self.url).json()["count"], 6)
+
+    def test_invalid_parent(self):
+        other_entry = self.create_entries(1)[0]
+        foreign = Comment.objects.create(blog_entry=other_entry, content="c", author=self.user)
+        response = self.client.post(
+            self.url,
+            {"blog_entry_id": self.entry.id, "content": "c", "parent_id": foreign.id},
+            content_type="application/json",
+            **self.header,
+        )
+        self.assertEqual(response.status_code, 400)
+
+        deep = Comment.objects.create(blog_entry=self.entry, content="c", author=self.user)
+        Comment.objects.filter(id=deep.id).update(depth=MAX_COMMENT_DEPTH)
+        response = self.client.post(
+            self.url,
+            {"blog_entry_id": self.entry.id, "content": "c", "parent_id": deep.id},
+            content_type="application/json",
+            **self.header,
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_delete_removes_subtree_and_updates_count(self):
+        root, a, a1, a2, b = self.build_thread()
+        response = self.client.delete(f"{self.url}{a}", **self.header)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(Comment.objects.values_list("id", flat=True)), sorted([root, b]))
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.comment_count, 2)
+
+    def test_bulk_replies(self):
+        root = self.reply()
+        items = [
+            {"blog_entry_id": self.entry.id, "content": "r1", "parent_id": root},
+            {"blog_entry_id": self.entry.id, "content": "r2", "parent_id": 999999},
+        ]
+        response = self.client.post(
+            "/api/blog/comments/bulk",
+            {"items": items},
+            content_type="application/json",
+            **self.header,
+        )
+        results = response.json()["results"]
+        self.assertEqual([r["status"] for r in results], ["created", "not_found"])
+        reply = Comment.objects.get(id=results[0]["id"])
+        self.assertEqual((reply.parent_id, reply.depth), (root, 1))
+        self.assertEqual(reply.path, f"{root:010d}{reply.id:010d}")
+
+    @override_settings(ROOT_URLCONF="config.urls_async")
+    def test_async_views(self):
+        root, a, a1, a2, b = self.build_thread()
+        response = self.client.get(f"{self.url}{root}/thread", {"depth": 1})
+        self.assertEqual([c["id"] for c in response.json()["items"]], [root, a, b])
+        self.assertEqual(self.client.delete(f"{self.url}{root}", **self.header).status_code, 200)
+        self.assertFalse(Comment.objects.exists())
+
+
+class BatchFetchTests(BlogTestCase):
+    """/api/blog/batch とリクエスト単位のローダー"""
+
+    def setUp(self):
+        super().setUp()
+        self.entries = self.create_entries(3)
+        for entry in self.entries:
+            Comment.objects.create(blog_entry=entry, content=f"c{entry.id}", author=self.user)
+
+    def test_returns_entries_in_request_order_with_not_found_markers(self):
+        first, second, third = (e.id for e in self.entries)
+        ids = f"{third},999999,{first},{third}"
+        # 記事 1 回 + コメント 1 回（件数に関係なく一定）
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/blog/batch", {"ids": ids})
+        self.assertEqual(response.status_code, 200, response.content)
+        items = response.json()["items"]
+        self.assertEqual([i["id"] for i in items], [third, 999999, first, third])
+        self.assertEqual([i["status"] for i in items], ["ok", "not_found", "ok", "ok"])
+        self.assertIsNone(items[1]["entry"])
+        self.assertEqual(items[0]["entry"]["comments"][0]["content"], f"c{third}")
+        self.assertEqual(items[2]["entry"]["author_username"], "author")
+
+    def test_fields_without_comments_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                "/api/blog/batch", {"ids": str(self.entries[0].id), "fields": "title"}
+            )
+        entry = response.json()["items"][0]["entry"]
+        self.assertEqual(entry, {"id": self.entries[0].id, "title": "title 0"})
+
+    def test_invalid_ids_are_rejected(self):
+        for ids in ("", "1,x", ",".join(str(i) for i in range(101))):
+            response = self.client.get("/api/blog/batch", {"ids": ids})
+            self.assertEqual(response.status_code, 422, ids)
+
+    def test_loader_coalesces_repeated_lookups(self):
+        request = RequestFactory().get("/")
+        with self.assertNumQueries(1):
+            users = user_loader(request)
+            users.load_many([self.user.id, self.user.id])
+            self.assertEqual(user_loader(request).load(self.user.id), self.user)
+        # 見つからなかったキーも覚えておき、問い合わせ直さない
+        calls = []
+        loader = DataLoader(lambda keys: calls.append(keys) or {})
+        self.assertEqual(loader.load_many([1, 2, 1]), [None, None, None])
+        self.assertIsNone(loader.load(2))
+        self.assertEqual(calls, [[1, 2]])
+        # 別のリクエストでは読み込み直す
+        with self.assertNumQueries(1):
+            user_loader(RequestFactory().get("/")).load(self.user.id)
+
+
+@override_settings(SECRET_KEY=TEST_SECRET_KEY)
+class SideEffectJobTests(BlogTestCase):
+    """作成後の処理（通知メール・キャッシュの再作成）のジョブ"""
+
+    def setUp(self):
+        super().setUp()
+        self.entry = self.create_entries(1)[0]
+        self.commenter = User.objects.create_user(
+            username="commenter", email="commenter@example.com", password="pass-1234-word"
+        )
+        self.url = f"/api/blog/{self.entry.id}/comments/"
+        Job.objects.all().delete()
+
+    def comment(self, user, parent=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                self.url,
+                {"blog_entry_id": self.entry.id, "content": "hello", "parent_id": parent},
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f"Bearer {make_token(user)}",
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()["id"]
+
+    def drain(self):
+        """ジョブを実行する（ジョブの中で登録されたジョブもコミット後に登録されるので、続けて実行する）"""
+        while True:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                Worker("test").drain()
+            if not callbacks:
+                break
+
+    def test_comment_enqueues_notification_after_commit(self):
+        self.comment(self.commenter)
+        self.assertEqual(list(Job.objects.values_list("name", flat=True)), ["blog.notify_comment"])
+        self.assertEqual(mail.outbox, [])
+
+        self.drain()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["author@example.com"])
+        self.assertIn("title 0", mail.outbox[0].subject)
+        self.assertFalse(Job.objects.exists())
+
+    def test_reply_notifies_parent_author_but_not_self(self):
+        parent = self.comment(self.commenter)
+        self.comment(self.user, parent=parent)
+        self.drain()
+        # 1 件目は記事の作者へ、2 件目（作者自身の返信）は返信先の作者へだけ送る
+        self.assertEqual(
+            sorted(m.to[0] for m in mail.outbox), ["author@example.com", "commenter@example.com"]
+        )
+
+    def test_failed_mail_is_retried_only_for_its_recipient(self):
+        parent = self.comment(self.commenter)
+        mail.outbox.clear()
+        Job.objects.all().delete()
+        third = User.objects.create_user(username="third", email="third@example.com")
+        self.comment(third, parent=parent)
+
+        def send(subject, body, sender, to):
+            if to == ["commenter@example.com"]:
+                raise ConnectionError("SMTP down")
+            return mail.send_mail(subject, body, sender, to)
+
+        with mock.patch("blog.tasks.send_mail", side_effect=send):
+            self.drain()
+        self.assertEqual([m.to for m in mail.outbox], [["author@example.com"]])
+        # 失敗した宛先のジョブだけが再試行を待ち、送信済みの宛先には再送しない
+        job = Job.objects.get()
+        self.assertEqual(job.payload["user_id"], str(self.commenter.pk))
+        Job.objects.update(run_at=timezone.now())
+        self.drain()
+        self.assertEqual(
+            [m.to for m in mail.outbox], [["author@example.com"], ["commenter@example.com"]]
+        )
+        self.assertFalse(Job.objects.exists())
+
+    def test_request_only_inserts_the_job(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.comment(self.commenter)
+        # 通知先の読み込みやメールの送信はワーカーで行い、リクエストでは INSERT 1 回だけ
+        job_queries = [q["sql"] for q in queries if "jobs_job" in q["sql"]]
+        self.assertEqual(len(job_queries), 1)
+        self.assertTrue(job_queries[0].startswith("INSERT"))
+        self.assertEqual(len(queries), 7)
+
+    @override_settings(BLOG_CACHE_WARM=True)
+    def test_warm_job_fills_response_cache(self):
+        self.comment(self.commenter)
+        self.drain()
+        reset_cache_stats()
+        self.assertEqual(self.client.get(f"/api/blog/{self.entry.id}")["X-Cache"], "HIT")
+        self.assertEqual(self.client.get("/api/blog/")["X-Cache"], "HIT")
+
+
+@override_settings(
+    SECRET_KEY=TEST_SECRET_KEY, DATABASE_REPLICAS=["replica"], BLOG_CACHE_ENABLED=True
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    config/replicas.py の振り分け。2 つの SQLite ファイルを primary とレプリカに見立て、
+    レプリカには書き込みが届いていない（レプリケーションが遅れている）状態で確認する。
+    """
+
+    # setUpClass で追加する replica を含める（テストランナーの起動時には default だけ）
+    databases = "__all__"
+
+    @classmethod
+    def setUpClass(cls):
+        # テストランナーが作るデータベースではなく、このクラスだけで使う SQLite ファイルを追加する
+        # （書き込みはすべて primary に送られるため、レプリカは空のまま）
+        cls.tmpdir = tempfile.mkdtemp(prefix="ninja2-replica-")
+        connections.settings["replica"] = {
+            **connections.settings["default"],
+            "NAME": os.path.join(cls.tmpdir, "replica.sqlite3"),
+            "TEST": {"MIRROR": None, "NAME": None},
+        }
+        call_command("migrate", database="replica", verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections["replica"].close()
+        del connections["replica"]
+        del connections.settings["replica"]
+        shutil.rmtree(cls.tmpdir)
+
+    def setUp(self):
+        get_cache().clear()
+        user_cache.clear()
+        reset_throttles()
+        self.user = User.objects.create_user(username="author", email="author@example.com")
+        self.entry = BlogEntry.objects.create(title="t", content="c", author=self.user)
+        self.header = {"HTTP_AUTHORIZATION": f"Bearer {make_token(self.user)}"}
+
+    def batch_status(self, client=None):
+        """キャッシュを使わない /batch の読み取り（レプリカには記事が無い）"""
+        response = (client or self.client).get("/api/blog/batch", {"ids": self.entry.id})
+        return response.json()["items"][0]["status"]
+
+    def test_uncached_read_endpoints_use_replica(self):
+        comment = Comment.objects.create(blog_entry=self.entry, content="c", author=self.user)
+        self.assertEqual(self.batch_status(), "not_found")
+        response = self.client.get(f"/api/blog/{self.entry.id}/comments/{comment.id}/thread")
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn(STICKY_COOKIE, self.client.cookies)
+
+    def test_cache_misses_read_primary_despite_replica_lag(self):
+        response = self.client.get("/api/blog/")
+        self.assertEqual((response.json()["count"], response["X-Cache"]), (1, "MISS"))
+        self.assertEqual(self.client.get(f"/api/blog/{self.entry.id}").status_code, 200)
+        # 別のクライアントの書き込みでバージョンが上がった直後の読み取りも、遅れたレプリカの
+        # 内容 (0 件) ではなく primary の内容を新しいキーにキャッシュする
+        Client().post(
+            "/api/blog/",
+            {"title": "new", "content": "c"},
+            content_type="application/json",
+            **self.header,
+        )
+        response = self.client.get("/api/blog/")
+        self.assertEqual((response.json()["count"], response["X-Cache"]), (2, "MISS"))
+        response = Client().get("/api/blog/")
+        self.assertEqual((response.json()["count"], response["X-Cache"]), (2, "HIT"))
+
+    def test_writer_reads_own_writes_from_primary(self):
+        response = self.client.post(
+            "/api/blog/",
+            {"title": "new", "content": "c"},
+            content_type="application/json",
+            **self.header,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+        # Cookie を持つクライアントは primary から読む（キャッシュも使わない）
+        self.assertEqual(self.batch_status(), "ok")
+        self.assertEqual(self.client.get("/api/blog/").json()["count"], 2)
+        # 他のクライアントはレプリカから読む
+        self.assertEqual(self.batch_status(Client()), "not_found")
+
+    def pin(self, client, until):
+        """set_signed_cookie と同じ署名で、primary に固定する Cookie を client に設定する"""
+        signer = signing.get_cookie_signer(salt=STICKY_COOKIE + STICKY_COOKIE_SALT)
+        client.cookies[STICKY_COOKIE] = signer.sign(str(until))
+
+    def test_expired_pin_reads_replica(self):
+        self.pin(self.client, int(time.time()) - 1)
+        self.assertEqual(self.batch_status(), "not_found")
+
+    def test_forged_pin_reads_replica(self):
+        self.client.get("/api/blog/")
+        # 署名の無い Cookie では固定されず、レプリカもキャッシュも迂回できない
+        for value in ("inf", "9e18", str(int(time.time()) + 3)):
+            self.client.cookies[STICKY_COOKIE] = value
+            self.assertEqual(self.batch_status(), "not_found")
+            self.assertEqual(self.client.get("/api/blog/")["X-Cache"], "HIT")
+
+    def test_pin_beyond_sticky_seconds_is_ignored(self):
+        self.pin(self.client, int(time.time()) + 3600)
+        self.assertEqual(self.batch_status(), "not_found")
+
+    @override_settings(ROOT_URLCONF="config.urls_async")
+    async def test_async_views(self):
+        params = {"ids": self.entry.id}
+        response = await self.async_client.get("/api/blog/batch", params)
+        self.assertEqual(response.json()["items"][0]["status"], "not_found")
+        # キャッシュのミスは primary から読む
+        response = await self.async_client.get("/api/blog/")
+        self.assertEqual(response.json()["count"], 1)
+        self.pin(self.async_client, int(time.time()) + 3)
+        response = await self.async_client.get("/api/blog/batch", params)
+        self.assertEqual(response.json()["items"][0]["status"], "ok")
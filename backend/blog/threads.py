@@ -0,0 +1,103 @@
+"""
+コメントのスレッド（返信のツリー）。
+
+Comment.path（祖先から自分までの id を固定桁で連結した文字列）を使い、あるコメント以下の
+サブツリーを path の範囲検索 1 回で取得する（階層ごとのクエリは行わない）。
+結果は path 順、つまり深さ優先の順（同じ親の返信どうしは古い順）に並ぶので、
+ページングは最後の項目の path をカーソルにしたキーセット方式で行う。
+"""
+
+from django.db import transaction
+from django.db.models import Q
+from ninja.errors import HttpError
+
+from .activity import defer_activity
+from .models import MAX_COMMENT_DEPTH, Comment
+from .queries import schema_values
+from .schemas import CommentResponse
+
+# 返信先の確認に読み込むフィールド（Comment.save() で path / depth を使う）
+PARENT_FIELDS = ("id", "blog_entry_id", "path", "depth")
+
+
+def subtree_bounds(path):
+    """path のコメントとその子孫の path が入る範囲 [lower, upper)。upper が None なら上限なし"""
+    upper = str(int(path) + 1).zfill(len(path))
+    return path, upper if len(upper) == len(path) else None
+
+
+def subtree_q(blog_id, path):
+    """記事 blog_id の path のコメントとその子孫を選ぶ条件（(blog_entry, path) のインデックスの範囲検索）"""
+    lower, upper = subtree_bounds(path)
+    condition = Q(blog_entry_id=blog_id, path__gte=lower)
+    if upper is not None:
+        condition &= Q(path__lt=upper)
+    return condition
+
+
+def parent_queryset(blog_id, parent_id):
+    return Comment.objects.only(*PARENT_FIELDS).filter(id=parent_id, blog_entry_id=blog_id)
+
+
+def check_parent(parent):
+    """返信先のコメントを確認する（同じ記事に存在し、深さの上限に達していないこと）"""
+    if parent is None:
+        raise HttpError(400, "Parent comment not found")
+    if parent.depth >= MAX_COMMENT_DEPTH:
+        raise HttpError(400, "Reply is nested too deeply")
+    return parent
+
+
+def get_parent(blog_id, parent_id):
+    if parent_id is None:
+        return None
+    return check_parent(parent_queryset(blog_id, parent_id).first())
+
+
+async def aget_parent(blog_id, parent_id):
+    if parent_id is None:
+        return None
+    return check_parent(await parent_queryset(blog_id, parent_id).afirst())
+
+
+def thread_root(blog_id, comment_id):
+    return Comment.objects.filter(id=comment_id, blog_entry_id=blog_id).values("path", "depth")
+
+
+def thread_rows(blog_id, root, depth=None, cursor=None, names=None):
+    """
+    root（path と depth の dict）とその子孫の行を path 順に返すクエリセット。
+    depth を指定すると root から depth 階層下までに限る。cursor より後ろの行だけを返す。
+    names を指定すると、そのフィールド（とカーソル用の path）だけを取得する
+    """
+    fields, expressions = schema_values(Comment, CommentResponse, names)
+    rows = Comment.objects.filter(subtree_q(blog_id, root["path"]))
+    if depth is not None:
+        rows = rows.filter(depth__lte=root["depth"] + depth)
+    if cursor:
+        rows = rows.filter(path__gt=cursor)
+    return rows.order_by("path").values(*fields, "path", **expressions)
+
+
+def thread_page(rows, limit):
+    """limit + 1 件取得した行からページ (CommentThreadResponse) を作る"""
+    next_cursor = rows[limit - 1]["path"] if len(rows) > limit else None
+    return {"items": rows[:limit], "next": next_cursor}
+
+
+def subtrees(comments):
+    """
+    comments の各コメントとその返信すべてのクエリセット。
+    サブツリーごと削除すれば、parent の CASCADE で階層ごとに返信を探すクエリが発生しない
+    """
+    condition = Q()
+    for blog_id, path in comments.order_by().values_list("blog_entry_id", "path"):
+        condition |= subtree_q(blog_id, path)
+    return Comment.objects.filter(condition) if condition else Comment.objects.none()
+
+
+def delete_thread(comments, owner_id):
+    """comments のうち作者本人のコメントを返信ごと削除し、削除したコメント数を返す"""
+    with transaction.atomic(), defer_activity():
+        deleted, _ = subtrees(comments.filter(author_id=owner_id)).delete()
+    return deleted
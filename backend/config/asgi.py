@@ -0,0 +1,9 @@
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+# ASGI で起動する場合は非同期版のビューを使う
+os.environ.setdefault("API_ASYNC", "True")
+
+application = get_asgi_application()
@@ -0,0 +1,110 @@
+"""
+環境変数から DATABASES を組み立てる。
+
+- SQLite（既定）: 接続ごとに SQLITE_PRAGMAS の PRAGMA を設定する（WAL・synchronous=NORMAL など）
+- PostgreSQL: CONN_MAX_AGE による永続接続とヘルスチェック、または DB_POOL=True で
+  psycopg のコネクションプール（Django 5.1 以降・psycopg[pool] が必要）
+- DB_REPLICAS: 読み取り専用レプリカ（振り分けは config/replicas.py）
+
+設定できる環境変数は .env.sample を参照。
+"""
+
+import copy
+import os
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+SQLITE = "django.db.backends.sqlite3"
+POSTGRESQL = "django.db.backends.postgresql"
+
+
+def env_bool(name, default):
+    return os.environ.get(name, str(default)) == "True"
+
+
+def database_from_env(base_dir):
+    """環境変数 DB_* から DATABASES["default"] を作る"""
+    engine = os.environ.get("DB_ENGINE", SQLITE)
+    if engine == SQLITE:
+        return {
+            "ENGINE": engine,
+            "NAME": base_dir / os.environ.get("DB_NAME", "db.sqlite3"),
+            "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", "0")),
+            # ロック待ちの秒数（PRAGMA busy_timeout に相当）
+            "OPTIONS": {"timeout": float(os.environ.get("DB_SQLITE_TIMEOUT", "5"))},
+        }
+
+    database = {
+        "ENGINE": engine,
+        "NAME": os.environ.get("DB_NAME", "postgres"),
+        "USER": os.environ.get("DB_USER", ""),
+        "PASSWORD": os.environ.get("DB_PASSWORD", ""),
+        "HOST": os.environ.get("DB_HOST", ""),
+        "PORT": os.environ.get("DB_PORT", ""),
+        # 永続接続の秒数（0 はリクエストごとに接続、None は無期限）
+        "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", "60")),
+        # 永続接続を再利用する前に生きているか確認する
+        "CONN_HEALTH_CHECKS": env_bool("DB_CONN_HEALTH_CHECKS", True),
+        "OPTIONS": {},
+    }
+    if engine == POSTGRESQL and env_bool("DB_POOL", False):
+        database["OPTIONS"]["pool"] = {
+            "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", "10")),
+            # プールから接続を借りられるまで待つ秒数
+            "timeout": float(os.environ.get("DB_POOL_TIMEOUT", "10")),
+        }
+        # プールと永続接続は併用できない（接続の再利用はプールが行う）
+        database["CONN_MAX_AGE"] = 0
+    return database
+
+
+def replicas_from_env(default, base_dir):
+    """
+    DB_REPLICAS（カンマ区切り）から replica1, replica2, ... の DATABASES を作る。
+    SQLite ではデータベースファイル名、それ以外ではホスト名 (host または host:port) を指定し、
+    その他の設定は primary と同じにする。
+    """
+    replicas = {}
+    values = [value.strip() for value in os.environ.get("DB_REPLICAS", "").split(",")]
+    for index, value in enumerate(filter(None, values), start=1):
+        replica = copy.deepcopy(default)
+        if default["ENGINE"] == SQLITE:
+            replica["NAME"] = base_dir / value
+        else:
+            host, _, port = value.partition(":")
+            replica["HOST"], replica["PORT"] = host, port or default["PORT"]
+        # テストではレプリカ用のデータベースを作らず、primary を使う
+        replica["TEST"] = {"MIRROR": "default"}
+        replicas[f"replica{index}"] = replica
+    return replicas
+
+
+def sqlite_pragmas_from_env():
+    """SQLite の接続ごとに設定する PRAGMA"""
+    return {
+        # 読み取りが書き込みを待たない（データベースファイルに保存される設定）
+        "journal_mode": os.environ.get("DB_SQLITE_JOURNAL_MODE", "WAL"),
+        # WAL ではコミットごとの fsync を省いても破損しない（電源断で直近のコミットが失われうる）
+        "synchronous": os.environ.get("DB_SQLITE_SYNCHRONOUS", "NORMAL"),
+        "mmap_size": int(os.environ.get("DB_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+        # 負の値は KiB 単位のページキャッシュ
+        "cache_size": int(os.environ.get("DB_SQLITE_CACHE_SIZE", "-65536")),
+        "temp_store": "MEMORY",
+    }
+
+
+@receiver(connection_created, dispatch_uid="config.database.configure_sqlite")
+def configure_sqlite(sender, connection, **kwargs):
+    """新しい SQLite の接続に settings.SQLITE_PRAGMAS を設定する"""
+    if connection.vendor != "sqlite":
+        return
+    from django.conf import settings
+
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
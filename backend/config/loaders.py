@@ -0,0 +1,65 @@
+"""
+リクエスト単位のデータローダー。
+
+DataLoader は batch_load(キーの一覧) でまとめて読み込み、結果をキーごとに覚えておく。
+同じリクエストの中で同じキー（ユーザーや記事の id）を何度読み込んでも、
+まだ読み込んでいないキーだけを 1 回のクエリで取得する。
+
+ローダーは request_loader(request, name, batch_load) でリクエストに結び付けて使う
+（リクエストが終われば破棄されるので、ほかのリクエストの更新が見えなくなることはない）。
+"""
+
+from asgiref.sync import sync_to_async
+
+# ローダーを保存する request の属性名
+REQUEST_ATTR = "data_loaders"
+
+
+class DataLoader:
+    """
+    batch_load(keys) はキー → 値の dict を返す（見つからないキーは含めない）。
+    見つからなかったキーも None として覚え、再び問い合わせない
+    """
+
+    def __init__(self, batch_load):
+        self.batch_load = batch_load
+        self._cache = {}
+
+    def load_many(self, keys):
+        """keys の順に値（見つからなければ None）のリストを返す"""
+        missing = [key for key in dict.fromkeys(keys) if key not in self._cache]
+        if missing:
+            found = self.batch_load(missing)
+            for key in missing:
+                self._cache[key] = found.get(key)
+        return [self._cache[key] for key in keys]
+
+    def load(self, key):
+        return self.load_many([key])[0]
+
+    async def aload_many(self, keys):
+        """load_many の非同期版（batch_load は ORM を使うのでスレッドで実行する）"""
+        return await sync_to_async(self.load_many)(keys)
+
+    async def aload(self, key):
+        return (await self.aload_many([key]))[0]
+
+    def prime(self, key, value):
+        """ほかの経路で読み込んだ値を覚えさせる"""
+        self._cache.setdefault(key, value)
+
+    def clear(self, key=None):
+        """書き込み後などに、覚えた値を捨てる（key を省略するとすべて）"""
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(key, None)
+
+
+def request_loader(request, name, batch_load):
+    """request に結び付いた name のローダー（無ければ batch_load で作る）"""
+    loaders = request.__dict__.setdefault(REQUEST_ATTR, {})
+    loader = loaders.get(name)
+    if loader is None:
+        loader = loaders[name] = DataLoader(batch_load)
+    return loader
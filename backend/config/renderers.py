@@ -0,0 +1,26 @@
+"""
+orjson による JSON レンダラー（NinjaAPI(renderer=...) に渡す）。
+
+ninja 標準の JSONRenderer (json.dumps + NinjaJSONEncoder) より一桁速く、100 件のページでは
+エンコードがレスポンス処理の大半を占めていた分がほぼ無くなる。
+datetime / UUID / dataclass は orjson がそのまま扱い、それ以外の型（Decimal、pydantic のモデルなど）
+だけ NinjaJSONEncoder に任せる。
+"""
+
+import orjson
+from ninja.renderers import BaseRenderer
+from ninja.responses import NinjaJSONEncoder
+
+# datetime は pydantic の model_dump_json（エクスポートの NDJSON）と同じ形式にする
+# （マイクロ秒まで出力し、UTC は "Z"）
+OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = "application/json"
+
+    def __init__(self):
+        self.encoder = NinjaJSONEncoder()
+
+    def render(self, request, data, *, response_status):
+        return orjson.dumps(data, default=self.encoder.default, option=OPTIONS)
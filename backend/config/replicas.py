@@ -0,0 +1,191 @@
+"""
+読み取り専用レプリカへの振り分け。
+
+- ReplicaRouter: read_from_replica を付けたビュー（ブログ記事の一覧・詳細、コメント一覧）の
+  読み取りだけをレプリカ (settings.DATABASE_REPLICAS) に送る。書き込み・トランザクション内の
+  読み取り・それ以外のビューはすべて primary ("default") を使う。
+- primary_reads(): レプリカに送るビューの中でも、一部の読み取りを primary で行う
+  （ブログのレスポンスキャッシュに保存するレスポンスは primary から作る）。
+- ReadYourWritesMiddleware: 書き込みを行ったクライアントに署名付きの Cookie を付け、
+  REPLICA_STICKY_SECONDS 秒間はレプリカではなく primary から読ませる
+  （レプリケーションの遅れがあっても、自分の更新はすぐに見える）。
+"""
+
+import inspect
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# primary から読ませる期限 (UNIX 時刻) を入れる Cookie
+STICKY_COOKIE = "db_primary_until"
+# Cookie の署名の salt（クライアントが期限を書き換えられないようにする）
+STICKY_COOKIE_SALT = "config.replicas.sticky"
+
+_state = ContextVar("replica_state", default=None)
+
+
+class RequestState:
+    """1 リクエスト分の振り分けの状態（sync_to_async のスレッドからも同じインスタンスを更新する）"""
+
+    __slots__ = ("use_replica", "pinned", "wrote")
+
+    def __init__(self, pinned=False):
+        self.use_replica = False
+        self.pinned = pinned
+        self.wrote = False
+
+
+def replicas():
+    return getattr(settings, "DATABASE_REPLICAS", ())
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.use_replica or state.pinned or not replicas():
+            return None
+        # トランザクション内の読み取りは、そのトランザクションの書き込みと同じ primary で行う
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return random.choice(replicas())
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # primary とレプリカは同じデータなので、どちらから読んだインスタンスでも関連付けてよい
+        return True
+
+
+def read_from_replica(func):
+    """ビュー（ninja の Operation.run）の読み取りをレプリカに送るデコレーター"""
+    if inspect.iscoroutinefunction(func):
+
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            state = _state.get()
+            if state is None:
+                return await func(*args, **kwargs)
+            state.use_replica = True
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                state.use_replica = False
+
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        state = _state.get()
+        if state is None:
+            return func(*args, **kwargs)
+        state.use_replica = True
+        try:
+            return func(*args, **kwargs)
+        finally:
+            state.use_replica = False
+
+    return wrapper
+
+
+@contextmanager
+def primary_reads():
+    """
+    この中の読み取りは read_from_replica のビューの中でも primary で行う
+    （非同期ビューでも使える。状態はリクエストごとの RequestState にある）
+    """
+    state = _state.get()
+    if state is None or not state.use_replica:
+        yield
+        return
+    state.use_replica = False
+    try:
+        yield
+    finally:
+        state.use_replica = True
+
+
+def is_pinned(request, sticky_seconds):
+    """
+    直近に書き込みを行ったクライアントのリクエストか（署名付き Cookie の期限内か）。
+    署名が正しくない Cookie と、発行時の期限（今から sticky_seconds 秒 + 1 秒）より先の値は無視する
+    """
+    value = request.get_signed_cookie(
+        STICKY_COOKIE, default=None, salt=STICKY_COOKIE_SALT, max_age=sticky_seconds + 1
+    )
+    try:
+        until = float(value or 0)
+    except ValueError:
+        return False
+    now = time.time()
+    return now < until <= now + sticky_seconds + 1
+
+
+class ReadYourWritesMiddleware:
+    """
+    リクエストごとに振り分けの状態を用意し、書き込みがあれば Cookie で primary に固定する
+    （同期・非同期どちらにも対応）。レプリカが設定されていなければ何もしない。
+
+    primary に固定されたリクエストには request.read_primary = True を設定する
+    （ブログのレスポンスキャッシュはこの場合キャッシュを使わない）。
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = bool(replicas())
+        self.sticky_seconds = getattr(settings, "REPLICA_STICKY_SECONDS", 5)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        state, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        state, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    def start(self, request):
+        state = RequestState(pinned=is_pinned(request, self.sticky_seconds))
+        request.read_primary = state.pinned
+        return state, _state.set(state)
+
+    def finish(self, state, response):
+        if state.wrote:
+            response.set_signed_cookie(
+                STICKY_COOKIE,
+                str(int(time.time() + self.sticky_seconds) + 1),
+                salt=STICKY_COOKIE_SALT,
+                max_age=self.sticky_seconds,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -3,6 +3,8 @@ from pathlib import Path
 
 from dotenv import load_dotenv
 
+from .database import database_from_env, replicas_from_env, sqlite_pragmas_from_env
+
 # .envファイルを読み込む
 load_dotenv(os.path.join(Path(__file__).resolve().parent.parent.parent, ".env"))
 
@@ -31,12 +33,18 @@ INSTALLED_APPS = [
     # 自作アプリ
     "auth_api",
     "blog",
+    "metrics",
+    "jobs",
 ]
 
 # カスタムユーザーモデルの設定
 AUTH_USER_MODEL = "auth_api.CustomUser"
 
 MIDDLEWARE = [
+    # リクエスト全体の時間を測るため先頭に置く
+    "metrics.middleware.MetricsMiddleware",
+    # 書き込み直後のクライアントを primary に固定する（レプリカ未設定なら何もしない）
+    "config.replicas.ReadYourWritesMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -46,7 +54,10 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
-ROOT_URLCONF = "config.urls"
+# True の場合は非同期ビュー（Django の非同期 ORM）を使う。config/asgi.py から起動すると True になる
+API_ASYNC = os.environ.get("API_ASYNC", "False") == "True"
+
+ROOT_URLCONF = "config.urls_async" if API_ASYNC else "config.urls"
 
 TEMPLATES = [
     {
@@ -65,14 +76,93 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "config.wsgi.application"
+ASGI_APPLICATION = "config.asgi.application"
 
+# データベース（環境変数 DB_* で切り替える。config/database.py を参照）
 DATABASES = {
+    "default": database_from_env(BASE_DIR),
+}
+DATABASES.update(replicas_from_env(DATABASES["default"], BASE_DIR))
+# 読み取り専用レプリカの別名。一覧・詳細系のビューの読み取りだけを振り分ける (config/replicas.py)
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["config.replicas.ReplicaRouter"]
+# 書き込みを行ったクライアントを primary から読ませる秒数（レプリケーションの遅れより長くする）
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", "5"))
+# SQLite の接続ごとに設定する PRAGMA（空にすると設定しない）
+SQLITE_PRAGMAS = sqlite_pragmas_from_env()
+
+# キャッシュ設定（デフォルトはプロセス内メモリ。本番では Redis などに差し替える）
+# 例: CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+#     CACHE_LOCATION=redis://redis:6379/0
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
     }
 }
 
+# ブログの読み取り系レスポンスキャッシュ
+# 未設定なら、キャッシュがプロセス間で共有される場合 (Redis など) だけ使う。プロセスごとのキャッシュ
+# (LocMemCache) では、ほかのワーカー・管理コマンド・ジョブのワーカーの書き込みで古いレスポンスが
+# 無効にならないため使わない。True でプロセスごとのキャッシュの場合は起動時のチェックでエラーにする
+BLOG_CACHE_ENABLED = {"True": True, "False": False}.get(os.environ.get("BLOG_CACHE_ENABLED"))
+BLOG_CACHE_ALIAS = "default"
+BLOG_CACHE_TIMEOUT = int(os.environ.get("BLOG_CACHE_TIMEOUT", "300"))
+# 同じキーを再計算する際のロックの有効期限（秒）
+BLOG_CACHE_LOCK_TIMEOUT = 10
+
+# 作成時のキャッシュの再作成（ジョブとして実行する）。ワーカーと共有するキャッシュ (Redis など) の場合だけ有効にする
+BLOG_CACHE_WARM = os.environ.get("BLOG_CACHE_WARM", "False") == "True"
+
+# レート制限 (config/throttling.py)。"回数/期間"（期間は s, min, hour, day）。空にするとその制限を無効にする
+# 起動時に読み込むため、変更はプロセスの再起動後に反映される
+THROTTLE_RATES = {
+    # ログイン: IP アドレスごと・メールアドレスごと
+    "login": os.environ.get("THROTTLE_LOGIN_RATE", "30/min"),
+    "login_email": os.environ.get("THROTTLE_LOGIN_EMAIL_RATE", "10/min"),
+    # ユーザー登録: IP アドレスごと
+    "register": os.environ.get("THROTTLE_REGISTER_RATE", "20/hour"),
+    # トークンのリフレッシュ: IP アドレスごと
+    "refresh": os.environ.get("THROTTLE_REFRESH_RATE", "60/min"),
+    # 記事・コメントの作成・更新・削除: ユーザーごと（一括操作は別枠）
+    "write": os.environ.get("THROTTLE_WRITE_RATE", "120/min"),
+    "bulk": os.environ.get("THROTTLE_BULK_RATE", "20/min"),
+}
+# 回数の記録先。プロセス内 (LocalBucketStore) か、全プロセスで共有するキャッシュ (CacheStore)
+THROTTLE_STORE = os.environ.get("THROTTLE_STORE", "config.throttling.LocalBucketStore")
+THROTTLE_CACHE_ALIAS = "default"
+# 手前にあるリバースプロキシの数。IP アドレスごとの制限で X-Forwarded-For の右から何番目を使うか
+# （0 は REMOTE_ADDR を使う。クライアントが送った X-Forwarded-For で制限を回避されないようにする）
+NINJA_NUM_PROXIES = int(os.environ.get("NUM_PROXIES", "0"))
+
+# リクエストの計測 (/api/metrics)
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "True") == "True"
+# 詳細（段階ごとの時間・クエリ数・重複クエリ）を計測するリクエストの割合 (0.0〜1.0)
+METRICS_SAMPLE_RATE = float(os.environ.get("METRICS_SAMPLE_RATE", "1.0"))
+# 設定した場合、/api/metrics に "Authorization: Bearer <トークン>" を要求する
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# ジョブキュー (jobs/。ワーカーは manage.py run_jobs)
+# 失敗したジョブを実行する回数の上限と、再試行までの秒数（失敗ごとに 2 倍にし、上限で止める）
+JOBS_MAX_ATTEMPTS = int(os.environ.get("JOBS_MAX_ATTEMPTS", "5"))
+JOBS_RETRY_DELAY = float(os.environ.get("JOBS_RETRY_DELAY", "10"))
+JOBS_RETRY_MAX_DELAY = float(os.environ.get("JOBS_RETRY_MAX_DELAY", "3600"))
+# 実行中のジョブをほかのワーカーが取り直すまでの秒数（ワーカーが途中で落ちた場合に備える）
+JOBS_LEASE_SECONDS = int(os.environ.get("JOBS_LEASE_SECONDS", "300"))
+# 実行できるジョブが無いときに、次に確認するまでの秒数
+JOBS_POLL_INTERVAL = float(os.environ.get("JOBS_POLL_INTERVAL", "1"))
+
+# メール送信（ジョブから送る通知）。既定ではコンソールに出力する
+EMAIL_BACKEND = os.environ.get("EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend")
+EMAIL_HOST = os.environ.get("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.environ.get("EMAIL_PORT", "25"))
+EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = os.environ.get("EMAIL_USE_TLS", "False") == "True"
+DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "webmaster@localhost")
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -88,6 +178,17 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# パスワードハッシュ（先頭が新しいパスワードに使われ、他は既存ハッシュの検証用）
+PASSWORD_HASHERS = [
+    "auth_api.hashers.TunedPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+# PBKDF2 の反復回数（空なら Django の既定値）。変更すると、各ユーザーの次回ログイン時に再ハッシュされる
+PASSWORD_HASH_ITERATIONS = int(os.environ.get("PASSWORD_HASH_ITERATIONS") or 0) or None
+
 LANGUAGE_CODE = "ja"
 TIME_ZONE = "Asia/Tokyo"
 USE_I18N = True
@@ -106,12 +207,30 @@ OAUTH2_PROVIDER = {
     "REFRESH_TOKEN_EXPIRE_SECONDS": 86400,  # 1日
 }
 
+# OAuth2Auth のアクセストークンのキャッシュ（件数上限・有効期限秒・存在しないトークンの否定キャッシュの秒数）
+# 他のプロセスでの失効は、最大で有効期限の秒数まで遅れて反映される
+OAUTH2_TOKEN_CACHE_SIZE = int(os.environ.get("OAUTH2_TOKEN_CACHE_SIZE", "4096"))
+OAUTH2_TOKEN_CACHE_TTL = int(os.environ.get("OAUTH2_TOKEN_CACHE_TTL", "60"))
+OAUTH2_UNKNOWN_TOKEN_CACHE_TTL = int(os.environ.get("OAUTH2_UNKNOWN_TOKEN_CACHE_TTL", "10"))
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "oauth2_provider.contrib.rest_framework.OAuth2Authentication",
     )
 }
 
+# JWT認証の設定
+# True の場合、トークンのクレームだけでユーザーを組み立て、認証時に DB にアクセスしない
+JWT_CLAIMS_ONLY = os.environ.get("JWT_CLAIMS_ONLY", "False") == "True"
+# 認証済みユーザーのプロセス内キャッシュ（件数上限・有効期限秒）
+JWT_USER_CACHE_SIZE = int(os.environ.get("JWT_USER_CACHE_SIZE", "1024"))
+JWT_USER_CACHE_TTL = int(os.environ.get("JWT_USER_CACHE_TTL", "60"))
+# アクセストークン・リフレッシュトークンの有効期限（秒）
+JWT_ACCESS_TOKEN_LIFETIME = int(os.environ.get("JWT_ACCESS_TOKEN_LIFETIME", "3600"))
+JWT_REFRESH_TOKEN_LIFETIME = int(os.environ.get("JWT_REFRESH_TOKEN_LIFETIME", str(14 * 24 * 3600)))
+# 失効したトークンの一覧を DB から読み込み直す間隔（秒）。他のプロセスでの失効はこの秒数まで遅れて反映される
+JWT_REVOCATION_SYNC_INTERVAL = float(os.environ.get("JWT_REVOCATION_SYNC_INTERVAL", "5"))
+
 # メールを認証フィールドとして使用する
 AUTHENTICATION_BACKENDS = [
     "auth_api.backends.EmailBackend",
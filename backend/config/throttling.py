@@ -0,0 +1,175 @@
+"""
+ログイン・登録・書き込み系エンドポイントのレート制限。
+
+ninja はスロットルを認証の直後、リクエストボディの検証（validate_password など）や
+ビューの実行より前に評価するため、制限を超えたリクエストはパスワードのハッシュ計算や
+DB へのアクセスを行わずに 429 (Retry-After 付き) で拒否される。
+
+- RateThrottle(scope, key): settings.THROTTLE_RATES[scope] のレート（"10/min" など）で、
+  key ごと（ip / user / email）に制限する。レートが空の scope は制限しない。
+- 記録先 (settings.THROTTLE_STORE) は差し替えられる:
+  - LocalBucketStore（既定）: プロセス内のトークンバケット。ロックをキーのハッシュで分割し、
+    別のキーどうしはほとんど競合しない。制限はプロセス（ワーカー）ごと。
+  - CacheStore: Django のキャッシュ（Redis など）を使うスライディングウィンドウのカウンター。
+    全プロセスで共有されるが、1 回の判定ごとにキャッシュへの往復が発生する。
+"""
+
+import hashlib
+import json
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from ninja.throttling import SimpleRateThrottle
+
+
+class LocalBucketStore:
+    """プロセス内のトークンバケット（容量 limit、period 秒で limit 回分回復する）"""
+
+    def __init__(self, stripes=64, max_keys=10_000):
+        self._stripes = [(threading.Lock(), {}) for _ in range(stripes)]
+        # ストライプごとのキーの数がこれを超えたら、満タンに戻ったバケットを捨てる
+        self.max_keys = max_keys
+
+    def hit(self, key, limit, period):
+        """1 回分を消費する。許可なら None、拒否なら次に許可されるまでの秒数を返す"""
+        lock, buckets = self._stripes[hash(key) % len(self._stripes)]
+        rate = limit / period
+        now = time.monotonic()
+        with lock:
+            # (残りの回数, 更新時刻, 満タンに戻る時刻)
+            tokens, updated, _ = buckets.get(key, (limit, now, now))
+            tokens = min(limit, tokens + (now - updated) * rate)
+            if tokens < 1:
+                buckets[key] = (tokens, now, now + (limit - tokens) / rate)
+                return (1 - tokens) / rate
+            tokens -= 1
+            buckets[key] = (tokens, now, now + (limit - tokens) / rate)
+            if len(buckets) > self.max_keys:
+                self._sweep(buckets, now)
+        return None
+
+    @staticmethod
+    def _sweep(buckets, now):
+        # 満タンに戻ったバケットは新しく作るものと同じなので捨ててよい
+        for key in [key for key, (_, _, full_at) in buckets.items() if full_at <= now]:
+            del buckets[key]
+
+    def clear(self):
+        for lock, buckets in self._stripes:
+            with lock:
+                buckets.clear()
+
+
+class CacheStore:
+    """
+    Django のキャッシュを使う、全プロセスで共有のスライディングウィンドウのカウンター。
+    直前のウィンドウの回数を経過時間で按分して加える（Redis / Memcached の incr は原子的）
+    """
+
+    def __init__(self, alias=None):
+        self.alias = alias or getattr(settings, "THROTTLE_CACHE_ALIAS", "default")
+
+    def hit(self, key, limit, period):
+        cache = caches[self.alias]
+        # キーにはメールアドレスなどが入るので、どのキャッシュでも使える形にする
+        key = hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+        now = time.time()
+        window = int(now // period)
+        current = f"throttle:{key}:{window}"
+        # 拒否されたリクエストも数える（制限中に送り続けるクライアントは解除されない）
+        cache.add(current, 0, timeout=period * 2)
+        try:
+            count = cache.incr(current)
+        except ValueError:
+            # add の直後に期限切れ・削除された場合
+            cache.set(current, 1, timeout=period * 2)
+            count = 1
+        elapsed = now - window * period
+        previous = cache.get(f"throttle:{key}:{window - 1}", 0)
+        if previous * (period - elapsed) / period + count <= limit:
+            return None
+        return period - elapsed
+
+    def clear(self):
+        # キーを列挙できないのでキャッシュ全体を消す（THROTTLE_CACHE_ALIAS は専用のキャッシュにする）
+        caches[self.alias].clear()
+
+
+@lru_cache(maxsize=None)
+def get_throttle_store():
+    """settings.THROTTLE_STORE（クラスのパス）のインスタンス（プロセスで 1 つ）"""
+    return import_string(settings.THROTTLE_STORE)()
+
+
+def reset_throttles():
+    """記録をすべて消す（テスト用）"""
+    get_throttle_store().clear()
+
+
+def client_ip(throttle, request):
+    return throttle.get_ident(request)
+
+
+def auth_user_id(throttle, request):
+    """認証済みユーザーの id（認証なしのエンドポイントでは IP アドレス）"""
+    user = getattr(request, "auth", None)
+    user_id = getattr(user, "id", None)
+    return str(user_id) if user_id is not None else throttle.get_ident(request)
+
+
+def body_email(throttle, request):
+    """JSON ボディの email（小文字）。取り出せない場合はこのキーでは制限しない"""
+    if request.content_type != "application/json":
+        return None
+    try:
+        email = json.loads(request.body).get("email")
+    except (ValueError, AttributeError):
+        return None
+    return email.strip().lower() if isinstance(email, str) and email else None
+
+
+KEY_FUNCS = {"ip": client_ip, "user": auth_user_id, "email": body_email}
+
+_wait = threading.local()
+
+
+class RateThrottle(SimpleRateThrottle):
+    """
+    scope のレート (settings.THROTTLE_RATES) で、key（ip / user / email）ごとに制限するスロットル。
+    ninja の throttle= にインスタンスを渡す。同じ scope と key のインスタンスどうしは回数を共有する
+    """
+
+    def __init__(self, scope, key="ip", rate=None, store=None):
+        # store を省略すると settings.THROTTLE_STORE を使う
+        self.store = store
+        self.scope = scope
+        self.key_name = key
+        self.key_func = KEY_FUNCS[key]
+        self.THROTTLE_RATES = getattr(settings, "THROTTLE_RATES", {})
+        super().__init__(rate or self.THROTTLE_RATES.get(scope))
+
+    def get_rate(self):
+        # レートが設定されていない scope は制限しない
+        return None
+
+    def get_cache_key(self, request):
+        ident = self.key_func(self, request)
+        return None if ident is None else f"{self.scope}:{self.key_name}:{ident}"
+
+    def allow_request(self, request):
+        if self.num_requests is None:
+            return True
+        key = self.get_cache_key(request)
+        if key is None:
+            return True
+        # ninja は拒否した直後に同じスレッドで wait() を呼ぶ（インスタンスはリクエスト間で共有）
+        store = self.store or get_throttle_store()
+        _wait.seconds = store.hit(key, self.num_requests, self.duration)
+        return _wait.seconds is None
+
+    def wait(self):
+        return getattr(_wait, "seconds", None)
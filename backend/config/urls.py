@@ -1,11 +1,13 @@
 from auth_api.api import auth_router
 from blog.api import register_api_routes
+from config.renderers import ORJSONRenderer
 from django.contrib import admin
 from django.urls import include, path
+from metrics.api import register_api_routes as register_metrics_routes
 from ninja import NinjaAPI
 
 # メインAPIインスタンスの作成
-api = NinjaAPI()
+api = NinjaAPI(renderer=ORJSONRenderer())
 
 # 認証関連のルーターを登録
 api.add_router("/auth", auth_router)
@@ -13,6 +15,9 @@ api.add_router("/auth", auth_router)
 # ブログ関連のルーターを登録
 register_api_routes(api)
 
+# メトリクス (/api/metrics) と全エンドポイントの計測を登録
+register_metrics_routes(api)
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", api.urls),
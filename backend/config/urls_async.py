@@ -0,0 +1,34 @@
+"""
+ASGI（非同期ビュー）用のURL設定。
+
+settings.API_ASYNC が True の場合（config/asgi.py 経由の起動時など）に ROOT_URLCONF として使われる。
+エンドポイントは config/urls.py と同じ。
+"""
+
+from auth_api.async_api import auth_router
+from blog.async_api import register_api_routes
+from config.renderers import ORJSONRenderer
+from django.contrib import admin
+from django.urls import include, path
+from metrics.api import register_api_routes as register_metrics_routes
+from ninja import NinjaAPI
+
+# メインAPIインスタンスの作成（同期版と名前空間を分ける）
+api = NinjaAPI(urls_namespace="api-async", renderer=ORJSONRenderer())
+
+# 認証関連のルーターを登録
+api.add_router("/auth", auth_router)
+
+# ブログ関連のルーターを登録
+register_api_routes(api)
+
+# メトリクス (/api/metrics) と全エンドポイントの計測を登録
+register_metrics_routes(api)
+
+urlpatterns = [
+    path("admin/", admin.site.urls),
+    path("api/", api.urls),
+    path(
+        "o/", include("oauth2_provider.urls", namespace="oauth2_provider")
+    ),  # OAuth2エンドポイント
+]
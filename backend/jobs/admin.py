@@ -0,0 +1,21 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """ジョブキューの管理画面（失敗したジョブの確認と再実行）"""
+
+    list_display = ("id", "name", "status", "attempts", "max_attempts", "run_at", "created_at")
+    list_filter = ("status", "name")
+    readonly_fields = ("locked_by", "last_error", "created_at")
+    actions = ["retry_jobs"]
+
+    @admin.action(description="選択したジョブを再実行する")
+    def retry_jobs(self, request, queryset):
+        updated = queryset.filter(status=Job.FAILED).update(
+            status=Job.QUEUED, attempts=0, run_at=timezone.now()
+        )
+        self.message_user(request, f"{updated} 件のジョブを再実行します")
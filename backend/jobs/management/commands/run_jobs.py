@@ -0,0 +1,42 @@
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs.worker import handle_signals, run_processes, run_threads
+
+
+class Command(BaseCommand):
+    help = "ジョブキューのワーカーを起動します（SIGINT / SIGTERM で実行中のジョブが終わった後に停止）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=1, help="1プロセスあたりのワーカーのスレッド数")
+        parser.add_argument(
+            "--processes", type=int, default=1, help="ワーカーのプロセス数（2以上で別プロセスを起動）"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1, help="1回の取り出しでワーカーが確保するジョブの件数"
+        )
+        parser.add_argument(
+            "--poll-interval", type=float, default=None, help="ジョブが無いときに待つ秒数"
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="実行できるジョブが無くなったら終了する"
+        )
+
+    def handle(self, *args, **options):
+        threads, processes = options["threads"], options["processes"]
+        if threads < 1 or processes < 1 or options["batch_size"] < 1:
+            raise CommandError("--threads, --processes and --batch-size must be at least 1")
+        worker_options = {
+            "batch_size": options["batch_size"],
+            "poll_interval": options["poll_interval"],
+            "once": options["once"],
+        }
+        self.stdout.write(f"ジョブのワーカーを起動します（{processes} プロセス × {threads} スレッド）")
+        if processes > 1:
+            run_processes(processes, threads, **worker_options)
+        else:
+            stop = threading.Event()
+            handle_signals(stop)
+            run_threads(threads, stop=stop, **worker_options)
+        self.stdout.write(self.style.SUCCESS("ジョブのワーカーを停止しました"))
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+def default_max_attempts():
+    return getattr(settings, "JOBS_MAX_ATTEMPTS", 5)
+
+
+class Job(models.Model):
+    """
+    ジョブキューの 1 件（queue.py）。成功したジョブは削除し、失敗し続けたジョブだけを failed で残す。
+
+    run_at は queued なら次に実行できる時刻、running ならリースの期限
+    （ワーカーが落ちても、期限を過ぎればほかのワーカーが取り直す）。
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUS_CHOICES = [(QUEUED, "待機中"), (RUNNING, "実行中"), (FAILED, "失敗")]
+    # ワーカーが取り出す対象の状態
+    ACTIVE = (QUEUED, RUNNING)
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=default_max_attempts)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["run_at", "id"]
+        indexes = [
+            # 実行できるジョブを run_at 順に取り出す用（failed のジョブは含めない部分インデックス）
+            models.Index(
+                fields=["run_at", "id"],
+                condition=models.Q(status__in=["queued", "running"]),
+                name="jobs_job_due_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
@@ -0,0 +1,20 @@
+"""
+run_processes() が spawn で起動する子プロセスの入口。
+
+子プロセスではこのモジュールの読み込み時点で Django が初期化されていないため、
+モデルを読み込むモジュール (worker.py) は django.setup() の後に import する。
+"""
+
+import threading
+
+
+def process_main(threads, batch_size, poll_interval, once):
+    import django
+
+    django.setup()
+
+    from .worker import handle_signals, run_threads
+
+    stop = threading.Event()
+    handle_signals(stop)
+    run_threads(threads, batch_size, poll_interval, once, stop)
@@ -0,0 +1,135 @@
+"""
+DB のテーブル (Job) を使うジョブキュー。
+
+- @task(name): ジョブを実行する関数を登録する。各アプリの tasks.py に書くと起動時に読み込まれる
+- enqueue(name, payload): 現在のトランザクションのコミット後にジョブを登録する。
+  ロールバックされた書き込みの副作用は実行されず、リクエスト側の負担は INSERT 1 回だけになる
+- claim_jobs() / run_job(): ワーカー (worker.py、manage.py run_jobs) がジョブを取り出して実行する。
+  失敗したジョブは指数バックオフで再試行し、max_attempts 回失敗したら failed として残す
+
+取り出しは select_for_update(skip_locked=True) で行い、ほかのワーカーがロック中の行は飛ばす。
+SKIP LOCKED の無いデータベース (SQLite) では、状態を条件にした UPDATE で先に更新できた
+ワーカーだけがジョブを取る。
+"""
+
+import logging
+import random
+import traceback
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+
+
+def task(name):
+    """name のジョブを実行する関数を登録するデコレーター。関数は payload をキーワード引数で受け取る"""
+
+    def decorator(func):
+        _tasks[name] = func
+        return func
+
+    return decorator
+
+
+def get_task(name):
+    return _tasks.get(name)
+
+
+def enqueue(name, payload=None, *, delay=0, max_attempts=None):
+    """
+    現在のトランザクションのコミット後に、name のジョブを登録する（トランザクション外ではすぐに登録する）。
+    登録に失敗しても、コミット済みの書き込みのリクエストはエラーにしない
+    """
+    transaction.on_commit(partial(_insert, name, payload or {}, delay, max_attempts), robust=True)
+
+
+def _insert(name, payload, delay, max_attempts):
+    job = Job(name=name, payload=payload, run_at=timezone.now() + timedelta(seconds=delay))
+    if max_attempts is not None:
+        job.max_attempts = max_attempts
+    job.save()
+
+
+def lease_seconds():
+    return getattr(settings, "JOBS_LEASE_SECONDS", 300)
+
+
+def retry_delay(attempts):
+    """attempts 回目の失敗の後、再試行するまでの秒数（失敗ごとに 2 倍、上限あり）"""
+    base = getattr(settings, "JOBS_RETRY_DELAY", 10)
+    cap = getattr(settings, "JOBS_RETRY_MAX_DELAY", 3600)
+    # 同時に失敗したジョブの再試行が重ならないようにずらす
+    return min(cap, base * 2 ** (attempts - 1)) * random.uniform(0.5, 1)
+
+
+def claim_jobs(worker, limit=1):
+    """実行できるジョブを最大 limit 件取り出し、worker が実行中 (running) にする"""
+    now = timezone.now()
+    due = Job.objects.filter(status__in=Job.ACTIVE, run_at__lte=now).order_by("run_at", "id")
+    claimed = {
+        "status": Job.RUNNING,
+        "run_at": now + timedelta(seconds=lease_seconds()),
+        "locked_by": worker,
+        "attempts": F("attempts") + 1,
+    }
+    connection = connections[router.db_for_write(Job)]
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=connection.alias):
+            ids = list(due.select_for_update(skip_locked=True).values_list("id", flat=True)[:limit])
+            Job.objects.filter(id__in=ids).update(**claimed)
+    else:
+        # ほかのワーカーが先に取ったジョブは条件に一致せず、更新件数が 0 になる
+        candidates = list(due.values_list("id", flat=True)[:limit])
+        ids = [job_id for job_id in candidates if due.filter(id=job_id).update(**claimed)]
+    if not ids:
+        return []
+    return list(Job.objects.filter(id__in=ids, locked_by=worker).order_by("id"))
+
+
+def run_job(job):
+    """取り出したジョブを実行する。成功したら削除し、失敗したら再試行を予約する。成功したかを返す"""
+    func = get_task(job.name)
+    if func is None:
+        logger.error("Unknown job %s (#%s)", job.name, job.pk)
+        finish_failed(job, f"Unknown task: {job.name}", retry=False)
+        return False
+    try:
+        func(**job.payload)
+    except Exception:
+        logger.exception("Job %s (#%s) failed (attempt %s)", job.name, job.pk, job.attempts)
+        finish_failed(job, traceback.format_exc())
+        return False
+    # リースの期限切れでほかのワーカーが取り直したジョブは、そのワーカーに任せる
+    Job.objects.filter(id=job.pk, locked_by=job.locked_by).delete()
+    return True
+
+
+def finish_failed(job, error, retry=True):
+    if retry and job.attempts < job.max_attempts:
+        fields = {
+            "status": Job.QUEUED,
+            "run_at": timezone.now() + timedelta(seconds=retry_delay(job.attempts)),
+        }
+    else:
+        fields = {"status": Job.FAILED}
+    Job.objects.filter(id=job.pk, locked_by=job.locked_by).update(
+        locked_by="", last_error=error, **fields
+    )
+
+
+def release_jobs(jobs):
+    """取り出したが実行しなかったジョブを待機中に戻す（試行回数も戻す）"""
+    if not jobs:
+        return
+    Job.objects.filter(id__in=[job.pk for job in jobs], locked_by=jobs[0].locked_by).update(
+        status=Job.QUEUED, run_at=timezone.now(), locked_by="", attempts=F("attempts") - 1
+    )
@@ -0,0 +1,123 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Job
+from .queue import claim_jobs, enqueue, release_jobs, retry_delay, run_job, task
+from .worker import Worker
+
+calls = []
+
+
+@task("jobs.tests.record")
+def record(value):
+    calls.append(value)
+
+
+@task("jobs.tests.fail")
+def fail():
+    raise RuntimeError("boom")
+
+
+class QueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_inserts_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue("jobs.tests.record", {"value": 1})
+            self.assertFalse(Job.objects.exists())
+        job = Job.objects.get()
+        self.assertEqual(
+            (job.name, job.payload, job.status), ("jobs.tests.record", {"value": 1}, "queued")
+        )
+
+    def test_enqueue_is_dropped_on_rollback(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            enqueue("jobs.tests.record", {"value": 1})
+        # コミットされなかったトランザクションのコールバックは実行しない
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(Job.objects.exists())
+
+    def test_worker_runs_and_deletes_jobs(self):
+        Job.objects.create(name="jobs.tests.record", payload={"value": "a"})
+        Job.objects.create(name="jobs.tests.record", payload={"value": "b"})
+        Worker("w1", batch_size=10).drain()
+        self.assertEqual(calls, ["a", "b"])
+        self.assertFalse(Job.objects.exists())
+
+    def test_claim_skips_future_and_claimed_jobs(self):
+        later = Job.objects.create(
+            name="jobs.tests.record",
+            payload={"value": 1},
+            run_at=timezone.now() + timedelta(hours=1),
+        )
+        due = Job.objects.create(name="jobs.tests.record", payload={"value": 2})
+        self.assertEqual([job.id for job in claim_jobs("w1", 10)], [due.id])
+        self.assertEqual(claim_jobs("w2", 10), [])
+        due.refresh_from_db()
+        self.assertEqual((due.status, due.locked_by, due.attempts), ("running", "w1", 1))
+        later.refresh_from_db()
+        self.assertEqual(later.status, "queued")
+
+    def test_expired_lease_is_reclaimed(self):
+        Job.objects.create(
+            name="jobs.tests.record",
+            payload={"value": 1},
+            status=Job.RUNNING,
+            locked_by="dead",
+            attempts=1,
+            run_at=timezone.now() - timedelta(seconds=1),
+        )
+        [job] = claim_jobs("w1")
+        self.assertEqual((job.locked_by, job.attempts), ("w1", 2))
+
+    @override_settings(JOBS_RETRY_DELAY=10, JOBS_RETRY_MAX_DELAY=25)
+    def test_failed_job_is_retried_with_backoff_then_marked_failed(self):
+        Job.objects.create(name="jobs.tests.fail", max_attempts=3)
+        for attempt in (1, 2):
+            [job] = claim_jobs("w1")
+            started = timezone.now()
+            self.assertFalse(run_job(job))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts, job.locked_by), ("queued", attempt, ""))
+            self.assertIn("RuntimeError: boom", job.last_error)
+            # 1 回目は 5〜10 秒後、2 回目は 10〜20 秒後
+            delay = (job.run_at - started).total_seconds()
+            self.assertGreaterEqual(delay, 5 * attempt - 1)
+            self.assertLessEqual(delay, 10 * attempt + 1)
+            Job.objects.update(run_at=timezone.now())
+        [job] = claim_jobs("w1")
+        run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("failed", 3))
+        # failed のジョブは取り出さない
+        self.assertEqual(claim_jobs("w1"), [])
+
+    @override_settings(JOBS_RETRY_DELAY=10, JOBS_RETRY_MAX_DELAY=25)
+    def test_retry_delay_is_capped(self):
+        self.assertLessEqual(retry_delay(10), 25)
+        self.assertGreaterEqual(retry_delay(10), 12.5)
+
+    def test_unknown_task_fails_without_retry(self):
+        Job.objects.create(name="jobs.tests.missing")
+        [job] = claim_jobs("w1")
+        run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("failed", 1))
+
+    def test_release_returns_jobs_to_queue(self):
+        Job.objects.create(name="jobs.tests.record", payload={"value": 1})
+        jobs = claim_jobs("w1")
+        release_jobs(jobs)
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts, job.locked_by), ("queued", 0, ""))
+
+    def test_run_jobs_command_once(self):
+        Job.objects.create(name="jobs.tests.record", payload={"value": "cmd"})
+        call_command("run_jobs", "--once", stdout=StringIO())
+        self.assertEqual(calls, ["cmd"])
+        self.assertFalse(Job.objects.exists())
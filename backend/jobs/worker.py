@@ -0,0 +1,133 @@
+"""
+ジョブキューのワーカー（manage.py run_jobs から起動する）。
+
+Worker はジョブを batch_size 件ずつ取り出して実行し、無ければ poll_interval 秒待つ。
+run_threads() は 1 プロセス内で複数のスレッド（DB 接続はスレッドごと）を、
+run_processes() はさらに複数のプロセスを起動する。
+"""
+
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from .queue import claim_jobs, release_jobs, run_job
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    def __init__(self, name, stop=None, batch_size=1, poll_interval=None):
+        self.name = name
+        self.stop = stop or threading.Event()
+        self.batch_size = batch_size
+        if poll_interval is None:
+            poll_interval = getattr(settings, "JOBS_POLL_INTERVAL", 1.0)
+        self.poll_interval = poll_interval
+
+    def run_batch(self):
+        """ジョブを取り出して実行し、取り出した件数を返す"""
+        close_old_connections()
+        jobs = claim_jobs(self.name, self.batch_size)
+        for index, job in enumerate(jobs):
+            if self.stop.is_set():
+                # 停止を求められたら、残りはほかのワーカーがすぐに取れるように戻す
+                release_jobs(jobs[index:])
+                break
+            run_job(job)
+        return len(jobs)
+
+    def drain(self):
+        """実行できるジョブが無くなるまで実行する"""
+        while not self.stop.is_set() and self.run_batch():
+            pass
+
+    def run(self, once=False):
+        if once:
+            self.drain()
+            return
+        while not self.stop.is_set():
+            try:
+                found = self.run_batch()
+            except Exception:
+                # DB に接続できないなどの場合も止まらずに再試行する
+                logger.exception("Worker %s failed to fetch jobs", self.name)
+                found = 0
+            if not found:
+                self.stop.wait(self.poll_interval)
+
+    def run_in_thread(self, once=False):
+        try:
+            self.run(once)
+        finally:
+            # スレッドごとの DB 接続を閉じる
+            connections.close_all()
+
+
+def worker_name(index):
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+
+def handle_signals(stop):
+    """SIGINT / SIGTERM で、実行中のジョブが終わった後に停止する"""
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: stop.set())
+
+
+def run_threads(threads, batch_size=1, poll_interval=None, once=False, stop=None):
+    """threads 個のワーカーをスレッドで実行し、すべて終わるまで待つ（1 個なら呼び出したスレッドで実行）"""
+    stop = stop or threading.Event()
+    if threads == 1:
+        Worker(worker_name(0), stop, batch_size, poll_interval).run(once)
+        return
+    workers = [
+        threading.Thread(
+            target=Worker(worker_name(n), stop, batch_size, poll_interval).run_in_thread,
+            kwargs={"once": once},
+            name=f"job-worker-{n}",
+        )
+        for n in range(threads)
+    ]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        # join(timeout) にして、待っている間もシグナルハンドラーが動くようにする
+        while thread.is_alive():
+            thread.join(0.5)
+
+
+def run_processes(processes, threads, batch_size=1, poll_interval=None, once=False):
+    """processes 個のプロセスでそれぞれ threads 個のワーカーを実行する"""
+    # fork は DB 接続などの状態を子プロセスに引き継いでしまうので spawn で起動する
+    from .process import process_main
+
+    context = multiprocessing.get_context("spawn")
+    children = [
+        context.Process(
+            target=process_main,
+            args=(threads, batch_size, poll_interval, once),
+            name=f"job-worker-process-{n}",
+        )
+        for n in range(processes)
+    ]
+    for child in children:
+        child.start()
+
+    def terminate(*args):
+        for child in children:
+            if child.is_alive():
+                child.terminate()
+
+    signal.signal(signal.SIGTERM, terminate)
+    try:
+        for child in children:
+            child.join()
+    except KeyboardInterrupt:
+        # SIGINT は子プロセスにも届いているので、終わるのを待つ
+        for child in children:
+            child.join()
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.http import HttpResponse
+from ninja import NinjaAPI, Router
+from ninja.errors import HttpError
+
+from .recorder import instrument_api
+from .registry import registry
+
+router = Router()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("", include_in_schema=False)
+def metrics(request):
+    """Prometheus のテキスト形式でメトリクスを返す"""
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        raise HttpError(401, "Unauthorized")
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
+
+
+def register_api_routes(api: NinjaAPI) -> None:
+    """/metrics エンドポイントを登録し、全オペレーションに計測用のデコレーターを追加します。"""
+    instrument_api(api)
+    api.add_router("/metrics", router)
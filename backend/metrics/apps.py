@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class MetricsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'metrics'
+
+    def ready(self):
+        # すべての DB 接続にクエリ計測用のラッパーを登録
+        from .recorder import install_query_recorder
+
+        install_query_recorder()
@@ -0,0 +1,46 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .recorder import finish_request, start_request
+
+
+class MetricsMiddleware:
+    """
+    リクエストごとの所要時間・クエリ数などを記録するミドルウェア（同期・非同期どちらにも対応）。
+    全体の時間を測るため MIDDLEWARE の先頭に置く。settings.METRICS_ENABLED が False なら何もしない。
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "METRICS_ENABLED", True)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        state = start_request()
+        response = None
+        try:
+            response = self.get_response(request)
+            return response
+        finally:
+            finish_request(state, request, response)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        state = start_request()
+        response = None
+        try:
+            response = await self.get_response(request)
+            return response
+        finally:
+            finish_request(state, request, response)
@@ -0,0 +1,218 @@
+"""
+リクエストごとの計測。
+
+MetricsMiddleware がリクエストの開始時に RequestMetrics をコンテキスト変数に置き、
+以下がそこに計測値を書き込む。コンテキスト変数は sync_to_async / async_to_sync の
+スレッドにも引き継がれるため、同期・非同期どちらのビューでも同じように計測できる。
+
+- DB のクエリ: 各接続の execute_wrappers（connection.execute_wrapper と同じ仕組み）
+- 認証・ビュー・シリアライズの区切り: ninja の operation / view デコレーター (instrument_api)
+
+サンプリングされなかったリクエストでは RequestMetrics を作らず、
+全体の所要時間とステータスだけを記録する。
+"""
+
+import inspect
+import logging
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+from .registry import registry
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("request_metrics", default=None)
+
+REQUEST_DURATION = registry.histogram(
+    "api_request_duration_seconds", "リクエスト全体の所要時間", ("route", "method")
+)
+REQUESTS = registry.counter(
+    "api_requests_total", "リクエスト数", ("route", "method", "status")
+)
+SAMPLED = registry.counter(
+    "api_requests_sampled_total", "詳細を計測したリクエスト数", ("route", "method")
+)
+PHASE_DURATION = registry.histogram(
+    "api_phase_duration_seconds",
+    "処理段階ごとの所要時間（auth / view / serialization は DB の時間を除く。orm は DB の合計）",
+    ("route", "method", "phase"),
+)
+QUERIES = registry.histogram(
+    "api_db_queries",
+    "1 リクエストあたりのクエリ数",
+    ("route", "method"),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+DUPLICATE_QUERIES = registry.counter(
+    "api_db_duplicate_queries_total",
+    "同じリクエスト内で同じ SQL とパラメーターが再実行された回数",
+    ("route", "method"),
+)
+
+
+class RequestMetrics:
+    """1 リクエスト分の計測値"""
+
+    __slots__ = ("queries", "query_time", "seen", "duplicates", "marks")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.seen = set()
+        self.duplicates = 0
+        # 区切りの名前 → (時刻, その時点までのクエリ時間)
+        self.marks = {}
+
+    def mark(self, name):
+        self.marks[name] = (time.perf_counter(), self.query_time)
+
+    def span(self, start, end):
+        """2 つの区切りの間の時間から、その間のクエリ時間を除いたもの"""
+        if start not in self.marks or end not in self.marks:
+            return None
+        (t0, q0), (t1, q1) = self.marks[start], self.marks[end]
+        return max(0.0, (t1 - t0) - (q1 - q0))
+
+    def phases(self):
+        phases = {
+            "auth": self.span("operation_start", "view_start"),
+            "view": self.span("view_start", "view_end"),
+            "serialization": self.span("view_end", "operation_end"),
+            "orm": self.query_time,
+        }
+        return {name: value for name, value in phases.items() if value is not None}
+
+
+def current():
+    return _current.get()
+
+
+# --- DB クエリ ----------------------------------------------------------------
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.query_time += time.perf_counter() - started
+        metrics.queries += 1
+        key = (sql, repr(params))
+        if key in metrics.seen:
+            metrics.duplicates += 1
+        else:
+            metrics.seen.add(key)
+
+
+def add_query_recorder(sender=None, connection=None, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install_query_recorder():
+    """既存の接続と、これから作られる接続（スレッドごと）にクエリの計測を登録する"""
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+
+    for conn in connections.all(initialized_only=True):
+        add_query_recorder(connection=conn)
+    connection_created.connect(add_query_recorder, dispatch_uid="metrics.add_query_recorder")
+
+
+# --- ninja のデコレーター ---------------------------------------------------------
+
+
+def marking(start, end):
+    """関数の実行前後に区切りを記録するデコレーター（同期・非同期どちらにも対応）"""
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                metrics = _current.get()
+                if metrics is None:
+                    return await func(*args, **kwargs)
+                metrics.mark(start)
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    metrics.mark(end)
+
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            metrics = _current.get()
+            if metrics is None:
+                return func(*args, **kwargs)
+            metrics.mark(start)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.mark(end)
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_api(api):
+    """
+    NinjaAPI の全オペレーションに区切りの記録を追加する。
+    operation の開始 → (認証・入力の検証) → ビュー → (シリアライズ) → operation の終了
+    """
+    # ninja の mode="view" は Operation.run を、mode="operation" はビュー関数を包む
+    api.add_decorator(marking("operation_start", "operation_end"), mode="view")
+    api.add_decorator(marking("view_start", "view_end"), mode="operation")
+
+
+# --- リクエストの開始・終了 ---------------------------------------------------------
+
+
+def is_sampled():
+    rate = getattr(settings, "METRICS_SAMPLE_RATE", 1.0)
+    return rate >= 1.0 or random.random() < rate
+
+
+def start_request():
+    """リクエストの計測を始める。戻り値は finish_request に渡す"""
+    metrics = RequestMetrics() if is_sampled() else None
+    return time.perf_counter(), _current.set(metrics)
+
+
+def route_of(request):
+    match = getattr(request, "resolver_match", None)
+    return match.route if match is not None else "unmatched"
+
+
+def finish_request(state, request, response):
+    started, token = state
+    elapsed = time.perf_counter() - started
+    metrics = _current.get()
+    _current.reset(token)
+
+    route, method = route_of(request), request.method
+    status = response.status_code if response is not None else 500
+    REQUEST_DURATION.observe(elapsed, route, method)
+    REQUESTS.inc(route, method, str(status))
+    if metrics is None:
+        return
+
+    SAMPLED.inc(route, method)
+    QUERIES.observe(metrics.queries, route, method)
+    for phase, value in metrics.phases().items():
+        PHASE_DURATION.observe(value, route, method, phase)
+    if metrics.duplicates:
+        DUPLICATE_QUERIES.inc(route, method, amount=metrics.duplicates)
+        logger.warning(
+            "%s %s で重複したクエリが %d 件実行されました", method, route, metrics.duplicates
+        )
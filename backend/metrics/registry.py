@@ -0,0 +1,148 @@
+"""
+プロセス内のメトリクス（カウンターとヒストグラム）と Prometheus テキスト形式への出力。
+
+値はプロセスごとに保持する。gunicorn などで複数ワーカーを動かす場合は、
+ワーカーごとの値をスクレイプ側（Prometheus）で集約すること。
+"""
+
+import threading
+from bisect import bisect_left
+
+# 秒単位のヒストグラムのデフォルトのバケット
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names, values, extra=None):
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self.render_samples(items))
+        return lines
+
+    def render_samples(self, items):
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def get(self, *label_values):
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def render_samples(self, items):
+        for label_values, value in items:
+            yield f"{self.name}{format_labels(self.labels, label_values)} {format_value(value)}"
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *label_values):
+        # 各バケットの件数は累積せずに保持し、出力時に累積する
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def get(self, *label_values):
+        """(合計, 件数) を返す"""
+        with self._lock:
+            state = self._values.get(label_values)
+            return (state[1], state[2]) if state else (0.0, 0)
+
+    def render_samples(self, items):
+        for label_values, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                labels = format_labels(self.labels, label_values, f'le="{format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def register_collector(self, collector):
+        """
+        出力時に呼ばれる関数を登録する。
+        collector() は Metric の一覧を返す（ほかのモジュールが持つ統計をその場で変換する用途）。
+        """
+        self._collectors.append(collector)
+
+    def reset(self):
+        for metric in self._metrics:
+            metric.reset()
+
+    def render(self):
+        """Prometheus のテキスト形式 (version 0.0.4) で出力する"""
+        metrics = list(self._metrics)
+        for collector in self._collectors:
+            metrics.extend(collector())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
@@ -0,0 +1,102 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from .recorder import (
+    DUPLICATE_QUERIES,
+    PHASE_DURATION,
+    QUERIES,
+    REQUESTS,
+    finish_request,
+    start_request,
+)
+from .registry import Counter, Histogram, registry
+
+
+class RegistryTests(TestCase):
+    def test_histogram_renders_cumulative_buckets(self):
+        histogram = Histogram("latency_seconds", "help", ("route",), buckets=(0.1, 1.0))
+        histogram.observe(0.05, "a")
+        histogram.observe(0.5, "a")
+        histogram.observe(5, "a")
+        lines = histogram.render()
+        self.assertIn('latency_seconds_bucket{route="a",le="0.1"} 1', lines)
+        self.assertIn('latency_seconds_bucket{route="a",le="1"} 2', lines)
+        self.assertIn('latency_seconds_bucket{route="a",le="+Inf"} 3', lines)
+        self.assertIn('latency_seconds_sum{route="a"} 5.55', lines)
+        self.assertIn('latency_seconds_count{route="a"} 3', lines)
+
+    def test_labels_are_escaped(self):
+        counter = Counter("hits_total", "help", ("path",))
+        counter.inc('a"b\\c')
+        self.assertIn('hits_total{path="a\\"b\\\\c"} 1', counter.render())
+
+
+# テストは 1 プロセスで動くため、プロセス内のキャッシュでもレスポンスキャッシュを使う
+@override_settings(BLOG_CACHE_ENABLED=True)
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        cache.clear()
+
+    def test_records_route_phases_and_queries(self):
+        self.client.get("/api/blog/")
+        self.client.get("/api/blog/")
+        route = "api/blog/"
+        self.assertEqual(REQUESTS.get(route, "GET", "200"), 2)
+        # 2 回目はレスポンスキャッシュから返るため、クエリ数の合計は 1 回目の分だけ
+        total, count = QUERIES.get(route, "GET")
+        self.assertEqual(count, 2)
+        self.assertGreater(total, 0)
+        # キャッシュヒット時はビューが実行されないため、auth / view / serialization は 1 回分
+        for phase in ("auth", "view", "serialization"):
+            self.assertEqual(PHASE_DURATION.get(route, "GET", phase)[1], 1, phase)
+        self.assertEqual(PHASE_DURATION.get(route, "GET", "orm")[1], 2)
+
+    @override_settings(ROOT_URLCONF="config.urls_async")
+    def test_async_views(self):
+        self.client.get("/api/blog/")
+        total, count = QUERIES.get("api/blog/", "GET")
+        self.assertEqual(count, 1)
+        self.assertGreater(total, 0)
+        self.assertEqual(PHASE_DURATION.get("api/blog/", "GET", "view")[1], 1)
+
+    def test_metrics_endpoint(self):
+        self.client.get("/api/blog/")
+        response = self.client.get("/api/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = response.content.decode()
+        self.assertIn("# TYPE api_request_duration_seconds histogram", body)
+        self.assertIn('api_requests_total{route="api/blog/",method="GET",status="200"} 1', body)
+        self.assertIn('blog_response_cache_total{route="list_blog_entries",result="miss"}', body)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get("/api/metrics").status_code, 401)
+        response = self.client.get("/api/metrics", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_only_record_totals(self):
+        self.client.get("/api/blog/")
+        self.assertEqual(REQUESTS.get("api/blog/", "GET", "200"), 1)
+        self.assertEqual(QUERIES.get("api/blog/", "GET"), (0.0, 0))
+
+    def test_duplicate_queries_are_detected(self):
+        class Request:
+            method = "GET"
+            resolver_match = None
+
+        class Response:
+            status_code = 200
+
+        state = start_request()
+        with connection.cursor() as cursor:
+            for _ in range(3):
+                cursor.execute("SELECT %s", [1])
+            cursor.execute("SELECT %s", [2])
+        with self.assertLogs("metrics.recorder", "WARNING"):
+            finish_request(state, Request(), Response())
+        self.assertEqual(DUPLICATE_QUERIES.get("unmatched", "GET"), 2)
+        self.assertEqual(QUERIES.get("unmatched", "GET"), (4.0, 1))